@@ -0,0 +1,40 @@
+from django.contrib.auth import get_user_model
+from django.contrib.auth.backends import ModelBackend
+from django.contrib.auth.hashers import check_password
+
+from .hashing import ahash_password, run_hashing
+
+
+class PooledModelBackend(ModelBackend):
+    """
+    ModelBackend, у которого асинхронная проверка пароля идёт в пуле хэширования,
+    а не в общем потоке sync_to_async. Синхронный authenticate не меняется.
+    """
+
+    async def aauthenticate(self, request, username=None, password=None, **kwargs):
+        UserModel = get_user_model()
+        if username is None:
+            username = kwargs.get(UserModel.USERNAME_FIELD)
+        if username is None or password is None:
+            return None
+        try:
+            user = await UserModel._default_manager.aget_by_natural_key(username)
+        except UserModel.DoesNotExist:
+            # Считаем хэш и для несуществующего пользователя, чтобы не выдавать его временем ответа
+            await ahash_password(password)
+            return None
+
+        upgraded = []
+
+        def setter(raw_password):
+            user.set_password(raw_password)
+            upgraded.append(True)
+
+        # Если хэш устарел (сменился алгоритм или число итераций), он пересчитывается и сохраняется
+        is_correct = await run_hashing(check_password, password, user.password, setter)
+        if upgraded:
+            await user.asave(update_fields=['password'])
+
+        if is_correct and self.user_can_authenticate(user):
+            return user
+        return None
@@ -0,0 +1,153 @@
+import json
+import zipfile
+
+from asgiref.sync import sync_to_async
+from django.core.serializers.json import DjangoJSONEncoder
+
+from recipes.models import Recipe, Step, Comment
+
+# Размер куска при копировании файлов и порог, после которого накопленные байты отдаются клиенту
+CHUNK_SIZE = 64 * 1024
+QUERY_CHUNK_SIZE = 500
+
+
+class _ZipStream:
+    """
+    Файлоподобный приёмник для zipfile без seek(): zipfile пишет записи
+    с data descriptor, а накопленные байты забираются через pop().
+    """
+
+    def __init__(self):
+        self._buffer = bytearray()
+        self._position = 0
+
+    def write(self, data):
+        self._buffer += data
+        self._position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self._position
+
+    def flush(self):
+        pass
+
+    @property
+    def pending(self):
+        # Не __len__: zipfile проверяет поток через bool(), и пустой буфер выглядел бы закрытым
+        return len(self._buffer)
+
+    def pop(self):
+        data = bytes(self._buffer)
+        self._buffer.clear()
+        return data
+
+
+def _profile_records(user):
+    yield {
+        'username': user.username,
+        'email': user.email,
+        'date_joined': user.date_joined,
+        'avatar': user.avatar.name or None,
+    }
+
+
+def _recipe_records(user):
+    return (
+        Recipe.objects.filter(author=user)
+        .order_by('pk')
+        .values('pk', 'title', 'description', 'ingredients', 'category__name', 'image', 'created_at')
+        .iterator(chunk_size=QUERY_CHUNK_SIZE)
+    )
+
+
+def _step_records(user):
+    return (
+        Step.objects.filter(recipe__author=user)
+        .order_by('recipe_id', 'step_number', 'pk')
+        .values('pk', 'recipe_id', 'step_number', 'instruction', 'image')
+        .iterator(chunk_size=QUERY_CHUNK_SIZE)
+    )
+
+
+def _comment_records(user):
+    return (
+        Comment.objects.filter(user=user)
+        .order_by('pk')
+        .values('pk', 'recipe_id', 'recipe__title', 'text', 'created_at')
+        .iterator(chunk_size=QUERY_CHUNK_SIZE)
+    )
+
+
+def _media_names(user):
+    if user.avatar:
+        yield user.avatar.name
+    yield from (
+        Recipe.objects.filter(author=user).exclude(image='').exclude(image__isnull=True)
+        .order_by('pk').values_list('image', flat=True).iterator(chunk_size=QUERY_CHUNK_SIZE)
+    )
+    yield from (
+        Step.objects.filter(recipe__author=user).exclude(image='').exclude(image__isnull=True)
+        .order_by('pk').values_list('image', flat=True).iterator(chunk_size=QUERY_CHUNK_SIZE)
+    )
+
+
+def stream_user_export(user, storage=None):
+    return (chunk for chunk in _generate_archive(user, storage) if chunk)
+
+
+async def astream_user_export(user, storage=None):
+    """
+    Тот же архив для ASGI. Синхронный итератор StreamingHttpResponse там целиком
+    собирается в список, поэтому куски забираются по одному через sync_to_async —
+    в одном и том же потоке, где живут соединение с БД и курсоры iterator().
+    """
+    chunks = stream_user_export(user, storage)
+    next_chunk = sync_to_async(next)
+    try:
+        while (chunk := await next_chunk(chunks, None)) is not None:
+            yield chunk
+    finally:
+        # Клиент мог оборвать загрузку: закрываем генератор, чтобы освободить курсоры и файлы
+        await sync_to_async(chunks.close)()
+
+
+def _generate_archive(user, storage):
+    """
+    Генерирует ZIP-архив с данными пользователя по кускам: JSON-записи идут
+    из запросов с iterator(), файлы копируются кусками по CHUNK_SIZE, поэтому
+    расход памяти не зависит от объёма аккаунта.
+    """
+    if storage is None:
+        storage = Recipe._meta.get_field('image').storage
+
+    stream = _ZipStream()
+    with zipfile.ZipFile(stream, 'w', compression=zipfile.ZIP_DEFLATED) as archive:
+        sections = (
+            ('profile.json', _profile_records(user)),
+            ('recipes.jsonl', _recipe_records(user)),
+            ('steps.jsonl', _step_records(user)),
+            ('comments.jsonl', _comment_records(user)),
+        )
+        for name, records in sections:
+            with archive.open(name, 'w', force_zip64=True) as entry:
+                for record in records:
+                    entry.write(json.dumps(record, ensure_ascii=False, cls=DjangoJSONEncoder).encode() + b'\n')
+                    if stream.pending >= CHUNK_SIZE:
+                        yield stream.pop()
+            yield stream.pop()
+
+        for name in _media_names(user):
+            try:
+                source = storage.open(name, 'rb')
+            except OSError:
+                # Файл мог быть удалён с диска — архив собираем из того, что есть
+                continue
+            with source, archive.open(f'media/{name}', 'w', force_zip64=True) as entry:
+                while chunk := source.read(CHUNK_SIZE):
+                    entry.write(chunk)
+                    if stream.pending >= CHUNK_SIZE:
+                        yield stream.pop()
+            yield stream.pop()
+
+    yield stream.pop()
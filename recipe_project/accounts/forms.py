@@ -1,5 +1,5 @@
 from django import forms
-from django.contrib.auth.forms import UserCreationForm
+from django.contrib.auth.forms import AuthenticationForm, UserCreationForm
 from .models import CustomUser
 
 
@@ -9,6 +9,12 @@ class CustomUserCreationForm(UserCreationForm):
         fields = ['username', 'email']
 
 
+class AsyncAuthenticationForm(AuthenticationForm):
+    # Пароль проверяется асинхронно во view (см. accounts.hashing), здесь — только поля формы
+    def clean(self):
+        return self.cleaned_data
+
+
 class ProfileEditForm(forms.ModelForm):
     new_email = forms.EmailField(label='Новый Email', required=False)
 
@@ -0,0 +1,60 @@
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+
+from django.conf import settings
+from django.contrib.auth import aauthenticate
+from django.contrib.auth.hashers import make_password
+
+# PBKDF2 из hashlib отпускает GIL, поэтому потоки действительно считают хэши параллельно
+HASHING_WORKERS = getattr(settings, 'PASSWORD_HASHING_WORKERS', 4)
+HASHING_MAX_QUEUE = getattr(settings, 'PASSWORD_HASHING_MAX_QUEUE', 32)
+
+
+class HashingQueueFull(Exception):
+    """В пуле хэширования уже слишком много задач — запрос лучше отклонить сразу."""
+
+
+_executor = None
+_pending = 0
+_lock = threading.Lock()
+
+
+def _get_executor():
+    global _executor
+    with _lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=HASHING_WORKERS, thread_name_prefix='password-hashing')
+        return _executor
+
+
+async def run_hashing(func, *args, **kwargs):
+    """
+    Выполняет тяжёлую операцию с паролем в отдельном пуле потоков, не блокируя
+    цикл событий. Если очередь пула переполнена, сразу бросает HashingQueueFull.
+    """
+    global _pending
+    with _lock:
+        if _pending >= HASHING_WORKERS + HASHING_MAX_QUEUE:
+            raise HashingQueueFull
+        _pending += 1
+    try:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(_get_executor(), partial(func, *args, **kwargs))
+    finally:
+        with _lock:
+            _pending -= 1
+
+
+async def ahash_password(raw_password):
+    return await run_hashing(make_password, raw_password)
+
+
+async def aauthenticate_user(request, username, password):
+    """
+    Вход через django.contrib.auth.aauthenticate: проходят все AUTHENTICATION_BACKENDS,
+    при неудаче отправляется user_login_failed. PooledModelBackend проверяет пароль
+    в пуле; HashingQueueFull из него пробрасывается наружу.
+    """
+    return await aauthenticate(request, username=username, password=password)
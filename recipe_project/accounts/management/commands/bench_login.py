@@ -0,0 +1,100 @@
+import asyncio
+import math
+import statistics
+import time
+import uuid
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth import views as auth_views
+from django.core.management.base import BaseCommand
+from django.test import AsyncClient, override_settings
+from django.urls import include, path
+
+from accounts.views import login_async
+
+# Отдельный URLconf, чтобы в одном прогоне сравнить синхронный и асинхронный вход
+urlpatterns = [
+    path('bench/login-sync/', auth_views.LoginView.as_view(template_name='accounts/login.html')),
+    path('bench/login-async/', login_async),
+    path('', include('recipe_project.urls')),
+]
+
+PROBE_URL = '/recipes/'
+
+
+class Command(BaseCommand):
+    help = (
+        'Нагрузочный тест входа через ASGI: пропускная способность логинов и задержка '
+        'обычной страницы во время всплеска входов, для синхронного и асинхронного варианта'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--logins', type=int, default=40, help='Сколько входов выполнить')
+        parser.add_argument('--concurrency', type=int, default=8, help='Одновременных входов')
+
+    def handle(self, *args, **options):
+        User = get_user_model()
+        username = f'bench-{uuid.uuid4().hex[:8]}'
+        password = uuid.uuid4().hex
+        user = User.objects.create_user(username, f'{username}@example.com', password)
+        try:
+            with override_settings(ROOT_URLCONF=__name__, ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, 'testserver']):
+                for label, url in (('sync', '/bench/login-sync/'), ('async', '/bench/login-async/')):
+                    result = asyncio.run(self._bench(url, username, password, options['logins'], options['concurrency']))
+                    self._print(label, result)
+        finally:
+            user.delete()
+
+    async def _bench(self, url, username, password, logins, concurrency):
+        semaphore = asyncio.Semaphore(concurrency)
+        statuses = []
+
+        async def login_once():
+            async with semaphore:
+                response = await AsyncClient().post(url, {'username': username, 'password': password})
+                statuses.append(response.status_code)
+
+        probe_latencies = []
+        done = asyncio.Event()
+
+        async def probe():
+            client = AsyncClient()
+            # CSRF-кука отключает кэш страниц, чтобы страница честно рендерилась
+            client.cookies[settings.CSRF_COOKIE_NAME] = 'bench'
+            while not done.is_set():
+                started = time.perf_counter()
+                await client.get(PROBE_URL)
+                probe_latencies.append(time.perf_counter() - started)
+                await asyncio.sleep(0.01)
+
+        probe_task = asyncio.create_task(probe())
+        started = time.perf_counter()
+        await asyncio.gather(*(login_once() for _ in range(logins)))
+        elapsed = time.perf_counter() - started
+        done.set()
+        await probe_task
+
+        return {
+            'elapsed': elapsed,
+            'logins': len(statuses),
+            'ok': sum(status == 302 for status in statuses),
+            'probe': sorted(probe_latencies),
+        }
+
+    def _print(self, label, result):
+        probe = result['probe']
+        self.stdout.write(self.style.MIGRATE_HEADING(f'[{label}]'))
+        self.stdout.write(
+            f"  входов: {result['ok']}/{result['logins']} за {result['elapsed']:.2f} с "
+            f"({result['logins'] / result['elapsed']:.1f} входов/с)"
+        )
+        if not probe:
+            # Всплеск закончился раньше, чем успел пройти хотя бы один пробный запрос
+            self.stdout.write(f'  {PROBE_URL} во время всплеска: замеров нет')
+            return
+        p95 = probe[max(math.ceil(len(probe) * 0.95) - 1, 0)]
+        self.stdout.write(
+            f"  {PROBE_URL} во время всплеска: {len(probe)} запросов, "
+            f"p50 {statistics.median(probe) * 1000:.0f} мс, p95 {p95 * 1000:.0f} мс"
+        )
@@ -0,0 +1,33 @@
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+
+from accounts.export import stream_user_export
+from accounts.models import CustomUser
+
+
+class Command(BaseCommand):
+    help = 'Выгружает данные пользователей (рецепты, шаги, комментарии, изображения) в ZIP-архивы'
+
+    def add_arguments(self, parser):
+        parser.add_argument('usernames', nargs='*', help='Имена пользователей')
+        parser.add_argument('--all', action='store_true', help='Выгрузить всех пользователей')
+        parser.add_argument('--output-dir', default='exports', help='Каталог для архивов')
+
+    def handle(self, *args, **options):
+        if options['all']:
+            users = CustomUser.objects.order_by('pk').iterator(chunk_size=100)
+        elif options['usernames']:
+            users = CustomUser.objects.filter(username__in=options['usernames']).order_by('pk')
+        else:
+            raise CommandError('Укажите имена пользователей или --all.')
+
+        output_dir = Path(options['output_dir'])
+        output_dir.mkdir(parents=True, exist_ok=True)
+
+        for user in users:
+            path = output_dir / f'recipebook-{user.username}.zip'
+            with open(path, 'wb') as archive:
+                for chunk in stream_user_export(user):
+                    archive.write(chunk)
+            self.stdout.write(f'{user.username}: {path}')
@@ -0,0 +1,13 @@
+from django.contrib.sessions.models import Session
+from django.utils import timezone
+
+from recipes.maintenance import BatchedCommand
+
+
+class Command(BatchedCommand):
+    help = 'Удаляет просроченные сессии пачками (в отличие от clearsessions, не одним DELETE)'
+    default_batch_size = 1000
+
+    def handle(self, *args, **options):
+        expired = Session.objects.filter(expire_date__lt=timezone.now())
+        self.report('Просроченных сессий', self.delete_queryset(expired))
@@ -0,0 +1,24 @@
+from datetime import timedelta
+
+from django.utils import timezone
+
+from accounts.models import CustomUser
+from recipes.maintenance import BatchedCommand
+
+
+class Command(BatchedCommand):
+    help = 'Удаляет аккаунты, которые так и не были активированы после регистрации'
+
+    def add_arguments(self, parser):
+        super().add_arguments(parser)
+        parser.add_argument('--days', type=int, default=7, help='Сколько дней ждать активации')
+
+    def handle(self, *args, **options):
+        cutoff = timezone.now() - timedelta(days=options['days'])
+        stale = CustomUser.objects.filter(
+            is_active=False,
+            last_login__isnull=True,
+            is_staff=False,
+            date_joined__lt=cutoff,
+        )
+        self.report('Неактивированных аккаунтов', self.delete_queryset(stale))
@@ -7,4 +7,26 @@ class CustomUser(AbstractUser):
     unconfirmed_email = models.EmailField(max_length=254, blank=True, null=True)
 
     def __str__(self):
-        return self.username
\ No newline at end of file
+        return self.username
+
+
+class Follow(models.Model):
+    follower = models.ForeignKey(CustomUser, on_delete=models.CASCADE, related_name='following',
+                                 verbose_name="Подписчик")
+    author = models.ForeignKey(CustomUser, on_delete=models.CASCADE, related_name='followers',
+                               verbose_name="Автор")
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name="Дата подписки")
+
+    class Meta:
+        verbose_name = "Подписка"
+        verbose_name_plural = "Подписки"
+        constraints = [
+            models.UniqueConstraint(fields=['follower', 'author'], name='unique_follow'),
+        ]
+        indexes = [
+            # Рассылка рецепта подписчикам перебирает их по автору пачками по follower_id
+            models.Index(fields=['author', 'follower'], name='follow_author_follower_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.follower_id} → {self.author_id}'
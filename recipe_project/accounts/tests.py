@@ -1,3 +1,142 @@
-from django.test import TestCase
+import io
+import json
+import os
+import shutil
+import tempfile
+import zipfile
+from datetime import timedelta
+from io import StringIO
 
-# Create your tests here.
+from django.contrib.auth import get_user_model
+from django.contrib.auth.signals import user_login_failed
+from django.contrib.sessions.backends.db import SessionStore
+from django.contrib.sessions.models import Session
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from recipes.models import Recipe
+
+from .export import CHUNK_SIZE
+from .hashing import aauthenticate_user
+from .management.commands.bench_login import Command as BenchLoginCommand
+
+User = get_user_model()
+
+
+class MaintenanceCommandTests(TestCase):
+    def test_purge_inactive_users_keeps_recent_and_active(self):
+        old = timezone.now() - timedelta(days=30)
+        stale = User.objects.create_user('stale', 'stale@example.com', 'pw', is_active=False, date_joined=old)
+        User.objects.create_user('recent', 'recent@example.com', 'pw', is_active=False)
+        User.objects.create_user('active', 'active@example.com', 'pw', date_joined=old)
+
+        call_command('purge_inactive_users', '--dry-run', stdout=StringIO())
+        self.assertTrue(User.objects.filter(pk=stale.pk).exists())
+
+        call_command('purge_inactive_users', '--batch-size', '1', stdout=StringIO())
+        self.assertEqual(sorted(User.objects.values_list('username', flat=True)), ['active', 'recent'])
+
+    def test_purge_expired_sessions(self):
+        for expiry in (-60, -60, 3600):
+            session = SessionStore()
+            session.set_expiry(expiry)
+            session.create()
+        call_command('purge_expired_sessions', '--batch-size', '1', stdout=StringIO())
+        self.assertEqual(Session.objects.count(), 1)
+
+
+@override_settings(PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'])
+class AsyncAuthenticationTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('cook', 'cook@example.com', 'secret-pw')
+        self.failures = []
+        handler = lambda sender, credentials, **kwargs: self.failures.append(credentials['username'])
+        user_login_failed.connect(handler)
+        self.addCleanup(user_login_failed.disconnect, handler)
+
+    async def test_valid_credentials_go_through_backends(self):
+        user = await aauthenticate_user(None, 'cook', 'secret-pw')
+        self.assertEqual(user.pk, self.user.pk)
+        self.assertEqual(user.backend, 'accounts.backends.PooledModelBackend')
+
+    async def test_failures_send_signal(self):
+        self.assertIsNone(await aauthenticate_user(None, 'cook', 'wrong'))
+        self.assertIsNone(await aauthenticate_user(None, 'ghost', 'secret-pw'))
+        self.assertEqual(self.failures, ['cook', 'ghost'])
+
+    async def test_inactive_user_is_rejected(self):
+        self.user.is_active = False
+        await self.user.asave()
+        self.assertIsNone(await aauthenticate_user(None, 'cook', 'secret-pw'))
+
+    async def test_outdated_hash_is_upgraded(self):
+        with self.settings(PASSWORD_HASHERS=[
+            'django.contrib.auth.hashers.PBKDF2PasswordHasher',
+            'django.contrib.auth.hashers.MD5PasswordHasher',
+        ]):
+            await aauthenticate_user(None, 'cook', 'secret-pw')
+        await self.user.arefresh_from_db()
+        self.assertTrue(self.user.password.startswith('pbkdf2_sha256$'))
+
+    @override_settings(ROOT_URLCONF='accounts.management.commands.bench_login')
+    async def test_login_view_logs_in_with_resolved_backend(self):
+        response = await self.async_client.post(
+            '/bench/login-async/', {'username': 'cook', 'password': 'secret-pw'},
+        )
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(await self.async_client.session.aget('_auth_user_backend'),
+                         'accounts.backends.PooledModelBackend')
+
+
+class BenchLoginReportTests(TestCase):
+    def test_report_without_probe_samples(self):
+        command = BenchLoginCommand(stdout=StringIO())
+        command._print('async', {'elapsed': 1.0, 'logins': 2, 'ok': 2, 'probe': []})
+        self.assertIn('замеров нет', command.stdout.getvalue())
+
+
+class ExportTests(TestCase):
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+        override = override_settings(MEDIA_ROOT=media_root)
+        override.enable()
+        self.addCleanup(override.disable)
+
+        self.user = User.objects.create_user('cook', 'cook@example.com', 'pw')
+        # Несжимаемый файл больше куска: архив обязан прийти несколькими частями
+        self.photo = os.urandom(3 * CHUNK_SIZE)
+        os.makedirs(os.path.join(media_root, 'recipes'))
+        with open(os.path.join(media_root, 'recipes', 'borsch.jpg'), 'wb') as f:
+            f.write(self.photo)
+        Recipe.objects.create(author=self.user, title='Борщ', description='Классика',
+                              ingredients='свёкла 2 шт', image='recipes/borsch.jpg')
+
+    def _check_archive(self, data):
+        with zipfile.ZipFile(io.BytesIO(data)) as archive:
+            self.assertEqual(
+                sorted(archive.namelist()),
+                ['comments.jsonl', 'media/recipes/borsch.jpg', 'profile.json', 'recipes.jsonl', 'steps.jsonl'],
+            )
+            self.assertEqual(json.loads(archive.read('profile.json'))['username'], 'cook')
+            recipes = [json.loads(line) for line in archive.read('recipes.jsonl').splitlines()]
+            self.assertEqual([recipe['title'] for recipe in recipes], ['Борщ'])
+            self.assertEqual(archive.read('comments.jsonl'), b'')
+            self.assertEqual(archive.read('media/recipes/borsch.jpg'), self.photo)
+
+    def test_wsgi_export_streams_archive(self):
+        self.client.force_login(self.user)
+        response = self.client.get('/accounts/profile/export/')
+        self.assertTrue(response.streaming)
+        self.assertFalse(response.is_async)
+        self._check_archive(b''.join(response.streaming_content))
+
+    async def test_asgi_export_is_read_chunk_by_chunk(self):
+        await self.async_client.aforce_login(self.user)
+        response = await self.async_client.get('/accounts/profile/export/')
+        self.assertTrue(response.is_async)
+        chunks = [chunk async for chunk in response.streaming_content]
+        self.assertGreater(len(chunks), 3)
+        self.assertTrue(all(len(chunk) < len(self.photo) for chunk in chunks))
+        self._check_archive(b''.join(chunks))
@@ -1,9 +1,14 @@
+from django.conf import settings
 from django.urls import path
 from django.contrib.auth import views as auth_views
 from django.urls import reverse_lazy
 from .views import (
     register,
+    register_async,
+    login_async,
     profile,
+    export_data,
+    toggle_follow,
     activate,
     CustomPasswordResetView, PasswordResetDoneView,
     PasswordResetConfirmView, PasswordResetCompleteView,
@@ -12,12 +17,21 @@ from .views import (
     resend_email_change_email,
 )
 
+if settings.ASYNC_AUTH_VIEWS:
+    register_view = register_async
+    login_view = login_async
+else:
+    register_view = register
+    login_view = auth_views.LoginView.as_view(template_name='accounts/login.html')
+
 urlpatterns = [
-    path('register/', register, name='register'),
-    path('login/', auth_views.LoginView.as_view(template_name='accounts/login.html'), name='login'),
+    path('register/', register_view, name='register'),
+    path('login/', login_view, name='login'),
     path('logout/', auth_views.LogoutView.as_view(next_page='/'), name='logout'),
 
     path('profile/', profile, name='profile'),
+    path('profile/export/', export_data, name='export_data'),
+    path('follow/<str:username>/', toggle_follow, name='toggle_follow'),
     path('password_change/', auth_views.PasswordChangeView.as_view(
         template_name='accounts/password_change_form.html',
         success_url=reverse_lazy('profile')
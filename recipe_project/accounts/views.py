@@ -1,21 +1,61 @@
-from django.shortcuts import render, redirect
-from django.contrib.auth import login, views as auth_views, get_user_model
+from asgiref.sync import sync_to_async
+from django.shortcuts import render, redirect, resolve_url, get_object_or_404
+from django.contrib.auth import login, alogin, views as auth_views, get_user_model
 from django.contrib.auth.decorators import login_required
+from django.core.handlers.asgi import ASGIRequest
+from django.http import HttpResponse, StreamingHttpResponse
 from django.urls import reverse_lazy
-from django.utils.http import urlsafe_base64_encode, urlsafe_base64_decode
+from django.utils.http import urlsafe_base64_encode, urlsafe_base64_decode, url_has_allowed_host_and_scheme
+from django.views.decorators.cache import never_cache
+from django.views.decorators.debug import sensitive_post_parameters
+from django.views.decorators.http import require_POST
 from django.utils.encoding import force_bytes, force_str
 from django.core.mail import send_mail
 from django.template.loader import render_to_string
 from django.conf import settings
 from django.contrib import messages
 from django.contrib.auth.tokens import default_token_generator
+from django.utils.decorators import method_decorator
 
-from .forms import CustomUserCreationForm, ProfileEditForm
-from .models import CustomUser
+from recipes.models import Recipe, AuthorStats
+from recipes.pagination import keyset_paginate
+from recipe_project.ratelimit import ratelimit
+
+from .export import astream_user_export, stream_user_export
+from .forms import AsyncAuthenticationForm, CustomUserCreationForm, ProfileEditForm
+from .hashing import HashingQueueFull, aauthenticate_user, ahash_password
+from .models import CustomUser, Follow
 
 User = get_user_model()
 
+PROFILE_RECIPES_PER_PAGE = 10
+
+
+def send_activation_email(request, user, subject):
+    current_site = request.get_host()
+
+    uid = urlsafe_base64_encode(force_bytes(user.pk))
+    token = default_token_generator.make_token(user)
+
+    context = {
+        'user': user,
+        'domain': current_site,
+        'uid': uid,
+        'token': token,
+    }
+    email_message = render_to_string('accounts/account_activation_email.html', context)
+
+    send_mail(
+        subject,
+        email_message,
+        settings.DEFAULT_FROM_EMAIL,
+        [user.email],
+        html_message=email_message,
+        fail_silently=False,
+    )
+
 
+@ratelimit('register', '5/h', key='ip')
 def register(request):
     if request.method == 'POST':
         form = CustomUserCreationForm(request.POST)
@@ -24,28 +64,7 @@ def register(request):
             user.is_active = False
             user.save()
 
-            current_site = request.get_host()
-            subject = 'Активация аккаунта на RecipeBook'
-
-            uid = urlsafe_base64_encode(force_bytes(user.pk))
-            token = default_token_generator.make_token(user)
-
-            context = {
-                'user': user,
-                'domain': current_site,
-                'uid': uid,
-                'token': token,
-            }
-            email_message = render_to_string('accounts/account_activation_email.html', context)
-
-            send_mail(
-                subject,
-                email_message,
-                settings.DEFAULT_FROM_EMAIL,
-                [user.email],
-                html_message=email_message,
-                fail_silently=False,
-            )
+            send_activation_email(request, user, 'Активация аккаунта на RecipeBook')
 
             messages.info(request, 'Аккаунт успешно создан! Для входа проверьте Email и активируйте его.')
             return redirect('login')
@@ -57,6 +76,72 @@ def register(request):
     return render(request, 'accounts/register.html', {'form': form})
 
 
+def _hashing_busy_response():
+    response = HttpResponse('Слишком много одновременных входов, попробуйте через пару секунд.', status=503)
+    response['Retry-After'] = '1'
+    return response
+
+
+def _login_redirect_url(request):
+    redirect_to = request.POST.get('next', request.GET.get('next', ''))
+    if url_has_allowed_host_and_scheme(redirect_to, allowed_hosts={request.get_host()},
+                                       require_https=request.is_secure()):
+        return redirect_to
+    return resolve_url(settings.LOGIN_REDIRECT_URL)
+
+
+# Асинхронные варианты входа и регистрации для ASGI: хэширование пароля
+# выполняется в ограниченном пуле потоков и не блокирует цикл событий.
+@sensitive_post_parameters()
+@never_cache
+async def login_async(request):
+    if request.method == 'POST':
+        form = AsyncAuthenticationForm(request, data=request.POST)
+        if form.is_valid():
+            try:
+                user = await aauthenticate_user(
+                    request, form.cleaned_data['username'], form.cleaned_data['password']
+                )
+            except HashingQueueFull:
+                return _hashing_busy_response()
+
+            if user is not None:
+                await alogin(request, user)
+                return redirect(_login_redirect_url(request))
+            form.add_error(None, form.get_invalid_login_error())
+    else:
+        form = AsyncAuthenticationForm(request)
+    return await sync_to_async(render)(request, 'accounts/login.html', {'form': form})
+
+
+@sensitive_post_parameters()
+@ratelimit('register', '5/h', key='ip')
+async def register_async(request):
+    if request.method == 'POST':
+        form = CustomUserCreationForm(request.POST)
+        if await sync_to_async(form.is_valid)():
+            try:
+                password = await ahash_password(form.cleaned_data['password1'])
+            except HashingQueueFull:
+                return _hashing_busy_response()
+
+            # form.save() захэшировал бы пароль прямо здесь, поэтому сохраняем экземпляр сами
+            user = form.instance
+            user.password = password
+            user.is_active = False
+            await user.asave()
+
+            await sync_to_async(send_activation_email)(request, user, 'Активация аккаунта на RecipeBook')
+
+            messages.info(request, 'Аккаунт успешно создан! Для входа проверьте Email и активируйте его.')
+            return redirect('login')
+        else:
+            messages.error(request, 'Ошибка регистрации. Проверьте введенные данные.')
+    else:
+        form = CustomUserCreationForm()
+    return await sync_to_async(render)(request, 'accounts/register.html', {'form': form})
+
+
 def activate(request, uidb64, token):
     try:
         uid = force_str(urlsafe_base64_decode(uidb64))
@@ -80,34 +165,14 @@ def activate(request, uidb64, token):
 
 
 @login_required
+@ratelimit('resend_activation', '3/h', key='user', methods=None)
 def resend_activation_email(request):
     if request.user.is_active:
         messages.warning(request, 'Ваш аккаунт уже активен.')
         return redirect('profile')
 
     user = request.user
-    current_site = request.get_host()
-    subject = 'Повторная активация аккаунта на RecipeBook'
-
-    uid = urlsafe_base64_encode(force_bytes(user.pk))
-    token = default_token_generator.make_token(user)
-
-    context = {
-        'user': user,
-        'domain': current_site,
-        'uid': uid,
-        'token': token,
-    }
-    email_message = render_to_string('accounts/account_activation_email.html', context)
-
-    send_mail(
-        subject,
-        email_message,
-        settings.DEFAULT_FROM_EMAIL,
-        [user.email],
-        html_message=email_message,
-        fail_silently=False,
-    )
+    send_activation_email(request, user, 'Повторная активация аккаунта на RecipeBook')
 
     messages.success(request, f'Письмо для активации отправлено повторно на {user.email}.')
     return redirect('recipe_list')
@@ -115,11 +180,13 @@ def resend_activation_email(request):
 
 @login_required
 def profile(request):
-    try:
-        Recipe = request.user.recipe_set.model
-        user_recipes = Recipe.objects.filter(author=request.user).order_by('-created_at')
-    except AttributeError:
-        user_recipes = []
+    # Листаем по курсору (created_at, pk) и грузим только поля карточки
+    user_recipes = keyset_paginate(
+        Recipe.objects.filter(author=request.user).only('pk', 'title', 'created_at'),
+        request.GET.get('cursor'),
+        PROFILE_RECIPES_PER_PAGE,
+    )
+    author_stats = AuthorStats.objects.select_related('top_category').filter(author=request.user).first()
 
     if request.method == 'POST':
         form = ProfileEditForm(request.POST, request.FILES, instance=request.user)
@@ -169,10 +236,34 @@ def profile(request):
 
     return render(request, 'accounts/profile.html', {
         'user_recipes': user_recipes,
+        'author_stats': author_stats,
         'profile_form': form,
     })
 
 
+@login_required
+def export_data(request):
+    # Под ASGI нужен асинхронный итератор, иначе Django соберёт весь архив в памяти
+    stream = astream_user_export if isinstance(request, ASGIRequest) else stream_user_export
+    response = StreamingHttpResponse(stream(request.user), content_type='application/zip')
+    response['Content-Disposition'] = f'attachment; filename="recipebook-{request.user.username}.zip"'
+    return response
+
+
+@login_required
+@require_POST
+def toggle_follow(request, username):
+    author = get_object_or_404(User, username=username)
+    if author != request.user:
+        deleted, _ = Follow.objects.filter(follower=request.user, author=author).delete()
+        if deleted:
+            messages.info(request, f'Вы отписались от {author.username}.')
+        else:
+            Follow.objects.get_or_create(follower=request.user, author=author)
+            messages.success(request, f'Вы подписались на {author.username}. Новые рецепты появятся в ленте подписок.')
+    return redirect(_login_redirect_url(request))
+
+
 def confirm_email_change(request, uidb64, token):
     try:
         uid = force_str(urlsafe_base64_decode(uidb64))
@@ -197,6 +288,7 @@ def confirm_email_change(request, uidb64, token):
 
 
 @login_required
+@ratelimit('resend_email_change', '3/h', key='user', methods=None)
 def resend_email_change_email(request):
     if not request.user.unconfirmed_email:
         messages.error(request, 'У вас нет неподтвержденного запроса на смену Email.')
@@ -233,6 +325,7 @@ def resend_email_change_email(request):
     return redirect('profile')
 
 
+@method_decorator(ratelimit('password_reset', '5/h', key='ip'), name='dispatch')
 class CustomPasswordResetView(auth_views.PasswordResetView):
     template_name = 'accounts/password_reset_form.html'
     email_template_name = 'accounts/password_reset_email.html'
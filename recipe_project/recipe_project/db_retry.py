@@ -0,0 +1,31 @@
+import random
+import time
+from functools import wraps
+
+from django.db import OperationalError, connection
+
+
+def is_lock_error(exc):
+    message = str(exc).lower()
+    return 'database is locked' in message or 'database table is locked' in message or 'busy' in message
+
+
+def retry_on_locked(attempts=5, base_delay=0.05, max_delay=1.0):
+    """
+    Повторяет короткую пишущую транзакцию, если SQLite вернул "database is locked".
+    Пауза растёт экспоненциально со случайным разбросом (full jitter), чтобы
+    конкурирующие писатели не просыпались одновременно. Внутри внешней транзакции
+    повтор невозможен, и ошибка пробрасывается сразу.
+    """
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            for attempt in range(attempts):
+                try:
+                    return func(*args, **kwargs)
+                except OperationalError as exc:
+                    if not is_lock_error(exc) or connection.in_atomic_block or attempt == attempts - 1:
+                        raise
+                    time.sleep(random.uniform(0, min(max_delay, base_delay * 2 ** attempt)))
+        return wrapper
+    return decorator
@@ -0,0 +1,139 @@
+import random
+import threading
+import time
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import DatabaseError, connections
+
+PRIMARY = 'default'
+HEARTBEAT_TABLE = 'replication_heartbeat'
+STICKY_COOKIE = 'db_primary'
+
+# Приложения, которые всегда читаются с основной базы (сессия только что могла измениться)
+PRIMARY_ONLY_APPS = {'sessions'}
+
+_pinned = ContextVar('db_pinned_to_primary', default=False)
+_wrote = ContextVar('db_wrote_in_request', default=False)
+
+
+def write_heartbeat(using=PRIMARY):
+    """Записывает отметку времени на основной базе; по ней на репликах считается отставание."""
+    with connections[using].cursor() as cursor:
+        cursor.execute(f'CREATE TABLE IF NOT EXISTS {HEARTBEAT_TABLE} (id INTEGER PRIMARY KEY, ts DOUBLE PRECISION)')
+        cursor.execute(f'DELETE FROM {HEARTBEAT_TABLE}')
+        cursor.execute(f'INSERT INTO {HEARTBEAT_TABLE} (id, ts) VALUES (1, %s)', [time.time()])
+
+
+def read_heartbeat(using):
+    try:
+        with connections[using].cursor() as cursor:
+            cursor.execute(f'SELECT ts FROM {HEARTBEAT_TABLE} WHERE id = 1')
+            row = cursor.fetchone()
+    except DatabaseError:
+        return None
+    return row[0] if row else None
+
+
+def replica_lag(alias):
+    """
+    Отставание реплики в секундах или None, если его не удалось определить.
+    Считается от текущего времени, а не от heartbeat основной базы: если писатель
+    heartbeat остановился, реплики стареют и выпадают, а чтение уходит на основную базу.
+    """
+    replica_ts = read_heartbeat(alias)
+    if replica_ts is None:
+        return None
+    return max(time.time() - replica_ts, 0.0)
+
+
+class ReplicaMonitor:
+    """
+    Кэширует в памяти процесса список реплик, отставание которых в пределах
+    REPLICA_MAX_LAG_SECONDS. Проверка выполняется не чаще раза в
+    REPLICA_CHECK_INTERVAL секунд; реплика с неизвестным отставанием
+    (нет heartbeat, ошибка подключения) считается недоступной.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._healthy = []
+        self._checked_at = 0.0
+        self.lags = {}
+
+    def healthy_replicas(self):
+        if time.monotonic() - self._checked_at < settings.REPLICA_CHECK_INTERVAL:
+            return self._healthy
+        with self._lock:
+            if time.monotonic() - self._checked_at >= settings.REPLICA_CHECK_INTERVAL:
+                self.lags = {alias: replica_lag(alias) for alias in settings.DATABASE_REPLICAS}
+                self._healthy = [
+                    alias for alias, lag in self.lags.items()
+                    if lag is not None and lag <= settings.REPLICA_MAX_LAG_SECONDS
+                ]
+                self._checked_at = time.monotonic()
+        return self._healthy
+
+
+monitor = ReplicaMonitor()
+
+
+class ReplicaRouter:
+    """
+    Запись — всегда в основную базу, чтение — на случайную исправную реплику.
+    Если в этом запросе уже была запись или пользователь недавно что-то
+    сохранял (кука STICKY_COOKIE), чтение тоже идёт с основной базы.
+    """
+
+    def db_for_read(self, model, **hints):
+        if _pinned.get() or _wrote.get() or model._meta.app_label in PRIMARY_ONLY_APPS:
+            return PRIMARY
+        replicas = monitor.healthy_replicas()
+        return random.choice(replicas) if replicas else PRIMARY
+
+    def db_for_write(self, model, **hints):
+        _wrote.set(True)
+        return PRIMARY
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # Реплики получают схему вместе с данными из основной базы
+        return db == PRIMARY
+
+
+def sticky_seconds():
+    """
+    Окно чтения с основной базы после записи. Реплика читается, пока её отставание
+    не больше REPLICA_MAX_LAG_SECONDS, а проверяется раз в REPLICA_CHECK_INTERVAL —
+    более короткое окно нарушило бы «читаю то, что сам записал».
+    """
+    return max(
+        settings.REPLICA_STICKY_SECONDS,
+        settings.REPLICA_MAX_LAG_SECONDS + settings.REPLICA_CHECK_INTERVAL,
+    )
+
+
+class PrimaryStickinessMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        pinned_token = _pinned.set(STICKY_COOKIE in request.COOKIES)
+        wrote_token = _wrote.set(False)
+        try:
+            response = self.get_response(request)
+            wrote = _wrote.get()
+        finally:
+            _pinned.reset(pinned_token)
+            _wrote.reset(wrote_token)
+
+        if wrote and settings.DATABASE_REPLICAS:
+            response.set_cookie(
+                STICKY_COOKIE, '1',
+                max_age=sticky_seconds(),
+                httponly=True,
+                samesite='Lax',
+            )
+        return response
@@ -0,0 +1,315 @@
+import hmac
+import json
+import os
+import tempfile
+import threading
+import time
+from contextvars import ContextVar
+from pathlib import Path
+
+from django.conf import settings
+from django.core.exceptions import PermissionDenied
+from django.core.mail.backends.base import BaseEmailBackend
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.http import HttpResponse
+from django.utils.module_loading import import_string
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+
+class Registry:
+    """
+    Метрики процесса. Обновление — словарь под блокировкой, без обращений к диску.
+
+    Если задан METRICS_DIR, процесс не чаще раза в METRICS_FLUSH_INTERVAL секунд
+    сбрасывает свои накопленные значения в отдельный файл metrics-<pid>.json,
+    а /metrics складывает файлы всех воркеров. Значения монотонные, поэтому
+    файлы завершившихся воркеров тоже учитываются; каталог стоит очищать при деплое.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._metrics = {}
+        self._flushed_at = 0.0
+
+    def register(self, metric):
+        self._metrics[metric.name] = metric
+        return metric
+
+    def reset(self):
+        # Вызывается и после fork(): блокировку создаём заново, старая могла остаться захваченной
+        self._lock = threading.Lock()
+        for metric in self._metrics.values():
+            metric.samples.clear()
+        self._flushed_at = 0.0
+
+    def snapshot(self):
+        with self._lock:
+            return {name: metric.dump() for name, metric in self._metrics.items()}
+
+    def _directory(self):
+        directory = getattr(settings, 'METRICS_DIR', None)
+        return Path(directory) if directory else None
+
+    def flush(self):
+        directory = self._directory()
+        if directory is None:
+            return
+        directory.mkdir(parents=True, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.tmp-')
+        with os.fdopen(fd, 'w') as tmp:
+            json.dump(self.snapshot(), tmp)
+        os.replace(tmp_path, directory / f'metrics-{os.getpid()}.json')
+        self._flushed_at = time.monotonic()
+
+    def maybe_flush(self):
+        if time.monotonic() - self._flushed_at >= getattr(settings, 'METRICS_FLUSH_INTERVAL', 1.0):
+            self.flush()
+
+    def collect(self):
+        """Сумма значений всех процессов (или только текущего, если METRICS_DIR не задан)."""
+        directory = self._directory()
+        if directory is None:
+            return self.snapshot()
+        self.flush()
+        merged = {}
+        for path in directory.glob('metrics-*.json'):
+            try:
+                data = json.loads(path.read_text())
+            except (OSError, ValueError):
+                # Файл мог исчезнуть между glob и чтением
+                continue
+            for name, dump in data.items():
+                if name in self._metrics:
+                    self._metrics[name].merge(merged.setdefault(name, {}), dump)
+        return merged
+
+    def render(self):
+        collected = self.collect()
+        lines = []
+        for name, metric in self._metrics.items():
+            lines.append(f'# HELP {name} {metric.documentation}')
+            lines.append(f'# TYPE {name} {metric.type}')
+            lines.extend(metric.render(collected.get(name, {})))
+        return '\n'.join(lines) + '\n'
+
+
+registry = Registry()
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _format_labels(pairs):
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in pairs) + '}'
+
+
+class Metric:
+    type = None
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        # Ключ — значения меток в порядке labelnames
+        self.samples = {}
+        registry.register(self)
+
+    def _key(self, labels):
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def dump(self):
+        return {json.dumps(key): value for key, value in self.samples.items()}
+
+
+class Counter(Metric):
+    type = 'counter'
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with registry._lock:
+            self.samples[key] = self.samples.get(key, 0) + amount
+
+    def merge(self, target, dump):
+        for key, value in dump.items():
+            target[key] = target.get(key, 0) + value
+
+    def render(self, samples):
+        for key, value in sorted(samples.items()):
+            yield f'{self.name}{_format_labels(zip(self.labelnames, json.loads(key)))} {value}'
+
+
+class Histogram(Metric):
+    type = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        with registry._lock:
+            # [счётчики по корзинам (не накопительные), сумма, количество]
+            sample = self.samples.get(key)
+            if sample is None:
+                sample = self.samples[key] = [[0] * len(self.buckets), 0.0, 0]
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    sample[0][index] += 1
+                    break
+            sample[1] += value
+            sample[2] += 1
+
+    def dump(self):
+        return {json.dumps(key): [list(counts), total, count] for key, (counts, total, count) in self.samples.items()}
+
+    def merge(self, target, dump):
+        for key, (counts, total, count) in dump.items():
+            if key not in target:
+                target[key] = [[0] * len(self.buckets), 0.0, 0]
+            merged = target[key]
+            merged[0] = [a + b for a, b in zip(merged[0], counts)]
+            merged[1] += total
+            merged[2] += count
+
+    def render(self, samples):
+        for key, (counts, total, count) in sorted(samples.items()):
+            pairs = list(zip(self.labelnames, json.loads(key)))
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                yield f'{self.name}_bucket{_format_labels(pairs + [("le", bound)])} {cumulative}'
+            yield f'{self.name}_bucket{_format_labels(pairs + [("le", "+Inf")])} {count}'
+            yield f'{self.name}_sum{_format_labels(pairs)} {total}'
+            yield f'{self.name}_count{_format_labels(pairs)} {count}'
+
+
+HTTP_REQUESTS = Counter('http_requests_total', 'HTTP-запросы по имени маршрута, методу и статусу',
+                        ('view', 'method', 'status'))
+HTTP_LATENCY = Histogram('http_request_duration_seconds', 'Время обработки запроса', ('view',))
+HTTP_DB_QUERIES = Counter('http_request_db_queries_total', 'SQL-запросы, выполненные при обработке запросов',
+                          ('view',))
+DB_QUERIES = Counter('db_queries_total', 'Все SQL-запросы через ORM', ('alias',))
+DB_LATENCY = Histogram('db_query_duration_seconds', 'Время выполнения SQL-запросов', ('alias',))
+EMAILS_SENT = Counter('emails_sent_total', 'Отправленные письма', ('status',))
+EMAIL_LATENCY = Histogram('email_send_duration_seconds', 'Время отправки пачки писем', ('status',))
+CACHE_LOOKUPS = Counter('cache_lookups_total', 'Обращения к прикладным кэшам', ('cache', 'result'))
+RATELIMIT_REJECTED = Counter('ratelimit_rejected_total', 'Запросы, отклонённые ограничением частоты', ('scope',))
+
+# Сколько SQL-запросов выполнил текущий HTTP-запрос; None — вне запроса
+_request_queries = ContextVar('metrics_request_queries', default=None)
+
+
+def _db_wrapper(alias):
+    def wrapper(execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            DB_LATENCY.observe(time.perf_counter() - start, alias=alias)
+            DB_QUERIES.inc(alias=alias)
+            counter = _request_queries.get()
+            if counter is not None:
+                counter[0] += 1
+    return wrapper
+
+
+def _instrument_connection(connection):
+    if not any(getattr(wrapper, 'is_metrics_wrapper', False) for wrapper in connection.execute_wrappers):
+        wrapper = _db_wrapper(connection.alias)
+        wrapper.is_metrics_wrapper = True
+        connection.execute_wrappers.append(wrapper)
+
+
+def _on_connection_created(sender, connection, **kwargs):
+    _instrument_connection(connection)
+
+
+def install_db_instrumentation():
+    """Вешает обёртку на все текущие и будущие подключения к БД."""
+    connection_created.connect(_on_connection_created, dispatch_uid='metrics_db_instrumentation')
+    for connection in connections.all(initialized_only=True):
+        _instrument_connection(connection)
+
+
+class MetricsMiddleware:
+    """Считает запросы, время ответа и число SQL-запросов по имени маршрута."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        install_db_instrumentation()
+
+    def __call__(self, request):
+        queries = [0]
+        token = _request_queries.set(queries)
+        start = time.perf_counter()
+        status = 500
+        try:
+            response = self.get_response(request)
+            status = response.status_code
+            return response
+        finally:
+            elapsed = time.perf_counter() - start
+            _request_queries.reset(token)
+            match = getattr(request, 'resolver_match', None)
+            view = match.view_name if match else '<unresolved>'
+            HTTP_REQUESTS.inc(view=view, method=request.method, status=status)
+            HTTP_LATENCY.observe(elapsed, view=view)
+            HTTP_DB_QUERIES.inc(queries[0], view=view)
+            registry.maybe_flush()
+
+
+class InstrumentedEmailBackend(BaseEmailBackend):
+    """Обёртка над настоящим бэкендом METRICS_EMAIL_BACKEND, замеряющая отправку писем."""
+
+    def __init__(self, fail_silently=False, **kwargs):
+        super().__init__(fail_silently=fail_silently)
+        backend_class = import_string(
+            getattr(settings, 'METRICS_EMAIL_BACKEND', 'django.core.mail.backends.smtp.EmailBackend')
+        )
+        self.backend = backend_class(fail_silently=fail_silently, **kwargs)
+
+    def open(self):
+        return self.backend.open()
+
+    def close(self):
+        return self.backend.close()
+
+    def send_messages(self, email_messages):
+        start = time.perf_counter()
+        status = 'error'
+        try:
+            sent = self.backend.send_messages(email_messages)
+            status = 'ok'
+            return sent
+        finally:
+            EMAIL_LATENCY.observe(time.perf_counter() - start, status=status)
+            EMAILS_SENT.inc(len(email_messages), status=status)
+
+
+def _has_metrics_token(request):
+    token = getattr(settings, 'METRICS_TOKEN', '')
+    scheme, _, value = request.headers.get('Authorization', '').partition(' ')
+    return bool(token) and scheme.lower() == 'bearer' and hmac.compare_digest(value.encode(), token.encode())
+
+
+def metrics_view(request):
+    # Только для персонала, сборщика с токеном и явно разрешённых адресов
+    user = getattr(request, 'user', None)
+    if not (
+        (user and user.is_staff)
+        or _has_metrics_token(request)
+        or request.META.get('REMOTE_ADDR') in getattr(settings, 'METRICS_ALLOWED_IPS', ())
+    ):
+        raise PermissionDenied
+    return HttpResponse(registry.render(), content_type=CONTENT_TYPE)
+
+
+if hasattr(os, 'register_at_fork'):
+    # Воркер, порождённый fork(), не должен повторно учесть значения родителя
+    os.register_at_fork(after_in_child=registry.reset)
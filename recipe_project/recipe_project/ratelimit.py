@@ -0,0 +1,171 @@
+import math
+import time
+from functools import wraps
+
+from asgiref.sync import iscoroutinefunction
+from django.conf import settings
+from django.core import checks
+from django.core.cache import cache, caches
+from django.core.cache.backends.base import BaseCache
+from django.http import HttpResponse
+
+from .metrics import RATELIMIT_REJECTED
+
+PERIODS = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400}
+
+
+def parse_rate(rate):
+    """'5/m' -> (5, 60); допускается и '10/15m'."""
+    count, _, period = rate.partition('/')
+    multiplier = int(period[:-1] or 1)
+    return int(count), multiplier * PERIODS[period[-1]]
+
+
+def client_ip(request):
+    """
+    Адрес клиента. За обратным прокси REMOTE_ADDR — адрес самого прокси, поэтому, если
+    задан RATELIMIT_IP_HEADER (например, 'HTTP_X_FORWARDED_FOR') и запрос пришёл с адреса
+    из RATELIMIT_TRUSTED_PROXIES, берётся последний адрес из заголовка — его дописал наш прокси,
+    а всё левее мог подставить сам клиент.
+    """
+    remote_addr = request.META.get('REMOTE_ADDR', '')
+    header = getattr(settings, 'RATELIMIT_IP_HEADER', None)
+    if header and remote_addr in getattr(settings, 'RATELIMIT_TRUSTED_PROXIES', ()):
+        forwarded = request.META.get(header, '').split(',')[-1].strip()
+        if forwarded:
+            return forwarded
+    return remote_addr
+
+
+def _identity(key, user, request):
+    if key == 'user' or (key == 'user_or_ip' and user.is_authenticated):
+        return f'u{user.pk}' if user.is_authenticated else None
+    return f'ip{client_ip(request)}'
+
+
+def _keys(scope, identity, period, now):
+    window = int(now // period)
+    prefix = f'rl:{scope}:{identity}:{period}'
+    return f'{prefix}:{window}', f'{prefix}:{window - 1}', now - window * period
+
+
+# У Redis и locmem incr атомарный и не трогает срок жизни ключа. Базовый incr (файловый кэш) —
+# это get + set со сроком по умолчанию: одновременные запросы могут потерять приращение,
+# а срок приходится возвращать через touch. Проверка cache_backend_check предупреждает об этом.
+def _native_incr():
+    return type(caches['default']).incr is not BaseCache.incr
+
+
+def _incr(key, timeout):
+    # add создаёт счётчик окна вместе со сроком жизни, incr увеличивает уже существующий
+    if cache.add(key, 1, timeout):
+        return 1
+    try:
+        value = cache.incr(key)
+    except ValueError:
+        # Счётчик истёк между add и incr — окно начинается заново
+        return 1 if cache.add(key, 1, timeout) else cache.incr(key)
+    if not _native_incr():
+        cache.touch(key, timeout)
+    return value
+
+
+async def _aincr(key, timeout):
+    if await cache.aadd(key, 1, timeout):
+        return 1
+    try:
+        value = await cache.aincr(key)
+    except ValueError:
+        return 1 if await cache.aadd(key, 1, timeout) else await cache.aincr(key)
+    if not _native_incr():
+        await cache.atouch(key, timeout)
+    return value
+
+
+def cache_backend_check(app_configs, **kwargs):
+    """Проверка для check --deploy: лимиты на кэше без атомарного incr можно обойти параллельными запросами."""
+    if not getattr(settings, 'RATELIMIT_ENABLED', True) or _native_incr():
+        return []
+    return [checks.Warning(
+        f'Кэш {type(caches["default"]).__name__} не умеет атомарный incr: одновременные запросы '
+        'могут проскочить лимит частоты.',
+        hint='Для нескольких воркеров задайте REDIS_URL.',
+        id='ratelimit.W001',
+    )]
+
+
+def _retry_after(current, previous, elapsed, limit, period):
+    """
+    Скользящее окно: к счётчику текущего окна прибавляется прошлое окно с весом,
+    убывающим от 1 до 0. Возвращает None, если лимит не превышен, иначе — через
+    сколько секунд оценка опустится до лимита.
+    """
+    weight = 1 - elapsed / period
+    if previous * weight + current <= limit:
+        return None
+    if current > limit or not previous:
+        wait = period - elapsed
+    else:
+        wait = period * (1 - (limit - current) / previous) - elapsed
+    return max(1, math.ceil(wait))
+
+
+def check(scope, identity, limit, period):
+    """Учитывает запрос и возвращает Retry-After в секундах или None, если запрос разрешён."""
+    current_key, previous_key, elapsed = _keys(scope, identity, period, time.time())
+    current = _incr(current_key, period * 2)
+    previous = cache.get(previous_key, 0)
+    return _retry_after(current, previous, elapsed, limit, period)
+
+
+async def acheck(scope, identity, limit, period):
+    current_key, previous_key, elapsed = _keys(scope, identity, period, time.time())
+    current = await _aincr(current_key, period * 2)
+    previous = await cache.aget(previous_key, 0)
+    return _retry_after(current, previous, elapsed, limit, period)
+
+
+def too_many_requests(retry_after):
+    response = HttpResponse('Слишком много запросов, попробуйте позже.', status=429)
+    response['Retry-After'] = str(retry_after)
+    return response
+
+
+def ratelimit(scope, rate, key='user_or_ip', methods=('POST',)):
+    """
+    Ограничивает частоту запросов к представлению: не больше rate ('5/m', '3/h')
+    на пользователя ('user'), IP-адрес ('ip') или пользователя, а для анонимов — IP
+    ('user_or_ip'). Счётчики лежат в общем кэше, так что лимит общий для всех воркеров.
+    methods=None — считать запросы любым методом. Декораторы можно ставить друг на друга,
+    например отдельные лимиты на пользователя и на IP. Работает и с async-представлениями.
+    """
+    limit, period = parse_rate(rate)
+
+    def applies(request):
+        return getattr(settings, 'RATELIMIT_ENABLED', True) and (methods is None or request.method in methods)
+
+    def decorator(view):
+        if iscoroutinefunction(view):
+            @wraps(view)
+            async def async_wrapper(request, *args, **kwargs):
+                if applies(request):
+                    user = await request.auser() if key != 'ip' else None
+                    identity = _identity(key, user, request)
+                    retry_after = identity and await acheck(scope, identity, limit, period)
+                    if retry_after:
+                        RATELIMIT_REJECTED.inc(scope=scope)
+                        return too_many_requests(retry_after)
+                return await view(request, *args, **kwargs)
+            return async_wrapper
+
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if applies(request):
+                identity = _identity(key, request.user if key != 'ip' else None, request)
+                retry_after = identity and check(scope, identity, limit, period)
+                if retry_after:
+                    RATELIMIT_REJECTED.inc(scope=scope)
+                    return too_many_requests(retry_after)
+            return view(request, *args, **kwargs)
+        return wrapper
+    return decorator
@@ -1,3 +1,4 @@
+import os
 from pathlib import Path
 
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -9,7 +10,9 @@ DEBUG = True
 ALLOWED_HOSTS = []
 
 INSTALLED_APPS = [
-    'django.contrib.admin',
+    # Без автоматического autodiscover: admin.py приложений импортируются из urls.py,
+    # то есть при первом запросе, а не при каждом запуске manage.py
+    'django.contrib.admin.apps.SimpleAdminConfig',
     'django.contrib.auth',
     'django.contrib.contenttypes',
     'django.contrib.sessions',
@@ -20,7 +23,10 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'recipe_project.metrics.MetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
+    'recipes.page_cache.AnonymousPageCacheMiddleware',
+    'recipe_project.db_router.PrimaryStickinessMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -48,13 +54,91 @@ TEMPLATES = [
 
 WSGI_APPLICATION = 'recipe_project.wsgi.application'
 
+# Настройки SQLite для конкурентной работы: WAL не блокирует читателей во время записи,
+# busy_timeout заставляет ждать блокировку вместо мгновенного "database is locked",
+# а IMMEDIATE берёт блокировку записи сразу в начале транзакции.
+SQLITE_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'busy_timeout': 5000,
+    'mmap_size': 128 * 1024 * 1024,
+    'cache_size': -32000,
+    'temp_store': 'MEMORY',
+}
+
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        'OPTIONS': {
+            'init_command': ''.join(f'PRAGMA {name}={value};' for name, value in SQLITE_PRAGMAS.items()),
+            'transaction_mode': 'IMMEDIATE',
+            'timeout': 5,
+        },
+        'CONN_MAX_AGE': 600,
+        'CONN_HEALTH_CHECKS': True,
     }
 }
 
+# Реплики только для чтения: DJANGO_DB_REPLICAS=2 добавит replica1 и replica2.
+# Локально это копии db.sqlite3, которые обновляет команда sync_replicas.
+for _index in range(1, int(os.environ.get('DJANGO_DB_REPLICAS', '0')) + 1):
+    DATABASES[f'replica{_index}'] = {
+        **DATABASES['default'],
+        'NAME': BASE_DIR / f'db_replica{_index}.sqlite3',
+        'TEST': {'MIRROR': 'default'},
+    }
+
+DATABASE_REPLICAS = [alias for alias in DATABASES if alias != 'default']
+DATABASE_ROUTERS = ['recipe_project.db_router.ReplicaRouter']
+
+# Реплика с большим отставанием временно исключается из чтения
+REPLICA_MAX_LAG_SECONDS = 30
+REPLICA_CHECK_INTERVAL = 5
+# Сколько секунд после записи пользователь читает только с основной базы. Роутер не даёт окну
+# быть короче, чем допустимое отставание плюс интервал проверки: иначе после записи можно
+# прочитать реплику, которая её ещё не получила
+REPLICA_STICKY_SECONDS = REPLICA_MAX_LAG_SECONDS + REPLICA_CHECK_INTERVAL
+
+# Общий для всех воркеров кэш: Redis, если задан REDIS_URL, иначе файловый кэш на диске
+if os.environ.get('REDIS_URL'):
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': os.environ['REDIS_URL'],
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+            'LOCATION': BASE_DIR / '.cache',
+        }
+    }
+
+# Метрики: каждый воркер сбрасывает свои значения в METRICS_DIR, /metrics их суммирует.
+# Каталог нужно очищать при перезапуске всех воркеров. Доступ к /metrics — персоналу,
+# сборщику с заголовком «Authorization: Bearer <METRICS_TOKEN>» и адресам из METRICS_ALLOWED_IPS.
+# Адреса по умолчанию не заданы: за локальным прокси любой запрос приходит с 127.0.0.1.
+METRICS_DIR = os.environ.get('METRICS_DIR', BASE_DIR / '.metrics')
+METRICS_FLUSH_INTERVAL = 1.0
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN', '')
+METRICS_ALLOWED_IPS = [ip for ip in os.environ.get('METRICS_ALLOWED_IPS', '').split(',') if ip]
+
+# Ограничение частоты комментариев, регистраций и писем (recipe_project/ratelimit.py); счётчики — в кэше
+RATELIMIT_ENABLED = True
+# За обратным прокси: заголовок с адресом клиента (ключ request.META) и адреса прокси, которым он доверяет
+RATELIMIT_IP_HEADER = os.environ.get('RATELIMIT_IP_HEADER') or None
+RATELIMIT_TRUSTED_PROXIES = ['127.0.0.1', '::1']
+
+# Время жизни страниц в кэше для анонимных посетителей (секунды)
+PAGE_CACHE_TIMEOUT = 600
+
+# Асинхронные вход и регистрация (включаются в asgi.py): пароли хэшируются в отдельном пуле
+ASYNC_AUTH_VIEWS = os.environ.get('DJANGO_ASYNC_AUTH_VIEWS') == '1'
+PASSWORD_HASHING_WORKERS = 4
+PASSWORD_HASHING_MAX_QUEUE = 32
+
 AUTH_PASSWORD_VALIDATORS = [
     {'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator', },
     {'NAME': 'django.contrib.auth.password_validation.MinimumLengthValidator', },
@@ -73,14 +157,23 @@ STATICFILES_DIRS = [BASE_DIR / 'static']
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 AUTH_USER_MODEL = 'accounts.CustomUser'
+# Тот же ModelBackend, но асинхронный вход проверяет пароль в пуле хэширования
+AUTHENTICATION_BACKENDS = ['accounts.backends.PooledModelBackend']
 
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
 
+# Карта сайта: файлы генерирует команда generate_sitemaps, в ссылки подставляется SITE_URL
+SITE_URL = os.environ.get('SITE_URL', 'http://localhost:8000')
+SITEMAP_ROOT = BASE_DIR / 'sitemaps'
+SITEMAP_SEGMENT_SIZE = 5000
+
 LOGIN_REDIRECT_URL = 'recipe_list'
 LOGOUT_REDIRECT_URL = 'home'
 
-EMAIL_BACKEND = 'django.core.mail.backends.smtp.EmailBackend'
+# Письма уходят через обёртку, которая замеряет отправку для /metrics
+EMAIL_BACKEND = 'recipe_project.metrics.InstrumentedEmailBackend'
+METRICS_EMAIL_BACKEND = 'django.core.mail.backends.smtp.EmailBackend'
 EMAIL_HOST = 'smtp.gmail.com'
 EMAIL_PORT = 587
 EMAIL_USE_TLS = True
@@ -0,0 +1,100 @@
+import json
+import os
+import subprocess
+import sys
+import time
+from collections import defaultdict
+from pathlib import Path
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+
+# Выполняется в отдельном интерпретаторе с -X importtime: засекает django.setup()
+# и ready() каждого приложения, затем (если передано имя) загружает класс команды manage.py
+_CHILD_SCRIPT = '''
+import json, sys, time
+start = time.perf_counter()
+import django
+from django.apps.config import AppConfig
+
+ready_times = {}
+_create = AppConfig.create.__func__
+
+def create(cls, entry):
+    app_config = _create(cls, entry)
+    ready = app_config.ready
+
+    def timed_ready():
+        started = time.perf_counter()
+        ready()
+        ready_times[app_config.label] = time.perf_counter() - started
+
+    app_config.ready = timed_ready
+    return app_config
+
+AppConfig.create = classmethod(create)
+django.setup()
+setup = time.perf_counter() - start
+if sys.argv[1]:
+    from django.core.management import get_commands, load_command_class
+    load_command_class(get_commands()[sys.argv[1]], sys.argv[1])
+print(json.dumps({
+    'setup': setup,
+    'total': time.perf_counter() - start,
+    'ready': ready_times,
+    'modules': sorted(sys.modules),
+}))
+'''
+
+
+class StartupProfile:
+    """Результат одного холодного запуска: времена в секундах, импорты — (модуль, своё, суммарное, глубина)."""
+
+    def __init__(self, wall, setup, total, ready, imports, modules):
+        self.wall = wall
+        self.setup = setup
+        self.total = total
+        self.ready = ready
+        self.imports = imports
+        self.modules = set(modules)
+
+    def top_level_imports(self):
+        return sorted((item for item in self.imports if item[3] == 0), key=lambda item: -item[2])
+
+    def by_package(self):
+        """Собственное время импорта, сложенное по пакетам (django.contrib.* — по приложениям)."""
+        totals = defaultdict(float)
+        for name, own, _, _ in self.imports:
+            parts = name.split('.')
+            totals['.'.join(parts[:3] if parts[:2] == ['django', 'contrib'] else parts[:1])] += own
+        return sorted(totals.items(), key=lambda item: -item[1])
+
+
+def parse_importtime(lines):
+    imports = []
+    for line in lines:
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        own, cumulative, name = line[len('import time:'):].split('|')
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        imports.append((name.strip(), int(own) / 1e6, int(cumulative) / 1e6, depth))
+    return imports
+
+
+def profile_startup(command=''):
+    """Запускает холодный старт Django в отдельном процессе и собирает его профиль."""
+    env = {**os.environ, 'DJANGO_SETTINGS_MODULE': os.environ.get('DJANGO_SETTINGS_MODULE', 'recipe_project.settings')}
+    started = time.perf_counter()
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', _CHILD_SCRIPT, command],
+        cwd=BASE_DIR, env=env, capture_output=True, text=True,
+    )
+    wall = time.perf_counter() - started
+    if result.returncode:
+        # В stderr вперемешку строки -X importtime и трассировка — оставляем только её
+        errors = [line for line in result.stderr.splitlines() if not line.startswith('import time:')]
+        raise RuntimeError(f'Дочерний процесс завершился с кодом {result.returncode}:\n' + '\n'.join(errors))
+    data = json.loads(result.stdout.strip().splitlines()[-1])
+    return StartupProfile(
+        wall, data['setup'], data['total'], data['ready'],
+        parse_importtime(result.stderr.splitlines()), data['modules'],
+    )
@@ -1,12 +1,27 @@
 from django.contrib import admin
+from .admin_utils import AutocompleteFilter, EstimatedCountPaginator, AUTOCOMPLETE_FILTER_MEDIA
 from .models import Recipe, Category, Comment
+from .search import COMMENT_FTS_TABLE, RECIPE_FTS_TABLE, fts_enabled, fts_query, matching_ids
 
 
 @admin.register(Recipe)
 class RecipeAdmin(admin.ModelAdmin):
     list_display = ('title', 'author', 'created_at')
     search_fields = ('title', 'description')
-    list_filter = ('created_at', 'category')
+    list_filter = ('created_at', 'category', ('author', AutocompleteFilter))
+    list_select_related = ('author',)
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
+    class Media:
+        js = AUTOCOMPLETE_FILTER_MEDIA['js']
+        css = AUTOCOMPLETE_FILTER_MEDIA['css']
+
+    def get_search_results(self, request, queryset, search_term):
+        # Поиск по индексу FTS5 вместо LIKE-сканирования title/description
+        if fts_enabled() and fts_query(search_term):
+            return queryset.filter(pk__in=matching_ids(RECIPE_FTS_TABLE, search_term)), False
+        return super().get_search_results(request, queryset, search_term)
 
 
 @admin.register(Category)
@@ -19,4 +34,22 @@ class CategoryAdmin(admin.ModelAdmin):
 class CommentAdmin(admin.ModelAdmin):
     list_display = ('user', 'recipe', 'created_at')
     search_fields = ('text', 'user__username', 'recipe__title')
-    list_filter = ('created_at', 'user')
+    list_filter = ('created_at', ('user', AutocompleteFilter), ('recipe', AutocompleteFilter))
+    list_select_related = ('user', 'recipe')
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
+    class Media:
+        js = AUTOCOMPLETE_FILTER_MEDIA['js']
+        css = AUTOCOMPLETE_FILTER_MEDIA['css']
+
+    def get_search_results(self, request, queryset, search_term):
+        # Текст и название рецепта — по индексам FTS5, автор — точным совпадением по индексу username
+        if fts_enabled() and fts_query(search_term):
+            matches = (
+                queryset.filter(pk__in=matching_ids(COMMENT_FTS_TABLE, search_term))
+                | queryset.filter(recipe_id__in=matching_ids(RECIPE_FTS_TABLE, search_term))
+                | queryset.filter(user__username=search_term.strip())
+            )
+            return matches, False
+        return super().get_search_results(request, queryset, search_term)
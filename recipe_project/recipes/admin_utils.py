@@ -0,0 +1,107 @@
+from django.contrib import admin
+from django.core.paginator import Paginator
+from django.db import connections
+from django.urls import reverse
+from django.utils.functional import cached_property
+
+
+def estimate_row_count(model, using):
+    """Дешёвая оценка числа строк таблицы без COUNT(*); None, если СУБД её не даёт."""
+    connection = connections[using]
+    table = model._meta.db_table
+    with connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            cursor.execute('SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass', [table])
+        elif connection.vendor == 'mysql':
+            cursor.execute(
+                'SELECT table_rows FROM information_schema.tables WHERE table_schema = DATABASE() AND table_name = %s',
+                [table],
+            )
+        elif connection.vendor == 'sqlite':
+            # Статистика ANALYZE: первое число в stat — строк в таблице на момент сбора.
+            # Пока ANALYZE не запускали, таблицы sqlite_stat1 нет и считаем точно
+            cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'sqlite_stat1'")
+            if cursor.fetchone() is None:
+                return None
+            cursor.execute("SELECT CAST(stat AS INTEGER) FROM sqlite_stat1 WHERE tbl = %s LIMIT 1", [table])
+        else:
+            return None
+        row = cursor.fetchone()
+    if row is None or row[0] is None or row[0] < 0:
+        return None
+    return int(row[0])
+
+
+class EstimatedCountPaginator(Paginator):
+    """
+    Для нефильтрованного списка большой таблицы берёт оценку числа строк
+    вместо COUNT(*). Отфильтрованные списки считаются точно.
+    """
+    estimate_threshold = 10000
+    is_estimate = False
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        if hasattr(queryset, 'query') and not queryset.query.has_filters():
+            estimate = estimate_row_count(queryset.model, queryset.db)
+            if estimate is not None and estimate >= self.estimate_threshold:
+                self.is_estimate = True
+                return estimate
+        return super().count
+
+    def page(self, number):
+        page = super().page(number)
+        # Статистика могла устареть после удалений: неполная страница значит, что строки
+        # кончились раньше оценки. Тогда считаем точно, чтобы не ссылаться на пустые страницы
+        if self.is_estimate and len(page.object_list) < self.per_page:
+            self.is_estimate = False
+            self.__dict__['count'] = Paginator.count.func(self)
+            self.__dict__.pop('num_pages', None)
+            page = super().page(number)
+        return page
+
+
+class AutocompleteFilter(admin.RelatedFieldListFilter):
+    """
+    Фильтр по внешнему ключу с автодополнением: вместо списка всех
+    связанных объектов выводится поле поиска на базе admin autocomplete.
+    Связанная модель должна быть зарегистрирована в админке с search_fields.
+    """
+    template = 'admin/autocomplete_filter.html'
+
+    def __init__(self, field, request, params, model, model_admin, field_path):
+        super().__init__(field, request, params, model, model_admin, field_path)
+        self.source_app_label = model._meta.app_label
+        self.source_model_name = model._meta.model_name
+        self.source_field_name = field.name
+
+    def field_choices(self, field, request, model_admin):
+        # Подгружаем только выбранные значения, а не всю таблицу
+        if not self.lookup_val:
+            return []
+        return field.get_choices(include_blank=False, limit_choices_to={'pk__in': self.lookup_val})
+
+    def has_output(self):
+        return True
+
+    @property
+    def autocomplete_url(self):
+        return reverse('admin:autocomplete')
+
+
+AUTOCOMPLETE_FILTER_MEDIA = {
+    'js': (
+        'admin/js/vendor/jquery/jquery.js',
+        'admin/js/vendor/select2/select2.full.js',
+        'admin/js/jquery.init.js',
+        'admin/js/autocomplete.js',
+        'js/admin_autocomplete_filter.js',
+    ),
+    'css': {
+        'screen': (
+            'admin/css/vendor/select2/select2.css',
+            'admin/css/autocomplete.css',
+        ),
+    },
+}
@@ -4,3 +4,12 @@ from django.apps import AppConfig
 class RecipesConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'recipes'
+
+    def ready(self):
+        from django.core import checks
+
+        from recipe_project.ratelimit import cache_backend_check
+
+        from . import signals  # noqa: F401
+
+        checks.register(cache_backend_check, checks.Tags.caches, deploy=True)
@@ -0,0 +1,167 @@
+import hashlib
+import random
+import re
+import struct
+
+from django.conf import settings
+from django.db.models import Q
+
+from .models import Recipe, RecipeLSHBucket
+
+# 64 хэш-функции по 32 бита — 256 байт на рецепт. 16 полос по 4 строки: пара с
+# похожестью (по Жаккару) 0.6 попадает хотя бы в одну общую корзину с вероятностью ~0.9,
+# а пара с похожестью 0.3 — лишь ~0.12
+NUM_PERM = 64
+BANDS = 16
+ROWS = NUM_PERM // BANDS
+SHINGLE_SIZE = 3
+DUPLICATE_THRESHOLD = getattr(settings, 'DUPLICATE_THRESHOLD', 0.6)
+# Огромная корзина — обычно шаблонный текст («рецепт скоро будет»); сравниваем в ней только
+# первые MAX_BUCKET_SIZE рецептов, настоящие дубликаты найдутся и по другим полосам
+MAX_BUCKET_SIZE = getattr(settings, 'DEDUP_MAX_BUCKET_SIZE', 200)
+
+_MERSENNE_PRIME = (1 << 61) - 1
+_MASK_32 = (1 << 32) - 1
+_rng = random.Random(20240601)
+# Параметры хэш-функций фиксированы: подписи, посчитанные в разное время, должны быть сравнимы
+_PERMUTATIONS = [(_rng.randrange(1, _MERSENNE_PRIME), _rng.randrange(0, _MERSENNE_PRIME)) for _ in range(NUM_PERM)]
+_SIGNATURE_FORMAT = f'<{NUM_PERM}I'
+
+
+def _shingles(text):
+    words = re.findall(r'\w+', text.lower())
+    if len(words) < SHINGLE_SIZE:
+        return {' '.join(words)} if words else set()
+    return {' '.join(words[i:i + SHINGLE_SIZE]) for i in range(len(words) - SHINGLE_SIZE + 1)}
+
+
+def recipe_text(title, description, ingredients):
+    return f'{title}\n{description}\n{ingredients}'
+
+
+def compute_signature(text):
+    """MinHash-подпись текста (кортеж из NUM_PERM чисел) или None для пустого текста."""
+    hashes = [
+        int.from_bytes(hashlib.blake2b(shingle.encode(), digest_size=8).digest(), 'little')
+        for shingle in _shingles(text)
+    ]
+    if not hashes:
+        return None
+    return tuple(
+        min((a * value + b) % _MERSENNE_PRIME for value in hashes) & _MASK_32
+        for a, b in _PERMUTATIONS
+    )
+
+
+def pack_signature(signature):
+    return struct.pack(_SIGNATURE_FORMAT, *signature) if signature else None
+
+
+def unpack_signature(data):
+    return struct.unpack(_SIGNATURE_FORMAT, bytes(data)) if data else None
+
+
+def similarity(first, second):
+    """Оценка похожести по Жаккару — доля совпавших позиций подписей."""
+    return sum(a == b for a, b in zip(first, second)) / NUM_PERM
+
+
+def band_buckets(signature):
+    """Номер корзины для каждой полосы: 8 байт хэша полосы как знаковое целое."""
+    buckets = []
+    for band in range(BANDS):
+        rows = struct.pack(f'<{ROWS}I', *signature[band * ROWS:(band + 1) * ROWS])
+        digest = hashlib.blake2b(rows, digest_size=8, person=band.to_bytes(2, 'little')).digest()
+        buckets.append((band, int.from_bytes(digest, 'little', signed=True)))
+    return buckets
+
+
+def index_signature(recipe_id, signature):
+    RecipeLSHBucket.objects.filter(recipe_id=recipe_id).delete()
+    if signature:
+        RecipeLSHBucket.objects.bulk_create(
+            [RecipeLSHBucket(recipe_id=recipe_id, band=band, bucket=bucket) for band, bucket in band_buckets(signature)]
+        )
+
+
+def find_duplicates(signature, exclude_pk=None, threshold=DUPLICATE_THRESHOLD, limit=5):
+    """
+    Рецепты, похожие на подпись: кандидаты берутся из тех же LSH-корзин
+    (BANDS поисков по индексу, каждый не больше MAX_BUCKET_SIZE строк — без
+    перебора каталога), затем их подписи сравниваются напрямую.
+    Возвращает [(рецепт, похожесть)] по убыванию похожести.
+    """
+    if not signature:
+        return []
+    condition = Q()
+    for band, bucket in band_buckets(signature):
+        # Своя подвыборка с LIMIT на каждую корзину: огромная корзина не раздувает список кандидатов
+        members = (
+            RecipeLSHBucket.objects.filter(band=band, bucket=bucket)
+            .order_by('recipe_id')
+            .values('recipe_id')[:MAX_BUCKET_SIZE]
+        )
+        condition |= Q(pk__in=members)
+    candidates = Recipe.objects.filter(condition).only('pk', 'title', 'minhash')
+    if exclude_pk is not None:
+        candidates = candidates.exclude(pk=exclude_pk)
+
+    matches = []
+    for recipe in candidates:
+        score = similarity(signature, unpack_signature(recipe.minhash) or ())
+        if score >= threshold:
+            matches.append((recipe, score))
+    matches.sort(key=lambda match: -match[1])
+    return matches[:limit]
+
+
+def candidate_buckets():
+    """
+    Рецепты каждой корзины, где их больше одного. Корзины читаются потоком в порядке
+    (band, bucket) по индексу; в памяти — только текущая, не больше MAX_BUCKET_SIZE рецептов.
+    """
+    current, members = None, []
+    rows = RecipeLSHBucket.objects.order_by('band', 'bucket', 'recipe_id').values_list('band', 'bucket', 'recipe_id')
+    for band, bucket, recipe_id in rows.iterator(chunk_size=2000):
+        if (band, bucket) != current:
+            if len(members) > 1:
+                yield members
+            current, members = (band, bucket), []
+        if len(members) < MAX_BUCKET_SIZE:
+            members.append(recipe_id)
+    if len(members) > 1:
+        yield members
+
+
+def find_clusters(threshold=DUPLICATE_THRESHOLD):
+    """
+    Группы почти-дубликатов по всему каталогу. Пары кандидатов проверяются прямо
+    по ходу чтения корзин и объединяются union-find; пара, уже попавшая в одну группу,
+    не сравнивается повторно. Подписи держатся упакованными (256 байт на рецепт).
+    """
+    packed = dict(
+        Recipe.objects.filter(minhash__isnull=False).values_list('pk', 'minhash').iterator(chunk_size=2000)
+    )
+
+    parent = {}
+
+    def root(pk):
+        parent.setdefault(pk, pk)
+        while parent[pk] != pk:
+            parent[pk] = parent[parent[pk]]
+            pk = parent[pk]
+        return pk
+
+    for members in candidate_buckets():
+        for index, first in enumerate(members):
+            for second in members[index + 1:]:
+                if root(first) == root(second):
+                    continue
+                signatures = unpack_signature(packed.get(first)), unpack_signature(packed.get(second))
+                if all(signatures) and similarity(*signatures) >= threshold:
+                    parent[root(first)] = root(second)
+
+    clusters = {}
+    for pk in parent:
+        clusters.setdefault(root(pk), []).append(pk)
+    return sorted((sorted(members) for members in clusters.values() if len(members) > 1), key=lambda c: c[0])
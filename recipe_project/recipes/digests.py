@@ -0,0 +1,111 @@
+from django.conf import settings
+from django.core.mail import EmailMultiAlternatives
+from django.db.models import F, Max
+from django.template.loader import get_template
+from django.utils import timezone
+
+from .models import AuthorDigestState, Comment, DigestCheckpoint
+
+CHECKPOINT_NAME = 'comment_digest'
+TEMPLATE_NAME = 'recipes/comment_digest_email.html'
+SUBJECT = 'Новые комментарии к вашим рецептам на RecipeBook'
+
+
+class AuthorDigest:
+    """Новые комментарии к рецептам одного автора, сгруппированные по рецептам."""
+
+    def __init__(self, author):
+        self.author = author
+        self.recipes = {}
+        self.last_comment_id = 0
+        self.count = 0
+
+    def add(self, comment):
+        entry = self.recipes.setdefault(comment.recipe_id, {'recipe': comment.recipe, 'comments': []})
+        entry['comments'].append(comment)
+        self.last_comment_id = max(self.last_comment_id, comment.pk)
+        self.count += 1
+
+
+def latest_comment_id():
+    return Comment.objects.aggregate(last=Max('pk'))['last'] or 0
+
+
+def get_checkpoint(initial_id):
+    """
+    Общая отметка рассылки. При первом запуске она ставится на initial_id
+    (последний существующий комментарий), чтобы авторы не получили письмо за всю историю.
+    """
+    checkpoint, _ = DigestCheckpoint.objects.get_or_create(
+        name=CHECKPOINT_NAME, defaults={'last_comment_id': initial_id},
+    )
+    return checkpoint
+
+
+def collect_digests(since_id, upto_id):
+    """
+    Комментарии с pk в (since_id, upto_id] одним запросом, сгруппированные по автору
+    рецепта; ещё один запрос — отметки авторов, уже получивших часть этих комментариев.
+    Свои комментарии к своим рецептам и авторы без email пропускаются.
+    """
+    comments = (
+        Comment.objects.filter(pk__gt=since_id, pk__lte=upto_id, recipe__author__is_active=True)
+        .exclude(user_id=F('recipe__author_id'))
+        .exclude(recipe__author__email='')
+        .select_related('user', 'recipe__author')
+        .only('pk', 'text', 'created_at', 'recipe_id', 'user__username',
+              'recipe__title', 'recipe__author__username', 'recipe__author__email')
+        .order_by('recipe__author_id', 'recipe_id', 'pk')
+    )
+    digests = {}
+    for comment in comments.iterator(chunk_size=1000):
+        author = comment.recipe.author
+        digests.setdefault(author.pk, AuthorDigest(author)).add(comment)
+
+    sent_up_to = dict(
+        AuthorDigestState.objects.filter(author_id__in=digests, last_comment_id__gt=since_id)
+        .values_list('author_id', 'last_comment_id')
+    )
+    result = []
+    for author_id, digest in digests.items():
+        if author_id in sent_up_to:
+            # Часть комментариев уже ушла в прошлый (прерванный) запуск
+            fresh = AuthorDigest(digest.author)
+            for entry in digest.recipes.values():
+                for comment in entry['comments']:
+                    if comment.pk > sent_up_to[author_id]:
+                        fresh.add(comment)
+            digest = fresh
+        if digest.count:
+            result.append(digest)
+    return result
+
+
+def build_message(template, digest, connection):
+    body = template.render({
+        'author': digest.author,
+        'recipes': list(digest.recipes.values()),
+        'count': digest.count,
+        'site_url': settings.SITE_URL.rstrip('/'),
+    })
+    message = EmailMultiAlternatives(
+        SUBJECT, body, settings.DEFAULT_FROM_EMAIL, [digest.author.email], connection=connection,
+    )
+    message.attach_alternative(body, 'text/html')
+    return message
+
+
+def mark_sent(digests):
+    now = timezone.now()
+    AuthorDigestState.objects.bulk_create(
+        [AuthorDigestState(author_id=digest.author.pk, last_comment_id=digest.last_comment_id, sent_at=now)
+         for digest in digests],
+        update_conflicts=True,
+        unique_fields=['author'],
+        update_fields=['last_comment_id', 'sent_at'],
+    )
+
+
+def load_template():
+    # Шаблон компилируется один раз за запуск и рендерится для каждого автора
+    return get_template(TEMPLATE_NAME)
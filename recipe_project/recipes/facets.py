@@ -0,0 +1,245 @@
+import hashlib
+import uuid
+from collections import Counter
+from datetime import timedelta
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db.models import Case, Count, IntegerField, Q, Value, When
+from django.utils import timezone
+from django.utils.http import urlencode
+
+from recipe_project.metrics import CACHE_LOOKUPS
+
+from .reference_cache import category_cache
+
+FACET_CACHE_TIMEOUT = getattr(settings, 'FACET_CACHE_TIMEOUT', 300)
+VERSION_KEY = 'facets:version'
+AUTHOR_FACET_SIZE = 10
+
+# Периоды вложены друг в друга: рецепт за неделю входит и в «за месяц», и в «за год»
+PERIODS = (
+    ('week', 'За неделю', 7),
+    ('month', 'За месяц', 30),
+    ('year', 'За год', 365),
+)
+PERIOD_DAYS = {name: days for name, _, days in PERIODS}
+PERIOD_INDEX = {name: index for index, (name, _, _) in enumerate(PERIODS)}
+
+HAS_IMAGE = Q(image__isnull=False) & ~Q(image='')
+
+# Фасеты со счётчиками и текстовые фильтры без них; порядок задаёт порядок параметров в ссылках
+FACET_PARAMS = ('category', 'author', 'has_image', 'period')
+TEXT_PARAMS = ('q', 'ingredient')
+FILTER_PARAMS = FACET_PARAMS + TEXT_PARAMS
+
+# Сортировки списка; «top» идёт по индексу recipe_rating_score_idx
+SORTS = (
+    ('new', 'Новые', ('-created_at', '-pk')),
+    ('top', 'Лучшие', ('-rating_score', '-rating_count', '-pk')),
+)
+SORT_ORDERING = {name: ordering for name, _, ordering in SORTS}
+DEFAULT_SORT = 'new'
+QUERY_PARAMS = FILTER_PARAMS + ('sort',)
+
+
+def _int_or_none(value):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+class FacetFilters:
+    """Фильтры списка рецептов из GET-параметров; неверные значения игнорируются."""
+
+    def __init__(self, query_dict):
+        self.category = _int_or_none(query_dict.get('category'))
+        self.author = _int_or_none(query_dict.get('author'))
+        has_image = query_dict.get('has_image')
+        self.has_image = has_image if has_image in ('0', '1') else None
+        period = query_dict.get('period')
+        self.period = period if period in PERIOD_DAYS else None
+        self.q = query_dict.get('q', '').strip()
+        self.ingredient = query_dict.get('ingredient', '').strip()
+        sort = query_dict.get('sort')
+        self.sort = sort if sort in SORT_ORDERING and sort != DEFAULT_SORT else None
+
+    @property
+    def ordering(self):
+        return SORT_ORDERING[self.sort or DEFAULT_SORT]
+
+    def params(self):
+        values = {name: getattr(self, name) for name in QUERY_PARAMS}
+        return {name: str(value) for name, value in values.items() if value not in (None, '')}
+
+    def querystring(self, **overrides):
+        """Строка запроса с текущими фильтрами; значение None в overrides убирает параметр."""
+        params = {**self.params(), **overrides}
+        return urlencode([(name, params[name]) for name in QUERY_PARAMS if params.get(name) not in (None, '')])
+
+    def apply_text(self, queryset):
+        if self.q:
+            queryset = queryset.filter(title__icontains=self.q)
+        if self.ingredient:
+            queryset = queryset.filter(ingredients__icontains=self.ingredient)
+        return queryset
+
+    def apply(self, queryset):
+        queryset = self.apply_text(queryset)
+        if self.category is not None:
+            queryset = queryset.filter(category_id=self.category)
+        if self.author is not None:
+            queryset = queryset.filter(author_id=self.author)
+        if self.has_image == '1':
+            queryset = queryset.filter(HAS_IMAGE)
+        elif self.has_image == '0':
+            queryset = queryset.exclude(HAS_IMAGE)
+        if self.period:
+            queryset = queryset.filter(created_at__gte=timezone.now() - timedelta(days=PERIOD_DAYS[self.period]))
+        return queryset
+
+    def cache_key(self):
+        # Сортировка на счётчики не влияет
+        raw = self.querystring(sort=None)
+        return f'facets:counts:{_current_version()}:{hashlib.md5(raw.encode()).hexdigest()}'
+
+
+def _current_version():
+    version = cache.get(VERSION_KEY)
+    if version is None:
+        version = uuid.uuid4().hex
+        if not cache.add(VERSION_KEY, version, timeout=None):
+            version = cache.get(VERSION_KEY, version)
+    return version
+
+
+def invalidate():
+    """Сбрасывает все закэшированные счётчики; вызывается сигналами после коммита."""
+    cache.set(VERSION_KEY, uuid.uuid4().hex, timeout=None)
+
+
+def _facet_rows(queryset):
+    """
+    Один сгруппированный запрос: число рецептов для каждого сочетания
+    (категория, автор, есть ли фото, давность). Все счётчики фасетов
+    потом складываются из этих строк в Python.
+    """
+    now = timezone.now()
+    period_bucket = Case(
+        *(When(created_at__gte=now - timedelta(days=days), then=Value(index))
+          for index, (_, _, days) in enumerate(PERIODS)),
+        default=Value(len(PERIODS)),
+        output_field=IntegerField(),
+    )
+    with_image = Case(When(HAS_IMAGE, then=Value(1)), default=Value(0), output_field=IntegerField())
+    return list(
+        queryset.annotate(period_bucket=period_bucket, with_image=with_image)
+        .values_list('category_id', 'author_id', 'with_image', 'period_bucket')
+        .annotate(count=Count('pk'))
+        .order_by()
+    )
+
+
+def _row_matches(filters, row, skip):
+    category_id, author_id, with_image, period_bucket, _ = row
+    period_index = PERIOD_INDEX.get(filters.period)
+    checks = {
+        'category': filters.category is None or category_id == filters.category,
+        'author': filters.author is None or author_id == filters.author,
+        'has_image': filters.has_image is None or str(with_image) == filters.has_image,
+        'period': period_index is None or period_bucket <= period_index,
+    }
+    return all(passed for name, passed in checks.items() if name != skip)
+
+
+def compute_counts(filters, queryset):
+    """
+    Счётчики для каждого значения каждого фасета. Для фасета учитываются все
+    остальные выбранные фильтры, но не он сам — так видно, сколько рецептов
+    станет при выборе другого значения.
+    """
+    rows = _facet_rows(filters.apply_text(queryset))
+    counts = {name: Counter() for name in FACET_PARAMS}
+    for row in rows:
+        category_id, author_id, with_image, period_bucket, count = row
+        if _row_matches(filters, row, skip='category'):
+            counts['category'][category_id] += count
+        if _row_matches(filters, row, skip='author'):
+            counts['author'][author_id] += count
+        if _row_matches(filters, row, skip='has_image'):
+            counts['has_image'][str(with_image)] += count
+        if _row_matches(filters, row, skip='period'):
+            for name, index in PERIOD_INDEX.items():
+                if period_bucket <= index:
+                    counts['period'][name] += count
+
+    top_authors = [author_id for author_id, _ in counts['author'].most_common(AUTHOR_FACET_SIZE)]
+    if filters.author is not None and filters.author not in top_authors:
+        top_authors.append(filters.author)
+    usernames = dict(get_user_model().objects.filter(pk__in=top_authors).values_list('pk', 'username'))
+    return {
+        'category': dict(counts['category']),
+        'author': [(author_id, usernames[author_id], counts['author'][author_id])
+                   for author_id in top_authors if author_id in usernames],
+        'has_image': dict(counts['has_image']),
+        'period': dict(counts['period']),
+    }
+
+
+def get_counts(filters, queryset):
+    key = filters.cache_key()
+    counts = cache.get(key)
+    if counts is None:
+        CACHE_LOOKUPS.inc(cache='facets', result='miss')
+        counts = compute_counts(filters, queryset)
+        cache.set(key, counts, FACET_CACHE_TIMEOUT)
+    else:
+        CACHE_LOOKUPS.inc(cache='facets', result='hit')
+    return counts
+
+
+def _option(filters, name, value, label, count):
+    active = str(getattr(filters, name)) == str(value)
+    return {
+        'label': label,
+        'count': count,
+        'active': active,
+        'url': '?' + filters.querystring(**{name: None if active else value}),
+    }
+
+
+def build_facets(filters, queryset):
+    """Данные для шаблона: по каждому фасету — список вариантов со ссылкой, счётчиком и признаком выбора."""
+    counts = get_counts(filters, queryset)
+    categories = [
+        _option(filters, 'category', category.pk, category.name, counts['category'].get(category.pk, 0))
+        for category in category_cache.all()
+        if counts['category'].get(category.pk) or filters.category == category.pk
+    ]
+    authors = [_option(filters, 'author', author_id, username, count)
+               for author_id, username, count in counts['author']]
+    images = [
+        _option(filters, 'has_image', '1', 'С фото', counts['has_image'].get('1', 0)),
+        _option(filters, 'has_image', '0', 'Без фото', counts['has_image'].get('0', 0)),
+    ]
+    periods = [_option(filters, 'period', name, label, counts['period'].get(name, 0)) for name, label, _ in PERIODS]
+    return [
+        {'title': 'Категория', 'options': categories},
+        {'title': 'Автор', 'options': authors},
+        {'title': 'Фото', 'options': images},
+        {'title': 'Дата', 'options': periods},
+    ]
+
+
+def build_sort_options(filters):
+    current = filters.sort or DEFAULT_SORT
+    return [
+        {
+            'label': label,
+            'active': name == current,
+            'url': '?' + filters.querystring(sort=None if name == DEFAULT_SORT else name),
+        }
+        for name, label, _ in SORTS
+    ]
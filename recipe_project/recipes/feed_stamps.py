@@ -0,0 +1,25 @@
+import time
+
+from django.core.cache import cache
+
+# Метки изменения лент живут отдельно от feeds.py: их трогают сигналы при каждом запуске,
+# а feeds.py тянет за собой syndication и xml.sax, нужные только при отдаче лент
+
+
+def stamp_key(scope_key):
+    return f'feeds:stamp:{scope_key}'
+
+
+def author_key(username):
+    return f'feeds:author:{username}'
+
+
+def forget_author(username):
+    """Сбрасывает закэшированный id автора ленты; вызывается при сохранении/удалении пользователя."""
+    cache.delete(author_key(username))
+
+
+def touch_feeds(*scope_keys):
+    """Отмечает, что ленты изменились; вызывается сигналами при сохранении/удалении рецептов."""
+    now = time.time()
+    cache.set_many({stamp_key(key): now for key in scope_keys}, timeout=None)
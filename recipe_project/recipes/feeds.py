@@ -0,0 +1,196 @@
+import hashlib
+from datetime import datetime, timezone as dt_timezone
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.syndication.views import Feed
+from django.core.cache import cache
+from django.http import Http404, HttpResponse, JsonResponse
+from django.urls import reverse
+from django.utils.feedgenerator import Atom1Feed
+from django.views.decorators.http import condition
+
+from recipe_project.metrics import CACHE_LOOKUPS
+
+from .feed_stamps import author_key, stamp_key
+from .models import Recipe
+from .reference_cache import category_cache
+
+FEED_SIZE = 20
+FEED_CACHE_TIMEOUT = getattr(settings, 'FEED_CACHE_TIMEOUT', 3600)
+
+
+def _author_id(username):
+    # id по имени кэшируется (0 — нет такого пользователя), чтобы условный запрос ленты
+    # автора обходился без БД, как и остальные ленты
+    key = author_key(username)
+    author_id = cache.get(key)
+    if author_id is None:
+        author_id = get_user_model().objects.filter(username=username).values_list('pk', flat=True).first() or 0
+        cache.set(key, author_id, FEED_CACHE_TIMEOUT)
+    return author_id
+
+
+class FeedScope:
+    """Что попадает в ленту: все рецепты, одна категория или один автор."""
+
+    def __init__(self, key, title, link, filters):
+        self.key = key
+        self.title = title
+        self.link = link
+        self.filters = filters
+
+    @classmethod
+    def from_kwargs(cls, category_id=None, username=None):
+        if category_id is not None:
+            category = category_cache.get(category_id)
+            if category is None:
+                raise Http404
+            return cls(
+                f'category:{category.pk}',
+                f'RecipeBook — {category.name}',
+                f"{reverse('recipe_list')}?category={category.pk}",
+                {'category_id': category.pk},
+            )
+        if username is not None:
+            author_id = _author_id(username)
+            if not author_id:
+                raise Http404
+            return cls(f'author:{author_id}', f'RecipeBook — рецепты {username}', reverse('recipe_list'),
+                       {'author_id': author_id})
+        return cls('all', 'RecipeBook — новые рецепты', reverse('recipe_list'), {})
+
+    def recipes(self):
+        return (
+            Recipe.objects.filter(**self.filters)
+            .select_related('author', 'category')
+            .only('pk', 'title', 'description', 'created_at', 'author__username', 'category__name')
+            .order_by('-created_at', '-pk')[:FEED_SIZE]
+            .iterator()
+        )
+
+
+def _get_stamp(request, scope):
+    # Метку читаем один раз за запрос: она нужна и для ETag, и для Last-Modified, и для ключа кэша
+    if getattr(request, '_feed_stamp', None) is None:
+        stamp = cache.get(stamp_key(scope.key))
+        if stamp is None:
+            latest = Recipe.objects.filter(**scope.filters).order_by('-created_at').values_list(
+                'created_at', flat=True).first()
+            stamp = latest.timestamp() if latest else 0.0
+            cache.add(stamp_key(scope.key), stamp, timeout=None)
+        request._feed_stamp = stamp
+    return request._feed_stamp
+
+
+def _get_scope(request, kwargs):
+    if getattr(request, '_feed_scope', None) is None:
+        request._feed_scope = FeedScope.from_kwargs(**kwargs)
+    return request._feed_scope
+
+
+def cached_feed(view, fmt):
+    """
+    Оборачивает ленту: ETag и Last-Modified строятся по метке изменения ленты
+    (без запросов к БД), поэтому клиенты между публикациями получают 304,
+    а сам ответ кэшируется до следующего изменения.
+    """
+    def etag(request, **kwargs):
+        scope = _get_scope(request, kwargs)
+        raw = f'{fmt}:{scope.key}:{_get_stamp(request, scope)}'
+        return hashlib.md5(raw.encode()).hexdigest()
+
+    def last_modified(request, **kwargs):
+        stamp = _get_stamp(request, _get_scope(request, kwargs))
+        return datetime.fromtimestamp(stamp, tz=dt_timezone.utc)
+
+    @condition(etag_func=etag, last_modified_func=last_modified)
+    def wrapper(request, **kwargs):
+        scope = _get_scope(request, kwargs)
+        # Абсолютные ссылки в теле строятся от Host, поэтому он входит в ключ (допустимые — ALLOWED_HOSTS)
+        key = f'feeds:body:{fmt}:{request.get_host()}:{scope.key}:{_get_stamp(request, scope)}'
+        cached = cache.get(key)
+        if cached is not None:
+            CACHE_LOOKUPS.inc(cache='feeds', result='hit')
+            return HttpResponse(cached['content'], content_type=cached['content_type'])
+
+        CACHE_LOOKUPS.inc(cache='feeds', result='miss')
+        response = view(request, **kwargs)
+        if response.status_code == 200:
+            cache.set(key, {'content': response.content, 'content_type': response['Content-Type']},
+                      FEED_CACHE_TIMEOUT)
+        return response
+
+    return wrapper
+
+
+class LatestRecipesFeed(Feed):
+    description = 'Новые рецепты на RecipeBook'
+
+    def get_object(self, request, **kwargs):
+        return _get_scope(request, kwargs)
+
+    def title(self, scope):
+        return scope.title
+
+    def link(self, scope):
+        return scope.link
+
+    def items(self, scope):
+        return scope.recipes()
+
+    def item_title(self, recipe):
+        return recipe.title
+
+    def item_description(self, recipe):
+        return recipe.description
+
+    def item_pubdate(self, recipe):
+        return recipe.created_at
+
+    def item_author_name(self, recipe):
+        return recipe.author.username
+
+    def item_categories(self, recipe):
+        return [recipe.category.name] if recipe.category else []
+
+    def item_link(self, recipe):
+        return reverse('recipe_detail', args=[recipe.pk])
+
+
+class LatestRecipesAtomFeed(LatestRecipesFeed):
+    feed_type = Atom1Feed
+    subtitle = LatestRecipesFeed.description
+
+
+def json_feed(request, **kwargs):
+    # Формат JSON Feed 1.1 (https://jsonfeed.org/version/1.1)
+    scope = _get_scope(request, kwargs)
+    items = []
+    for recipe in scope.recipes():
+        items.append({
+            'id': str(recipe.pk),
+            'url': request.build_absolute_uri(reverse('recipe_detail', args=[recipe.pk])),
+            'title': recipe.title,
+            'content_text': recipe.description,
+            'date_published': recipe.created_at.isoformat(),
+            'authors': [{'name': recipe.author.username}],
+            'tags': [recipe.category.name] if recipe.category else [],
+        })
+    return JsonResponse(
+        {
+            'version': 'https://jsonfeed.org/version/1.1',
+            'title': scope.title,
+            'home_page_url': request.build_absolute_uri(scope.link),
+            # Адрес ленты без строки запроса: тело кэшируется и отдаётся всем клиентам
+            'feed_url': request.build_absolute_uri(reverse(request.resolver_match.view_name, kwargs=kwargs)),
+            'items': items,
+        },
+        content_type='application/feed+json',
+        json_dumps_params={'ensure_ascii': False},
+    )
+
+
+rss_feed = cached_feed(LatestRecipesFeed(), 'rss')
+atom_feed = cached_feed(LatestRecipesAtomFeed(), 'atom')
+json_feed_view = cached_feed(json_feed, 'json')
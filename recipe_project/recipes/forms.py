@@ -1,12 +1,50 @@
 from django import forms
-from .models import Recipe, Comment, Step
-from django.forms.models import inlineformset_factory
+from .models import Recipe, Collection, Comment, Step, Category
+from .reference_cache import category_cache
+from django.forms.models import inlineformset_factory, ModelChoiceIterator
+
+
+class CachedModelChoiceIterator(ModelChoiceIterator):
+    # Варианты берутся из кэша справочника, а не из queryset
+    def __iter__(self):
+        if self.field.empty_label is not None:
+            yield ("", self.field.empty_label)
+        for obj in self.field.reference_cache.all():
+            yield self.choice(obj)
+
+    def __len__(self):
+        return len(self.field.reference_cache.all()) + (self.field.empty_label is not None)
+
+    def __bool__(self):
+        return self.field.empty_label is not None or bool(self.field.reference_cache.all())
+
+
+class CachedModelChoiceField(forms.ModelChoiceField):
+    iterator = CachedModelChoiceIterator
+
+    def __init__(self, reference_cache, **kwargs):
+        self.reference_cache = reference_cache
+        super().__init__(**kwargs)
+
+    def to_python(self, value):
+        if value in self.empty_values:
+            return None
+        obj = self.reference_cache.get(value)
+        if obj is None:
+            raise forms.ValidationError(
+                self.error_messages['invalid_choice'],
+                code='invalid_choice',
+                params={'value': value},
+            )
+        return obj
 
 
 class RecipeForm(forms.ModelForm):
+    category = CachedModelChoiceField(category_cache, queryset=Category.objects.all(), label="Категория")
+
     class Meta:
         model = Recipe
-        fields = ['title', 'description', 'ingredients', 'category', 'image']
+        fields = ['title', 'description', 'ingredients', 'servings', 'category', 'image']
 
 
 class StepForm(forms.ModelForm):
@@ -29,4 +67,30 @@ StepFormSet = inlineformset_factory(
 class CommentForm(forms.ModelForm):
     class Meta:
         model = Comment
-        fields = ['text']
\ No newline at end of file
+        fields = ['text']
+
+class RatingForm(forms.Form):
+    # 0 — убрать свою оценку
+    value = forms.TypedChoiceField(choices=[(i, i) for i in range(6)], coerce=int, label="Оценка")
+
+
+class ShoppingListForm(forms.Form):
+    # 0 — убрать рецепт из списка
+    recipe = forms.IntegerField(min_value=1, widget=forms.HiddenInput)
+    portions = forms.IntegerField(min_value=0, max_value=100, label="Порций")
+
+
+class CollectionForm(forms.ModelForm):
+    class Meta:
+        model = Collection
+        fields = ['name']
+
+    def __init__(self, *args, owner, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.instance.owner = owner
+
+    def clean_name(self):
+        name = self.cleaned_data['name']
+        if Collection.objects.filter(owner=self.instance.owner, name=name).exists():
+            raise forms.ValidationError('Подборка с таким названием уже есть.')
+        return name
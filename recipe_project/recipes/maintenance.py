@@ -0,0 +1,48 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+
+class BatchedCommand(BaseCommand):
+    """
+    Основа для обслуживающих команд, которые запускаются на живой базе:
+    работают пачками фиксированного размера, умеют --dry-run и делают паузу
+    между пачками, чтобы не держать блокировки и не забивать диск.
+    """
+    default_batch_size = 500
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help='Только показать, что будет удалено')
+        parser.add_argument('--batch-size', type=int, default=self.default_batch_size, help='Размер пачки')
+        parser.add_argument('--sleep', type=float, default=0.0, help='Пауза между пачками, в секундах')
+
+    def execute(self, *args, **options):
+        self.dry_run = options['dry_run']
+        self.batch_size = options['batch_size']
+        self.pause = options['sleep']
+        return super().execute(*args, **options)
+
+    def throttle(self):
+        if self.pause:
+            time.sleep(self.pause)
+
+    def delete_queryset(self, queryset):
+        """Удаляет записи пачками по pk; в режиме --dry-run только считает их."""
+        if self.dry_run:
+            return sum(1 for _ in queryset.values_list('pk', flat=True).iterator(chunk_size=self.batch_size))
+
+        total = 0
+        while True:
+            pks = list(queryset.values_list('pk', flat=True)[:self.batch_size])
+            if not pks:
+                return total
+            with transaction.atomic():
+                queryset.model._default_manager.filter(pk__in=pks).delete()
+            total += len(pks)
+            self.stdout.write(f'  удалено {total}...')
+            self.throttle()
+
+    def report(self, what, count):
+        verb = 'будет удалено' if self.dry_run else 'удалено'
+        self.stdout.write(self.style.SUCCESS(f'{what}: {verb} {count}'))
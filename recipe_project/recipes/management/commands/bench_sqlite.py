@@ -0,0 +1,113 @@
+import os
+import random
+import sqlite3
+import tempfile
+import threading
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+SCHEMA = '''
+CREATE TABLE recipe (id INTEGER PRIMARY KEY, title TEXT, created_at REAL);
+CREATE TABLE comment (id INTEGER PRIMARY KEY, recipe_id INTEGER, text TEXT, created_at REAL);
+CREATE INDEX comment_recipe ON comment (recipe_id);
+'''
+
+
+class Command(BaseCommand):
+    help = (
+        'Сравнивает конкурентную нагрузку читателей и писателей на SQLite '
+        'с настройками по умолчанию и с настройками проекта (WAL и т.д.)'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--readers', type=int, default=8)
+        parser.add_argument('--writers', type=int, default=4)
+        parser.add_argument('--seconds', type=float, default=5)
+
+    def handle(self, *args, **options):
+        default_options = settings.DATABASES['default'].get('OPTIONS', {})
+        variants = (
+            ('по умолчанию (journal=DELETE, deferred)', '', None),
+            (
+                'проект (WAL, synchronous=NORMAL, mmap, IMMEDIATE)',
+                default_options.get('init_command', ''),
+                default_options.get('transaction_mode'),
+            ),
+        )
+        for label, init_command, transaction_mode in variants:
+            result = self._run(init_command, transaction_mode, options)
+            self.stdout.write(self.style.MIGRATE_HEADING(label))
+            self.stdout.write(
+                f"  чтений: {result['reads'] / options['seconds']:.0f}/с, "
+                f"записей: {result['writes'] / options['seconds']:.0f}/с, "
+                f"ошибок блокировки: {result['locked']}"
+            )
+
+    def _connect(self, path, init_command):
+        conn = sqlite3.connect(path, timeout=5, isolation_level=None, check_same_thread=False)
+        for statement in filter(None, (part.strip() for part in init_command.split(';'))):
+            conn.execute(statement)
+        return conn
+
+    def _run(self, init_command, transaction_mode, options):
+        handle, path = tempfile.mkstemp(suffix='.sqlite3')
+        os.close(handle)
+        setup = self._connect(path, init_command)
+        setup.executescript(SCHEMA)
+        setup.executemany(
+            'INSERT INTO recipe (title, created_at) VALUES (?, ?)',
+            [(f'Рецепт {i}', time.time()) for i in range(1000)],
+        )
+        setup.close()
+
+        counters = {'reads': 0, 'writes': 0, 'locked': 0}
+        lock = threading.Lock()
+        stop = time.monotonic() + options['seconds']
+        begin = f'BEGIN {transaction_mode}' if transaction_mode else 'BEGIN'
+
+        def count(name):
+            with lock:
+                counters[name] += 1
+
+        def reader():
+            conn = self._connect(path, init_command)
+            while time.monotonic() < stop:
+                recipe_id = random.randint(1, 1000)
+                try:
+                    conn.execute('SELECT title FROM recipe WHERE id = ?', [recipe_id]).fetchall()
+                    conn.execute('SELECT text FROM comment WHERE recipe_id = ?', [recipe_id]).fetchall()
+                    count('reads')
+                except sqlite3.OperationalError:
+                    count('locked')
+            conn.close()
+
+        def writer():
+            conn = self._connect(path, init_command)
+            while time.monotonic() < stop:
+                try:
+                    conn.execute(begin)
+                    conn.execute(
+                        'INSERT INTO comment (recipe_id, text, created_at) VALUES (?, ?, ?)',
+                        [random.randint(1, 1000), 'Комментарий', time.time()],
+                    )
+                    conn.execute('COMMIT')
+                    count('writes')
+                except sqlite3.OperationalError:
+                    if conn.in_transaction:
+                        conn.execute('ROLLBACK')
+                    count('locked')
+            conn.close()
+
+        threads = [threading.Thread(target=reader) for _ in range(options['readers'])]
+        threads += [threading.Thread(target=writer) for _ in range(options['writers'])]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        for suffix in ('', '-wal', '-shm'):
+            if os.path.exists(path + suffix):
+                os.remove(path + suffix)
+        return counters
@@ -0,0 +1,85 @@
+import os
+import time
+from collections import defaultdict
+from itertools import islice
+
+from django.apps import apps
+from django.core.files.storage import default_storage
+from django.db.models import FileField
+
+from recipes.maintenance import BatchedCommand
+
+
+def _file_fields():
+    """Группирует все FileField/ImageField проекта по каталогу загрузки."""
+    by_dir = defaultdict(list)
+    for model in apps.get_models():
+        for field in model._meta.get_fields():
+            if isinstance(field, FileField) and isinstance(field.upload_to, str):
+                by_dir[field.upload_to.strip('/')].append((model, field.name))
+    return by_dir
+
+
+def _walk_files(root, min_age):
+    # Файлы читаются потоком, без построения полного списка каталога
+    deadline = time.time() - min_age
+    for dirpath, _, filenames in os.walk(root):
+        for filename in filenames:
+            path = os.path.join(dirpath, filename)
+            try:
+                if os.path.getmtime(path) > deadline:
+                    continue
+            except OSError:
+                continue
+            yield os.path.relpath(path, default_storage.location).replace(os.sep, '/')
+
+
+def _chunks(iterable, size):
+    iterator = iter(iterable)
+    while chunk := list(islice(iterator, size)):
+        yield chunk
+
+
+class Command(BatchedCommand):
+    help = 'Удаляет из MEDIA_ROOT файлы, на которые не ссылается ни одна запись (рецепты, шаги, аватары)'
+
+    def add_arguments(self, parser):
+        super().add_arguments(parser)
+        parser.add_argument(
+            '--min-age', type=float, default=24,
+            help='Не трогать файлы моложе N часов (загрузки, которые ещё не сохранены в БД)'
+        )
+
+    def handle(self, *args, **options):
+        min_age = options['min_age'] * 3600
+        total = 0
+
+        for upload_dir, fields in sorted(_file_fields().items()):
+            root = os.path.join(default_storage.location, upload_dir)
+            if not os.path.isdir(root):
+                continue
+
+            orphaned = 0
+            for names in _chunks(_walk_files(root, min_age), self.batch_size):
+                referenced = set()
+                for model, field_name in fields:
+                    referenced.update(
+                        model._default_manager.filter(**{f'{field_name}__in': names})
+                        .values_list(field_name, flat=True)
+                        .iterator(chunk_size=self.batch_size)
+                    )
+
+                for name in names:
+                    if name in referenced:
+                        continue
+                    orphaned += 1
+                    if self.dry_run:
+                        self.stdout.write(f'  {name}')
+                    else:
+                        default_storage.delete(name)
+                self.throttle()
+
+            self.report(f'{upload_dir}/', orphaned)
+            total += orphaned
+
+        self.report('Всего файлов', total)
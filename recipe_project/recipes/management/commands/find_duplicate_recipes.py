@@ -0,0 +1,57 @@
+from django.db import transaction
+
+from recipes.dedup import DUPLICATE_THRESHOLD, band_buckets, compute_signature, find_clusters, pack_signature, recipe_text
+from recipes.maintenance import BatchedCommand
+from recipes.models import Recipe, RecipeLSHBucket
+
+
+class Command(BatchedCommand):
+    help = 'Досчитывает MinHash-подписи рецептов и выводит группы почти-дубликатов по всему каталогу'
+
+    def add_arguments(self, parser):
+        super().add_arguments(parser)
+        parser.add_argument('--rebuild', action='store_true', help='Пересчитать подписи всех рецептов, а не только недостающие')
+        parser.add_argument('--threshold', type=float, default=DUPLICATE_THRESHOLD, help='Порог похожести, от 0 до 1')
+
+    def handle(self, *args, **options):
+        queryset = Recipe.objects.all() if options['rebuild'] else Recipe.objects.filter(minhash__isnull=True)
+        if self.dry_run:
+            self.stdout.write(f'Подписей будет посчитано: {queryset.count()}')
+        else:
+            self.stdout.write(f'Подписей посчитано: {self.index_signatures(queryset)}')
+
+        clusters = find_clusters(options['threshold'])
+        titles = dict(
+            Recipe.objects.filter(pk__in=[pk for cluster in clusters for pk in cluster]).values_list('pk', 'title')
+        )
+        for cluster in clusters:
+            self.stdout.write(', '.join(f'#{pk} «{titles.get(pk, "")}»' for pk in cluster))
+        self.stdout.write(self.style.SUCCESS(f'Групп почти-дубликатов: {len(clusters)}'))
+
+    def index_signatures(self, queryset):
+        # Пачки по pk: bulk_update подписей и пересоздание корзин в одной транзакции на пачку
+        total = 0
+        last_pk = 0
+        while True:
+            recipes = list(
+                queryset.filter(pk__gt=last_pk).order_by('pk').only('pk', 'title', 'description', 'ingredients')[:self.batch_size]
+            )
+            if not recipes:
+                return total
+            buckets = []
+            for recipe in recipes:
+                signature = compute_signature(recipe_text(recipe.title, recipe.description, recipe.ingredients))
+                recipe.minhash = pack_signature(signature)
+                if signature:
+                    buckets.extend(
+                        RecipeLSHBucket(recipe_id=recipe.pk, band=band, bucket=bucket)
+                        for band, bucket in band_buckets(signature)
+                    )
+            with transaction.atomic():
+                Recipe.objects.bulk_update(recipes, ['minhash'])
+                RecipeLSHBucket.objects.filter(recipe_id__in=[recipe.pk for recipe in recipes]).delete()
+                RecipeLSHBucket.objects.bulk_create(buckets)
+            total += len(recipes)
+            last_pk = recipes[-1].pk
+            self.stdout.write(f'  посчитано {total}...')
+            self.throttle()
@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from recipes.sitemaps import generate_sitemaps, sitemap_root
+
+
+class Command(BaseCommand):
+    help = 'Обновляет файлы карты сайта: перезаписываются только сегменты с изменившимися рецептами'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--full', action='store_true', help='Перегенерировать все сегменты')
+        parser.add_argument('--site-url', help='Адрес сайта для ссылок (по умолчанию SITE_URL)')
+
+    def handle(self, *args, **options):
+        written, kept, removed = generate_sitemaps(full=options['full'], site_url=options['site_url'])
+        self.stdout.write(self.style.SUCCESS(
+            f'Карта сайта в {sitemap_root()}: перезаписано {written}, без изменений {kept}, удалено {removed}.'
+        ))
@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+
+from recipes.page_cache import get_stats, reset_stats
+
+
+class Command(BaseCommand):
+    help = 'Показывает статистику кэша страниц для анонимных посетителей'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--reset', action='store_true', help='Обнулить счётчики после вывода')
+
+    def handle(self, *args, **options):
+        stats = get_stats()
+        self.stdout.write(f"Попадания: {stats['hit']}")
+        self.stdout.write(f"Промахи: {stats['miss']}")
+        self.stdout.write(f"Мимо кэша (есть куки): {stats['bypass']}")
+        self.stdout.write(f"Hit ratio: {stats['hit_ratio']:.2%}")
+        if options['reset']:
+            reset_stats()
+            self.stdout.write(self.style.SUCCESS('Счётчики обнулены.'))
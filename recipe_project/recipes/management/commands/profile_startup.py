@@ -0,0 +1,40 @@
+from django.core.management import get_commands
+from django.core.management.base import BaseCommand, CommandError
+
+from recipe_project.startup import profile_startup
+
+
+def _ms(seconds):
+    return f'{seconds * 1000:8.1f} мс'
+
+
+class Command(BaseCommand):
+    help = 'Профилирует холодный старт: время импорта модулей и AppConfig.ready() по приложениям'
+
+    def add_arguments(self, parser):
+        parser.add_argument('command', nargs='?', default='', help='Загрузить ещё и эту команду manage.py')
+        parser.add_argument('--top', type=int, default=20, help='Сколько самых долгих импортов показать')
+
+    def handle(self, *args, **options):
+        if options['command'] and options['command'] not in get_commands():
+            raise CommandError(f'Неизвестная команда: {options["command"]}')
+        try:
+            profile = profile_startup(options['command'])
+        except RuntimeError as error:
+            raise CommandError(error)
+        self.stdout.write(f'Процесс целиком:  {_ms(profile.wall)}')
+        self.stdout.write(f'django.setup():   {_ms(profile.setup)}')
+        if options['command']:
+            self.stdout.write(f'С загрузкой {options["command"]}: {_ms(profile.total)}')
+
+        self.stdout.write('\nAppConfig.ready():')
+        for label, seconds in sorted(profile.ready.items(), key=lambda item: -item[1]):
+            self.stdout.write(f'  {_ms(seconds)}  {label}')
+
+        self.stdout.write('\nИмпорты верхнего уровня (с вложенными):')
+        for name, _, cumulative, _ in profile.top_level_imports()[:options['top']]:
+            self.stdout.write(f'  {_ms(cumulative)}  {name}')
+
+        self.stdout.write('\nСобственное время импорта по пакетам:')
+        for package, own in profile.by_package()[:options['top']]:
+            self.stdout.write(f'  {_ms(own)}  {package}')
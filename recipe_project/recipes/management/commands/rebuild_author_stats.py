@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from recipes.stats import rebuild_author_stats
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает статистику авторов (число рецептов, комментариев и любимую категорию)'
+
+    def handle(self, *args, **options):
+        total = rebuild_author_stats()
+        self.stdout.write(self.style.SUCCESS(f'Статистика пересчитана для авторов: {total}'))
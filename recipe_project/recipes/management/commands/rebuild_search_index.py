@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from recipes.search import fts_enabled, rebuild_index
+
+
+class Command(BaseCommand):
+    help = 'Перестраивает полнотекстовые индексы рецептов и комментариев (SQLite FTS5)'
+
+    def handle(self, *args, **options):
+        if not fts_enabled():
+            self.stdout.write(self.style.WARNING('Полнотекстовые индексы есть только для SQLite.'))
+            return
+        rebuild_index()
+        self.stdout.write(self.style.SUCCESS('Индексы перестроены.'))
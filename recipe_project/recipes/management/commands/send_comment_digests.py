@@ -0,0 +1,43 @@
+from itertools import islice
+
+from django.core.mail import get_connection
+
+from recipes.digests import (
+    build_message, collect_digests, get_checkpoint, latest_comment_id, load_template, mark_sent,
+)
+from recipes.maintenance import BatchedCommand
+
+
+class Command(BatchedCommand):
+    help = 'Рассылает авторам дайджест новых комментариев к их рецептам с момента прошлого запуска'
+    default_batch_size = 50
+
+    def handle(self, *args, **options):
+        upto_id = latest_comment_id()
+        checkpoint = get_checkpoint(upto_id)
+        if upto_id <= checkpoint.last_comment_id:
+            self.stdout.write('Новых комментариев нет.')
+            return
+
+        digests = collect_digests(checkpoint.last_comment_id, upto_id)
+        if self.dry_run:
+            for digest in digests:
+                self.stdout.write(f'  {digest.author.username}: комментариев {digest.count}')
+            self.stdout.write(self.style.SUCCESS(f'Будет отправлено писем: {len(digests)}'))
+            return
+
+        template = load_template()
+        sent = 0
+        # Одно SMTP-подключение на весь запуск; отметки авторов пишутся после каждой отправленной пачки
+        with get_connection() as connection:
+            iterator = iter(digests)
+            while batch := list(islice(iterator, self.batch_size)):
+                connection.send_messages([build_message(template, digest, connection) for digest in batch])
+                mark_sent(batch)
+                sent += len(batch)
+                self.stdout.write(f'  отправлено {sent}...')
+                self.throttle()
+
+        checkpoint.last_comment_id = upto_id
+        checkpoint.save(update_fields=['last_comment_id', 'updated_at'])
+        self.stdout.write(self.style.SUCCESS(f'Отправлено писем: {sent}'))
@@ -0,0 +1,54 @@
+import sqlite3
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+from recipe_project.db_router import PRIMARY, replica_lag, write_heartbeat
+
+
+class Command(BaseCommand):
+    help = (
+        'Локальные реплики SQLite: копирует основную базу в файлы реплик '
+        'и пишет heartbeat, по которому роутер считает отставание'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--loop', type=float, default=0,
+            help='Повторять копирование каждые N секунд (heartbeat при этом пишется раз в секунду)'
+        )
+
+    def handle(self, *args, **options):
+        if not settings.DATABASE_REPLICAS:
+            raise CommandError('Реплики не настроены: задайте DJANGO_DB_REPLICAS.')
+        for alias in [PRIMARY, *settings.DATABASE_REPLICAS]:
+            if connections[alias].vendor != 'sqlite':
+                raise CommandError(f'{alias}: копирование файлом поддерживается только для SQLite.')
+
+        interval = options['loop']
+        next_copy = 0.0
+        while True:
+            write_heartbeat()
+            if time.monotonic() >= next_copy:
+                self._copy()
+                next_copy = time.monotonic() + interval
+            if not interval:
+                return
+            time.sleep(1)
+
+    def _copy(self):
+        source = sqlite3.connect(connections[PRIMARY].settings_dict['NAME'])
+        try:
+            for alias in settings.DATABASE_REPLICAS:
+                target = sqlite3.connect(connections[alias].settings_dict['NAME'])
+                try:
+                    # backup() даёт согласованный снимок даже во время записи в основную базу
+                    source.backup(target)
+                finally:
+                    target.close()
+        finally:
+            source.close()
+        lags = {alias: replica_lag(alias) for alias in settings.DATABASE_REPLICAS}
+        self.stdout.write(f'Реплики обновлены, отставание (с): {lags}')
@@ -0,0 +1,72 @@
+# Generated by Django 5.2.7 on 2026-10-19 08:34
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def fill_author_stats(apps, schema_editor):
+    Recipe = apps.get_model('recipes', 'Recipe')
+    Comment = apps.get_model('recipes', 'Comment')
+    AuthorStats = apps.get_model('recipes', 'AuthorStats')
+
+    recipe_counts = Recipe.objects.values('author_id').annotate(total=Count('pk')).values_list('author_id', 'total')
+    comment_counts = dict(
+        Comment.objects.values('recipe__author_id').annotate(total=Count('pk')).values_list('recipe__author_id', 'total')
+    )
+    top_categories = {}
+    by_category = (
+        Recipe.objects.filter(category__isnull=False)
+        .values('author_id', 'category_id')
+        .annotate(total=Count('pk'))
+        .order_by('author_id', '-total', 'category_id')
+        .values_list('author_id', 'category_id')
+    )
+    for author_id, category_id in by_category:
+        top_categories.setdefault(author_id, category_id)
+
+    AuthorStats.objects.bulk_create([
+        AuthorStats(
+            author_id=author_id,
+            recipe_count=total,
+            comments_received=comment_counts.get(author_id, 0),
+            top_category_id=top_categories.get(author_id),
+        )
+        for author_id, total in recipe_counts
+    ])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0002_customuser_unconfirmed_email'),
+        ('recipes', '0004_alter_category_options_alter_comment_options_and_more'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AuthorStats',
+            fields=[
+                ('author', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='author_stats', serialize=False, to=settings.AUTH_USER_MODEL, verbose_name='Автор')),
+                ('recipe_count', models.PositiveIntegerField(default=0, verbose_name='Рецептов')),
+                ('comments_received', models.PositiveIntegerField(default=0, verbose_name='Получено комментариев')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Обновлено')),
+            ],
+            options={
+                'verbose_name': 'Статистика автора',
+                'verbose_name_plural': 'Статистика авторов',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='recipe',
+            index=models.Index(fields=['author', '-created_at'], name='recipe_author_created_idx'),
+        ),
+        migrations.AddField(
+            model_name='authorstats',
+            name='top_category',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='recipes.category', verbose_name='Любимая категория'),
+        ),
+        migrations.RunPython(fill_author_stats, migrations.RunPython.noop),
+    ]
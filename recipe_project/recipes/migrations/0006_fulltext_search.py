@@ -0,0 +1,34 @@
+from django.db import migrations
+
+
+def create_fts_tables(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    schema_editor.execute(
+        "CREATE VIRTUAL TABLE IF NOT EXISTS recipes_recipe_fts USING fts5(title, description, tokenize='unicode61')"
+    )
+    schema_editor.execute(
+        "CREATE VIRTUAL TABLE IF NOT EXISTS recipes_comment_fts USING fts5(text, tokenize='unicode61')"
+    )
+    schema_editor.execute(
+        'INSERT INTO recipes_recipe_fts (rowid, title, description) SELECT id, title, description FROM recipes_recipe'
+    )
+    schema_editor.execute('INSERT INTO recipes_comment_fts (rowid, text) SELECT id, text FROM recipes_comment')
+
+
+def drop_fts_tables(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    schema_editor.execute('DROP TABLE IF EXISTS recipes_recipe_fts')
+    schema_editor.execute('DROP TABLE IF EXISTS recipes_comment_fts')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0005_authorstats'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_fts_tables, drop_fts_tables),
+    ]
@@ -0,0 +1,41 @@
+# Generated by Django 5.2.7 on 2026-10-19 08:48
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0002_customuser_unconfirmed_email'),
+        ('recipes', '0007_recipe_updated_at'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AuthorDigestState',
+            fields=[
+                ('author', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='+', serialize=False, to=settings.AUTH_USER_MODEL, verbose_name='Автор')),
+                ('last_comment_id', models.PositiveBigIntegerField(default=0, verbose_name='Последний комментарий')),
+                ('sent_at', models.DateTimeField(blank=True, null=True, verbose_name='Отправлено')),
+            ],
+            options={
+                'verbose_name': 'Дайджест автора',
+                'verbose_name_plural': 'Дайджесты авторов',
+            },
+        ),
+        migrations.CreateModel(
+            name='DigestCheckpoint',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=50, unique=True, verbose_name='Рассылка')),
+                ('last_comment_id', models.PositiveBigIntegerField(default=0, verbose_name='Последний комментарий')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Обновлено')),
+            ],
+            options={
+                'verbose_name': 'Отметка рассылки',
+                'verbose_name_plural': 'Отметки рассылок',
+            },
+        ),
+    ]
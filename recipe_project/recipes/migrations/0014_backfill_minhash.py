@@ -0,0 +1,44 @@
+# Generated by Django 5.2.7 on 2026-10-19 09:40
+
+from django.db import migrations
+
+BATCH_SIZE = 500
+
+
+def backfill_signatures(apps, schema_editor):
+    # Подписи должны совпадать с теми, что считает сигнал, поэтому берём функции из dedup
+    from recipes.dedup import band_buckets, compute_signature, pack_signature, recipe_text
+
+    Recipe = apps.get_model('recipes', 'Recipe')
+    RecipeLSHBucket = apps.get_model('recipes', 'RecipeLSHBucket')
+    last_pk = 0
+    while True:
+        recipes = list(
+            Recipe.objects.filter(pk__gt=last_pk, minhash__isnull=True).order_by('pk')
+            .only('pk', 'title', 'description', 'ingredients')[:BATCH_SIZE]
+        )
+        if not recipes:
+            return
+        buckets = []
+        for recipe in recipes:
+            signature = compute_signature(recipe_text(recipe.title, recipe.description, recipe.ingredients))
+            recipe.minhash = pack_signature(signature)
+            if signature:
+                buckets.extend(
+                    RecipeLSHBucket(recipe_id=recipe.pk, band=band, bucket=bucket)
+                    for band, bucket in band_buckets(signature)
+                )
+        Recipe.objects.bulk_update(recipes, ['minhash'])
+        RecipeLSHBucket.objects.bulk_create(buckets)
+        last_pk = recipes[-1].pk
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0013_recipe_servings'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_signatures, migrations.RunPython.noop),
+    ]
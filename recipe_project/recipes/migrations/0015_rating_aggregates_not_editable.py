@@ -0,0 +1,28 @@
+# Generated by Django 5.2.7 on 2026-10-19 09:36
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0014_backfill_minhash'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='recipe',
+            name='rating_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Оценок'),
+        ),
+        migrations.AlterField(
+            model_name='recipe',
+            name='rating_score',
+            field=models.FloatField(default=0.0, editable=False, verbose_name='Рейтинг'),
+        ),
+        migrations.AlterField(
+            model_name='recipe',
+            name='rating_sum',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Сумма оценок'),
+        ),
+    ]
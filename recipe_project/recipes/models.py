@@ -1,5 +1,6 @@
-from django.db import models
 from django.conf import settings
+from django.core.validators import MaxValueValidator, MinValueValidator
+from django.db import models
 
 
 class Category(models.Model):
@@ -17,14 +18,52 @@ class Recipe(models.Model):
     title = models.CharField(max_length=100, verbose_name="Название рецепта")
     description = models.TextField(verbose_name="Описание")
     ingredients = models.TextField(verbose_name="Ингредиенты")
+    # Необязательно: без него список покупок масштабирует рецепт как одну порцию
+    servings = models.PositiveSmallIntegerField(null=True, blank=True, verbose_name="Порций")
     category = models.ForeignKey(Category, on_delete=models.SET_NULL, null=True, verbose_name="Категория")
     author = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, verbose_name="Автор")
     image = models.ImageField(upload_to='recipes/', blank=True, null=True, verbose_name="Изображение (опционально)")
     created_at = models.DateTimeField(auto_now_add=True, verbose_name="Дата создания")
+    updated_at = models.DateTimeField(auto_now=True, verbose_name="Дата изменения")
+    # Агрегаты оценок обновляются атомарно при каждой оценке (см. ratings.py), AVG() при чтении не считается
+    rating_count = models.PositiveIntegerField(default=0, editable=False, verbose_name="Оценок")
+    rating_sum = models.PositiveIntegerField(default=0, editable=False, verbose_name="Сумма оценок")
+    rating_score = models.FloatField(default=0.0, editable=False, verbose_name="Рейтинг")
+    # MinHash-подпись текста рецепта для поиска почти-дубликатов (см. dedup.py)
+    minhash = models.BinaryField(null=True, editable=False, verbose_name="MinHash-подпись")
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['author', '-created_at'], name='recipe_author_created_idx'),
+            models.Index(fields=['-rating_score', '-rating_count', '-id'], name='recipe_rating_score_idx'),
+        ]
+
+    RATING_FIELDS = ('rating_count', 'rating_sum', 'rating_score')
 
     def __str__(self):
         return self.title
 
+    def save(self, *args, **kwargs):
+        # Агрегаты оценок меняет только ratings.py через F(): сохранение экземпляра,
+        # прочитанного до оценки (форма редактирования, админка), не должно их затирать
+        if not self._state.adding and not kwargs.get('force_insert') and kwargs.get('update_fields') is None:
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and field.name not in self.RATING_FIELDS
+            ]
+        super().save(*args, **kwargs)
+
+    @property
+    def rating_average(self):
+        return self.rating_sum / self.rating_count if self.rating_count else None
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Значения из БД нужны сигналам, чтобы понять, что изменилось при сохранении
+        instance._loaded_values = dict(zip(field_names, values))
+        return instance
+
 
 class Step(models.Model):
     recipe = models.ForeignKey(
@@ -63,3 +102,172 @@ class Comment(models.Model):
 
     def __str__(self):
         return f'{self.user.username} - {self.recipe.title}'
+
+
+class AuthorStats(models.Model):
+    # Счётчики обновляются сигналами при изменениях, а не считаются при каждом показе профиля
+    author = models.OneToOneField(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='author_stats',
+        verbose_name="Автор"
+    )
+    recipe_count = models.PositiveIntegerField(default=0, verbose_name="Рецептов")
+    comments_received = models.PositiveIntegerField(default=0, verbose_name="Получено комментариев")
+    follower_count = models.PositiveIntegerField(default=0, verbose_name="Подписчиков")
+    top_category = models.ForeignKey(
+        Category,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='+',
+        verbose_name="Любимая категория"
+    )
+    updated_at = models.DateTimeField(auto_now=True, verbose_name="Обновлено")
+
+    class Meta:
+        verbose_name = "Статистика автора"
+        verbose_name_plural = "Статистика авторов"
+
+    def __str__(self):
+        return f'Статистика {self.author_id}'
+
+
+class DigestCheckpoint(models.Model):
+    # Общая отметка: все комментарии с pk <= last_comment_id уже разосланы всем авторам
+    name = models.CharField(max_length=50, unique=True, verbose_name="Рассылка")
+    last_comment_id = models.PositiveBigIntegerField(default=0, verbose_name="Последний комментарий")
+    updated_at = models.DateTimeField(auto_now=True, verbose_name="Обновлено")
+
+    class Meta:
+        verbose_name = "Отметка рассылки"
+        verbose_name_plural = "Отметки рассылок"
+
+    def __str__(self):
+        return f'{self.name}: {self.last_comment_id}'
+
+
+class AuthorDigestState(models.Model):
+    # Отметка конкретного автора: повторный запуск после сбоя не отправит ему письмо ещё раз
+    author = models.OneToOneField(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='+',
+        verbose_name="Автор"
+    )
+    last_comment_id = models.PositiveBigIntegerField(default=0, verbose_name="Последний комментарий")
+    sent_at = models.DateTimeField(null=True, blank=True, verbose_name="Отправлено")
+
+    class Meta:
+        verbose_name = "Дайджест автора"
+        verbose_name_plural = "Дайджесты авторов"
+
+    def __str__(self):
+        return f'Дайджест {self.author_id}: {self.last_comment_id}'
+
+
+class TimelineEntry(models.Model):
+    # Лента подписок, материализованная при публикации рецепта (fan-out on write).
+    # created_at копирует дату рецепта, чтобы листать ленту по индексу без JOIN
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='+',
+                             verbose_name="Читатель")
+    recipe = models.ForeignKey(Recipe, on_delete=models.CASCADE, related_name='+', verbose_name="Рецепт")
+    created_at = models.DateTimeField(verbose_name="Дата рецепта")
+
+    class Meta:
+        verbose_name = "Запись ленты"
+        verbose_name_plural = "Записи лент"
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'recipe'], name='unique_timeline_entry'),
+        ]
+        indexes = [
+            models.Index(fields=['user', '-created_at', '-recipe'], name='timeline_user_created_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.user_id}: {self.recipe_id}'
+
+
+class Rating(models.Model):
+    recipe = models.ForeignKey(Recipe, on_delete=models.CASCADE, related_name='ratings', verbose_name="Рецепт")
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, verbose_name="Пользователь")
+    value = models.PositiveSmallIntegerField(
+        validators=[MinValueValidator(1), MaxValueValidator(5)],
+        verbose_name="Оценка"
+    )
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name="Дата оценки")
+    updated_at = models.DateTimeField(auto_now=True, verbose_name="Дата изменения")
+
+    class Meta:
+        verbose_name = "Оценка"
+        verbose_name_plural = "Оценки"
+        constraints = [
+            models.UniqueConstraint(fields=['recipe', 'user'], name='unique_recipe_rating'),
+            models.CheckConstraint(condition=models.Q(value__gte=1, value__lte=5), name='rating_value_range'),
+        ]
+
+    def __str__(self):
+        return f'{self.user_id} → {self.recipe_id}: {self.value}'
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Прежняя оценка нужна, чтобы изменить сумму на разницу, а не пересчитывать её
+        instance._loaded_value = instance.__dict__.get('value')
+        return instance
+
+
+class Collection(models.Model):
+    owner = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='collections',
+                              verbose_name="Владелец")
+    name = models.CharField(max_length=100, verbose_name="Название")
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name="Дата создания")
+
+    class Meta:
+        verbose_name = "Подборка"
+        verbose_name_plural = "Подборки"
+        constraints = [
+            models.UniqueConstraint(fields=['owner', 'name'], name='unique_collection_name'),
+        ]
+
+    def __str__(self):
+        return self.name
+
+
+class CollectionItem(models.Model):
+    collection = models.ForeignKey(Collection, on_delete=models.CASCADE, related_name='items',
+                                   verbose_name="Подборка")
+    recipe = models.ForeignKey(Recipe, on_delete=models.CASCADE, related_name='+', verbose_name="Рецепт")
+    added_at = models.DateTimeField(auto_now_add=True, verbose_name="Дата добавления")
+
+    class Meta:
+        verbose_name = "Рецепт в подборке"
+        verbose_name_plural = "Рецепты в подборках"
+        constraints = [
+            models.UniqueConstraint(fields=['collection', 'recipe'], name='unique_collection_item'),
+        ]
+        indexes = [
+            models.Index(fields=['collection', '-added_at', '-id'], name='collection_item_added_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.collection_id}: {self.recipe_id}'
+
+
+class RecipeLSHBucket(models.Model):
+    # LSH-индекс: подпись делится на полосы, рецепты с совпавшей полосой — кандидаты в дубликаты
+    recipe = models.ForeignKey(Recipe, on_delete=models.CASCADE, related_name='+', verbose_name="Рецепт")
+    band = models.PositiveSmallIntegerField(verbose_name="Полоса")
+    bucket = models.BigIntegerField(verbose_name="Корзина")
+
+    class Meta:
+        verbose_name = "LSH-корзина рецепта"
+        verbose_name_plural = "LSH-корзины рецептов"
+        indexes = [
+            models.Index(fields=['band', 'bucket'], name='recipe_lsh_bucket_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.recipe_id}: {self.band}/{self.bucket}'
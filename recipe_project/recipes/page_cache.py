@@ -0,0 +1,193 @@
+import hashlib
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.urls import Resolver404, resolve
+from django.utils.http import urlencode
+
+from recipe_project.metrics import CACHE_LOOKUPS
+
+PAGE_CACHE_TIMEOUT = getattr(settings, 'PAGE_CACHE_TIMEOUT', 600)
+
+# Какие страницы кэшируются и какие GET-параметры влияют на их содержимое
+CACHEABLE_VIEWS = {
+    'home': (),
+    'recipe_list': ('category', 'author', 'has_image', 'period', 'q', 'ingredient', 'sort', 'page'),
+    'recipe_detail': (),
+}
+
+# Куки, при наличии которых ответ может быть персональным
+BYPASS_COOKIES = (settings.SESSION_COOKIE_NAME, settings.CSRF_COOKIE_NAME, 'messages')
+
+STATS_KEYS = {
+    'hit': 'pagecache:stats:hit',
+    'miss': 'pagecache:stats:miss',
+    'bypass': 'pagecache:stats:bypass',
+}
+
+
+def add_cache_tags(request, *tags):
+    """
+    Помечает страницу тегами, по которым её потом можно сбросить. Версии тегов
+    запоминаются сразу, поэтому теги нужно ставить до чтения данных, от которых
+    они зависят: сброс во время рендера тогда оставит сохранённую страницу устаревшей.
+    Вне кэшируемого запроса (middleware не подготовила request) ничего не делает.
+    """
+    snapshot = getattr(request, '_page_cache_tags', None)
+    if snapshot is None:
+        return
+    new_tags = [tag for tag in tags if tag not in snapshot]
+    if new_tags:
+        snapshot.update(_tag_versions(new_tags))
+
+
+def normalize_query(query_dict, allowed):
+    params = []
+    for name in sorted(allowed):
+        value = query_dict.get(name, '').strip()
+        if not value or (name == 'page' and value == '1'):
+            continue
+        params.append((name, value))
+    return urlencode(params)
+
+
+def page_key(url_name, kwargs, query):
+    raw = f'{url_name}|{sorted(kwargs.items())}|{query}'
+    return 'pagecache:page:' + hashlib.md5(raw.encode()).hexdigest()
+
+
+def _tag_key(tag):
+    return f'pagecache:tagv:{tag}'
+
+
+def _tag_versions(tags):
+    """
+    Текущие версии тегов; недостающие создаются. Начальное значение — время в наносекундах,
+    поэтому версия, пропавшая из кэша, не совпадёт с сохранённой в старых страницах.
+    """
+    keys = {tag: _tag_key(tag) for tag in tags}
+    versions = cache.get_many(keys.values())
+    for tag, key in keys.items():
+        if key not in versions:
+            cache.add(key, time.time_ns(), timeout=None)
+            versions[key] = cache.get(key)
+    return {tag: versions[key] for tag, key in keys.items()}
+
+
+def _is_fresh(entry):
+    tags = entry['tags']
+    if not tags:
+        return True
+    current = cache.get_many([_tag_key(tag) for tag in tags])
+    return all(current.get(_tag_key(tag)) == version for tag, version in tags.items())
+
+
+def purge_tags(*tags):
+    """
+    Сбрасывает все страницы, помеченные хотя бы одним из тегов: версия тега
+    увеличивается атомарным incr, и сохранённые со старой версией страницы
+    больше не отдаются. Списков страниц по тегам нет — нечего терять при гонках.
+    """
+    for tag in set(tags):
+        try:
+            cache.incr(_tag_key(tag))
+        except ValueError:
+            # Версии нет — нет и страниц, которые могли бы с ней совпасть
+            pass
+
+
+def _incr(event):
+    CACHE_LOOKUPS.inc(cache='page', result=event)
+    key = STATS_KEYS[event]
+    try:
+        cache.incr(key)
+    except ValueError:
+        if not cache.add(key, 1, timeout=None):
+            cache.incr(key)
+
+
+def get_stats():
+    values = cache.get_many(STATS_KEYS.values())
+    stats = {event: values.get(key, 0) for event, key in STATS_KEYS.items()}
+    lookups = stats['hit'] + stats['miss']
+    stats['hit_ratio'] = stats['hit'] / lookups if lookups else 0.0
+    return stats
+
+
+def reset_stats():
+    cache.delete_many(list(STATS_KEYS.values()))
+
+
+class AnonymousPageCacheMiddleware:
+    """
+    Кэш целых страниц для анонимных посетителей.
+
+    Запросы с сессионной, CSRF- или messages-кукой всегда идут мимо кэша.
+    Страница сохраняется вместе с версиями тегов, снятыми в момент, когда view
+    их выставила (см. add_cache_tags); сигналы моделей повышают версии затронутых тегов,
+    и такие страницы перестают отдаваться. Запросы с GET-параметрами вне
+    CACHEABLE_VIEWS идут мимо кэша.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        key = self._get_key(request)
+        if key is None:
+            return self.get_response(request)
+
+        if any(name in request.COOKIES for name in BYPASS_COOKIES):
+            _incr('bypass')
+            return self.get_response(request)
+
+        entry = cache.get(key)
+        if entry is not None and _is_fresh(entry):
+            _incr('hit')
+            response = HttpResponse(entry['content'], status=entry['status'])
+            for header, value in entry['headers']:
+                response[header] = value
+            response['X-Page-Cache'] = 'HIT'
+            return response
+
+        _incr('miss')
+        # Сюда add_cache_tags складывает версии тегов на момент их установки
+        request._page_cache_tags = {}
+        response = self.get_response(request)
+        if self._is_cacheable(response):
+            cache.set(key, {
+                'content': response.content,
+                'status': response.status_code,
+                'headers': list(response.items()),
+                'tags': request._page_cache_tags,
+            }, PAGE_CACHE_TIMEOUT)
+            response['X-Page-Cache'] = 'MISS'
+        return response
+
+    def _get_key(self, request):
+        if request.method not in ('GET', 'HEAD'):
+            return None
+        try:
+            match = resolve(request.path_info)
+        except Resolver404:
+            return None
+        if match.url_name not in CACHEABLE_VIEWS:
+            return None
+        allowed = CACHEABLE_VIEWS[match.url_name]
+        if any(name not in allowed for name in request.GET):
+            # Параметр вне ключа мог попасть в страницу — такой ответ не кэшируем и не отдаём из кэша
+            return None
+        # Ответ из кэша не дойдёт до резолвера Django, а имя маршрута нужно метрикам
+        request.resolver_match = match
+        query = normalize_query(request.GET, allowed)
+        return page_key(match.url_name, match.kwargs, query)
+
+    def _is_cacheable(self, response):
+        return (
+            response.status_code == 200
+            and not response.streaming
+            and not response.cookies
+            and 'private' not in response.get('Cache-Control', '')
+        )
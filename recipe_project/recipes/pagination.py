@@ -0,0 +1,97 @@
+import base64
+import binascii
+import json
+
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+
+
+class KeysetPage:
+    def __init__(self, object_list, next_cursor, is_first):
+        self.object_list = object_list
+        self.next_cursor = next_cursor
+        self.is_first = is_first
+
+    @property
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+
+def _field(model, name):
+    return model._meta.pk if name == 'pk' else model._meta.get_field(name)
+
+
+def _cursor_value(value):
+    # isoformat() сохраняет микросекунды, иначе записи с одинаковыми миллисекундами терялись бы
+    if hasattr(value, 'isoformat'):
+        return value.isoformat()
+    return str(value)
+
+
+def encode_cursor(values):
+    raw = json.dumps(values, default=_cursor_value).encode()
+    return base64.urlsafe_b64encode(raw).decode()
+
+
+def decode_cursor(model, ordering, cursor):
+    """Возвращает значения полей сортировки из курсора или None, если курсор битый."""
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    except (ValueError, binascii.Error):
+        return None
+    if not isinstance(values, list) or len(values) != len(ordering):
+        return None
+    decoded = []
+    try:
+        for name, value in zip(ordering, values):
+            field = _field(model, name.lstrip('-'))
+            value = field.to_python(value)
+            # None не сравнивается в keyset_filter, а число вне диапазона поля не дойдёт до БД
+            if value is None:
+                return None
+            field.run_validators(value)
+            decoded.append(value)
+    except (ValidationError, TypeError, ValueError):
+        # Курсор приходит от клиента: [1, 1] ломает разбор даты TypeError'ом, а не ValidationError
+        return None
+    return decoded
+
+
+def keyset_filter(ordering, values):
+    """
+    Условие «строго после курсора» для составного ключа сортировки:
+    (a < x) OR (a = x AND b < y) OR ... — работает по индексу без OFFSET.
+    """
+    condition = Q()
+    equal = Q()
+    for name, value in zip(ordering, values):
+        field = name.lstrip('-')
+        lookup = 'lt' if name.startswith('-') else 'gt'
+        condition |= equal & Q(**{f'{field}__{lookup}': value})
+        equal &= Q(**{field: value})
+    return condition
+
+
+def keyset_paginate(queryset, cursor, per_page, ordering=('-created_at', '-pk')):
+    """
+    Постраничный вывод по курсору вместо OFFSET: следующая страница
+    начинается строго после последней записи текущей.
+    """
+    queryset = queryset.order_by(*ordering)
+    values = decode_cursor(queryset.model, ordering, cursor) if cursor else None
+    if values is not None:
+        queryset = queryset.filter(keyset_filter(ordering, values))
+
+    objects = list(queryset[:per_page + 1])
+    next_cursor = None
+    if len(objects) > per_page:
+        objects = objects[:per_page]
+        last = objects[-1]
+        next_cursor = encode_cursor([getattr(last, name.lstrip('-')) for name in ordering])
+    return KeysetPage(objects, next_cursor, is_first=values is None)
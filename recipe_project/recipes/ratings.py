@@ -0,0 +1,58 @@
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import Case, F, FloatField, Value, When
+from django.db.models.functions import Cast
+
+from .models import Rating, Recipe
+
+# Байесовская оценка: к оценкам рецепта добавляется PRIOR_WEIGHT «виртуальных» оценок PRIOR_MEAN,
+# поэтому одна пятёрка не поднимает рецепт выше сотни четвёрок
+PRIOR_MEAN = getattr(settings, 'RATING_PRIOR_MEAN', 3.0)
+PRIOR_WEIGHT = getattr(settings, 'RATING_PRIOR_WEIGHT', 5)
+
+
+def bayesian_score(count, total):
+    if not count:
+        return 0.0
+    return (PRIOR_WEIGHT * PRIOR_MEAN + total) / (PRIOR_WEIGHT + count)
+
+
+def apply_rating_delta(recipe_id, count_delta, sum_delta):
+    """
+    Одним UPDATE меняет число и сумму оценок и пересчитывает рейтинг.
+    Правые части UPDATE видят значения строки до изменения, поэтому рейтинг
+    считается от старых значений плюс те же приращения.
+    """
+    new_count = F('rating_count') + count_delta
+    new_sum = F('rating_sum') + sum_delta
+    score = Cast(Value(PRIOR_WEIGHT * PRIOR_MEAN) + new_sum, FloatField()) / (Value(PRIOR_WEIGHT) + new_count)
+    if count_delta < 0:
+        # Рецепт без оценок не получает рейтинг PRIOR_MEAN
+        score = Case(When(rating_count__lte=-count_delta, then=Value(0.0)), default=score, output_field=FloatField())
+    Recipe.objects.filter(pk=recipe_id).update(rating_count=new_count, rating_sum=new_sum, rating_score=score)
+
+
+def rate(recipe, user, value):
+    """
+    Ставит или меняет оценку пользователя. Строка оценки блокируется до конца
+    транзакции, чтобы одновременные изменения не посчитали разницу от одного и того же значения.
+    """
+    with transaction.atomic():
+        rating = Rating.objects.select_for_update().filter(recipe=recipe, user=user).first()
+        if rating is None:
+            try:
+                with transaction.atomic():
+                    return Rating.objects.create(recipe=recipe, user=user, value=value)
+            except IntegrityError:
+                # Параллельный запрос успел создать оценку — обновляем её
+                rating = Rating.objects.select_for_update().get(recipe=recipe, user=user)
+        if rating.value != value:
+            rating.value = value
+            rating.save(update_fields=['value', 'updated_at'])
+        return rating
+
+
+def unrate(recipe, user):
+    with transaction.atomic():
+        for rating in Rating.objects.select_for_update().filter(recipe=recipe, user=user):
+            rating.delete()
@@ -0,0 +1,69 @@
+import threading
+import time
+import uuid
+
+from django.core.cache import cache
+
+
+class ReferenceCache:
+    """
+    Кэш небольших справочных таблиц (категории и т.п.) в памяти процесса.
+
+    Каждый воркер хранит свою копию данных, а общий ключ версии в кэше Django
+    позволяет сбросить копии во всех процессах сразу: сигналы меняют версию
+    при сохранении/удалении, а проверка версии — один cache.get на запрос.
+    TTL страхует на случай, если версия в общем кэше потерялась.
+    """
+
+    def __init__(self, name, loader, ttl=300):
+        self.name = name
+        self.loader = loader
+        self.ttl = ttl
+        self.version_key = f'refcache:version:{name}'
+        self._lock = threading.Lock()
+        self._version = None
+        self._expires_at = 0
+        self._items = None
+        self._by_pk = None
+
+    def _current_version(self):
+        version = cache.get(self.version_key)
+        if version is None:
+            version = uuid.uuid4().hex
+            # add() не перезапишет версию, которую успел выставить другой воркер
+            if not cache.add(self.version_key, version, timeout=None):
+                version = cache.get(self.version_key, version)
+        return version
+
+    def all(self):
+        version = self._current_version()
+        if self._items is not None and self._version == version and time.monotonic() < self._expires_at:
+            return self._items
+
+        with self._lock:
+            if self._items is None or self._version != version or time.monotonic() >= self._expires_at:
+                items = list(self.loader())
+                self._by_pk = {item.pk: item for item in items}
+                self._items = items
+                self._version = version
+                self._expires_at = time.monotonic() + self.ttl
+            return self._items
+
+    def get(self, pk):
+        self.all()
+        try:
+            return self._by_pk.get(int(pk))
+        except (TypeError, ValueError):
+            return None
+
+    def invalidate(self):
+        cache.set(self.version_key, uuid.uuid4().hex, timeout=None)
+        self._items = None
+
+
+def _load_categories():
+    from .models import Category
+    return Category.objects.all()
+
+
+category_cache = ReferenceCache('category', _load_categories)
@@ -0,0 +1,72 @@
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+from .models import Collection, CollectionItem
+
+SAVED_CACHE_TIMEOUT = getattr(settings, 'SAVED_CACHE_TIMEOUT', 3600)
+DEFAULT_COLLECTION_NAME = 'Избранное'
+
+
+def _cache_key(user_id):
+    return f'saved:ids:{user_id}'
+
+
+def saved_recipe_ids(user):
+    """
+    Множество pk рецептов, сохранённых пользователем хотя бы в одну подборку.
+    Отметки «сохранено» на карточках проверяются по нему: один cache.get на
+    страницу, а при промахе — один запрос вместо запроса на каждую карточку.
+    """
+    if not user.is_authenticated:
+        return frozenset()
+    ids = cache.get(_cache_key(user.pk))
+    if ids is None:
+        ids = frozenset(
+            CollectionItem.objects.filter(collection__owner=user).values_list('recipe_id', flat=True).distinct()
+        )
+        cache.set(_cache_key(user.pk), ids, SAVED_CACHE_TIMEOUT)
+    return ids
+
+
+def invalidate(user_id):
+    # Сбрасываем после коммита, иначе параллельный запрос успеет закэшировать старое множество
+    transaction.on_commit(lambda: cache.delete(_cache_key(user_id)))
+
+
+def default_collection(user):
+    collection, _ = Collection.objects.get_or_create(owner=user, name=DEFAULT_COLLECTION_NAME)
+    return collection
+
+
+def is_default_collection(collection):
+    return collection.name == DEFAULT_COLLECTION_NAME
+
+
+def toggle_saved(user, recipe_id, collection=None):
+    """
+    Добавляет рецепт в подборку или убирает, если он там уже есть. Возвращает True, если добавлен.
+    Без подборки (кнопка на карточке) сохранённый рецепт убирается из всех подборок,
+    где он есть, а несохранённый добавляется в «Избранное».
+    """
+    with transaction.atomic():
+        if collection is None:
+            deleted, _ = CollectionItem.objects.filter(collection__owner=user, recipe_id=recipe_id).delete()
+            if not deleted:
+                CollectionItem.objects.get_or_create(collection=default_collection(user), recipe_id=recipe_id)
+        else:
+            deleted, _ = CollectionItem.objects.filter(collection=collection, recipe_id=recipe_id).delete()
+            if not deleted:
+                CollectionItem.objects.get_or_create(collection=collection, recipe_id=recipe_id)
+        invalidate(user.pk)
+    return not deleted
+
+
+def delete_collection(collection):
+    """Удаляет подборку, кроме «Избранного»: в него сохраняет кнопка на карточках. Возвращает True, если удалена."""
+    if is_default_collection(collection):
+        return False
+    with transaction.atomic():
+        collection.delete()
+        invalidate(collection.owner_id)
+    return True
@@ -0,0 +1,77 @@
+import re
+
+from django.db import connection
+from django.db.models.expressions import RawSQL
+
+# Полнотекстовые индексы SQLite FTS5: rowid совпадает с pk записи.
+# Таблицы создаёт миграция 0006; на других СУБД их нет, и поиск идёт обычными LIKE-запросами.
+RECIPE_FTS_TABLE = 'recipes_recipe_fts'
+COMMENT_FTS_TABLE = 'recipes_comment_fts'
+
+FTS_TABLES = {
+    RECIPE_FTS_TABLE: ('title', 'description'),
+    COMMENT_FTS_TABLE: ('text',),
+}
+
+
+def fts_enabled():
+    return connection.vendor == 'sqlite'
+
+
+def fts_query(term):
+    """Превращает строку поиска в запрос FTS5: каждое слово — префиксный токен."""
+    words = re.findall(r'\w+', term)
+    return ' '.join(f'"{word}"*' for word in words)
+
+
+def matching_ids(table, term):
+    """Подзапрос с pk записей, найденных в индексе, — для фильтра pk__in."""
+    return RawSQL(f'SELECT rowid FROM {table} WHERE {table} MATCH %s', [fts_query(term)])
+
+
+def _replace(table, pk, values):
+    columns = FTS_TABLES[table]
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {table} WHERE rowid = %s', [pk])
+        cursor.execute(
+            f"INSERT INTO {table} (rowid, {', '.join(columns)}) VALUES (%s{', %s' * len(columns)})",
+            [pk, *values],
+        )
+
+
+def _delete(table, pk):
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {table} WHERE rowid = %s', [pk])
+
+
+def index_recipe(recipe):
+    if fts_enabled():
+        _replace(RECIPE_FTS_TABLE, recipe.pk, [recipe.title, recipe.description])
+
+
+def unindex_recipe(pk):
+    if fts_enabled():
+        _delete(RECIPE_FTS_TABLE, pk)
+
+
+def index_comment(comment):
+    if fts_enabled():
+        _replace(COMMENT_FTS_TABLE, comment.pk, [comment.text])
+
+
+def unindex_comment(pk):
+    if fts_enabled():
+        _delete(COMMENT_FTS_TABLE, pk)
+
+
+def rebuild_index():
+    if not fts_enabled():
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {RECIPE_FTS_TABLE}')
+        cursor.execute(
+            f'INSERT INTO {RECIPE_FTS_TABLE} (rowid, title, description) '
+            f'SELECT id, title, description FROM recipes_recipe'
+        )
+        cursor.execute(f'DELETE FROM {COMMENT_FTS_TABLE}')
+        cursor.execute(f'INSERT INTO {COMMENT_FTS_TABLE} (rowid, text) SELECT id, text FROM recipes_comment')
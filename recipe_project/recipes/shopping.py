@@ -0,0 +1,181 @@
+import re
+from fractions import Fraction
+
+from django.conf import settings
+from django.core.cache import cache
+
+from .models import Recipe
+
+SHOPPING_CACHE_TIMEOUT = getattr(settings, 'SHOPPING_CACHE_TIMEOUT', 7 * 24 * 3600)
+SESSION_KEY = 'shopping_list'
+
+# Единица -> (базовая единица, множитель). Строки разбираются сразу в базовые единицы,
+# поэтому при слиянии списков остаётся одно умножение на порции и одно сложение на строку
+UNITS = {}
+for names, base, factor in (
+    (('г', 'гр', 'грамм', 'грамма', 'граммов'), 'г', 1),
+    (('кг', 'килограмм', 'килограмма', 'килограммов'), 'г', 1000),
+    (('мл', 'миллилитр', 'миллилитра', 'миллилитров'), 'мл', 1),
+    (('л', 'литр', 'литра', 'литров'), 'мл', 1000),
+    (('ст. л', 'ст. ложка', 'ст. ложки', 'ст. ложек', 'столовая ложка', 'столовые ложки', 'столовых ложек',
+      'ложка', 'ложки', 'ложек'), 'мл', 15),
+    (('ч. л', 'ч. ложка', 'ч. ложки', 'ч. ложек', 'чайная ложка', 'чайные ложки', 'чайных ложек'), 'мл', 5),
+    (('стакан', 'стакана', 'стаканов'), 'мл', 250),
+    (('шт', 'штука', 'штуки', 'штук'), 'шт', 1),
+):
+    UNITS.update(dict.fromkeys(names, (base, factor)))
+# «ст.л.», «ст. л» и «ст л» — одна единица: сравниваем без точек и пробелов
+_COMPACT_UNITS = {re.sub(r'[\s.]+', '', name): value for name, value in UNITS.items()}
+
+# Крупная единица для вывода: 1500 г -> 1.5 кг
+DISPLAY_UNITS = {'г': ('кг', 1000), 'мл': ('л', 1000)}
+VAGUE_AMOUNTS = ('по вкусу', 'щепотка', 'щепотку', 'щепотки')
+UNICODE_FRACTIONS = {'½': '1/2', '¼': '1/4', '¾': '3/4', '⅓': '1/3', '⅔': '2/3'}
+
+_QUANTITY = r'(?:\d+\s+\d+/\d+|\d+/\d+|\d+(?:[.,]\d+)?)(?:\s*[-–]\s*\d+(?:[.,]\d+)?)?'
+_UNIT = '|'.join(
+    re.escape(name).replace(r'\ ', r'\s*').replace(r'\.', r'\.?')
+    for name in sorted(UNITS, key=len, reverse=True)
+)
+_AMOUNT_RE = re.compile(rf'(?P<quantity>{_QUANTITY})\s*(?:(?P<unit>{_UNIT})\.?(?=[\s,;)]|$))?')
+_TRIM = ' \t-–—:,.;()'
+
+
+def _to_number(quantity):
+    """Число из количества или None, если его не разобрать («1/0»)."""
+    # Диапазон «2-3» считаем по верхней границе: в магазине лучше взять с запасом
+    quantity = re.split(r'\s*[-–]\s*', quantity)[-1].replace(',', '.')
+    try:
+        return float(sum(Fraction(part) for part in quantity.split()))
+    except (ValueError, ZeroDivisionError):
+        return None
+
+
+def _unparsed(line):
+    # Строка без понятного количества идёт в список как есть, без суммирования
+    for phrase in VAGUE_AMOUNTS:
+        line = line.replace(phrase, '')
+    line = re.sub(r'\s+', ' ', line).strip(_TRIM)
+    return (line, None, None) if line else None
+
+
+def parse_line(line):
+    """
+    Строка ингредиентов -> (название, базовая единица, количество). Понимает «мука 200 г»,
+    «мука — 200 г», «2 стакана муки», «1/2 ч. л. соли»; количество None — «по вкусу».
+    Из нескольких чисел берётся последнее с известной единицей, иначе первое.
+    Незнакомая единица после количества («чеснок 2 зубчика») остаётся своей единицей,
+    а строка с неразборчивым количеством («соль 1/0 г») — текстом без количества.
+    """
+    line = line.strip()
+    for symbol, fraction in UNICODE_FRACTIONS.items():
+        line = line.replace(symbol, f' {fraction}')
+    lowered = line.lower()
+    # Количество с известной единицей важнее голого числа: в «сливки 33% 200 мл» это 200 мл
+    matches = list(_AMOUNT_RE.finditer(lowered))
+    with_unit = [candidate for candidate in matches if candidate['unit']]
+    match = with_unit[-1] if with_unit else next(iter(matches), None)
+    amount = _to_number(match['quantity']) if match else None
+    if amount is None:
+        return _unparsed(lowered)
+
+    unit_info = _COMPACT_UNITS[re.sub(r'[\s.]+', '', match['unit'])] if match['unit'] else None
+    before, after = lowered[:match.start()].strip(_TRIM), lowered[match.end():].strip(_TRIM)
+    if before:
+        # «название количество [единица]»: всё после количества — единица
+        name = before
+        if unit_info is None and after:
+            unit_info = (after, 1)
+    else:
+        # «количество [единица] название»
+        name = after
+    if not name:
+        return None
+    name = re.sub(r'\s+', ' ', name)
+    base, factor = unit_info or ('шт', 1)
+    return name, base, amount * factor
+
+
+def parse_ingredients(text):
+    return [row for row in map(parse_line, text.splitlines()) if row is not None]
+
+
+def _cache_key(recipe):
+    return f'shopping:rows:{recipe.pk}:{recipe.updated_at.timestamp()}'
+
+
+def recipe_rows(recipes):
+    """
+    Разобранные строки ингредиентов для каждого рецепта. Кэш привязан к версии рецепта
+    (updated_at), поэтому правка рецепта просто даёт новый ключ. Одно обращение к кэшу
+    на все рецепты; текст ингредиентов читается из БД только для промахов.
+    """
+    keys = {recipe.pk: _cache_key(recipe) for recipe in recipes}
+    cached = cache.get_many(keys.values())
+    rows = {pk: cached[key] for pk, key in keys.items() if key in cached}
+    missing = [pk for pk in keys if pk not in rows]
+    if missing:
+        fresh = {
+            pk: parse_ingredients(ingredients)
+            for pk, ingredients in Recipe.objects.filter(pk__in=missing).values_list('pk', 'ingredients')
+        }
+        cache.set_many({keys[pk]: value for pk, value in fresh.items()}, SHOPPING_CACHE_TIMEOUT)
+        rows.update(fresh)
+    return rows
+
+
+def format_amount(amount, unit):
+    if amount is None:
+        return 'по вкусу'
+    if unit in DISPLAY_UNITS and amount >= DISPLAY_UNITS[unit][1]:
+        unit, divisor = DISPLAY_UNITS[unit]
+        amount /= divisor
+    return f'{round(amount, 2):g} {unit}'
+
+
+class ShoppingList:
+    """Объединённый список покупок: строки с одинаковым названием и единицей складываются."""
+
+    def __init__(self, entries, items):
+        # entries — [(рецепт, порций)], items — [(название, количество для вывода)]
+        self.entries = entries
+        self.items = items
+
+
+def build_shopping_list(selection):
+    """selection — {pk рецепта: порций}; масштаб — порции / servings рецепта (или 1)."""
+    recipes = list(
+        Recipe.objects.filter(pk__in=selection).only('pk', 'title', 'servings', 'updated_at').order_by('title')
+    )
+    rows = recipe_rows(recipes)
+    totals = {}
+    for recipe in recipes:
+        scale = selection[recipe.pk] / (recipe.servings or 1)
+        for name, unit, amount in rows.get(recipe.pk, ()):
+            slot = (name, unit)
+            if amount is None:
+                totals.setdefault(slot, None)
+            else:
+                totals[slot] = (totals.get(slot) or 0) + amount * scale
+    items = [
+        (name, format_amount(amount, unit))
+        for (name, unit), amount in sorted(totals.items(), key=lambda item: (item[0][0], item[0][1] or ''))
+    ]
+    return ShoppingList([(recipe, selection[recipe.pk]) for recipe in recipes], items)
+
+
+def get_selection(session):
+    return {int(pk): portions for pk, portions in session.get(SESSION_KEY, {}).items()}
+
+
+def set_portions(session, recipe_id, portions):
+    selection = session.get(SESSION_KEY, {})
+    if portions:
+        selection[str(recipe_id)] = portions
+    else:
+        selection.pop(str(recipe_id), None)
+    session[SESSION_KEY] = selection
+
+
+def clear_selection(session):
+    session.pop(SESSION_KEY, None)
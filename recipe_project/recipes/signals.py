@@ -0,0 +1,239 @@
+from django.conf import settings
+from django.db import transaction
+from django.db.models.fields.files import FieldFile
+from django.db.models.signals import pre_save, post_save, pre_delete, post_delete
+from django.dispatch import receiver
+
+from accounts.models import Follow
+
+from . import dedup, facets, ratings, search, stats, timeline
+from .models import AuthorStats, Category, Rating, Recipe, Step, Comment
+from .feed_stamps import forget_author, touch_feeds
+from .page_cache import purge_tags
+from .reference_cache import category_cache
+
+TRACKED_RECIPE_FIELDS = ('title', 'description', 'category_id', 'ingredients', 'image')
+# Поля, от которых зависят счётчики фасетов в списке рецептов
+FACET_FIELDS = {'category_id', 'image'}
+# Поля, из текста которых считается MinHash-подпись
+TEXT_FIELDS = {'title', 'description', 'ingredients'}
+
+
+def _purge_on_commit(*tags):
+    transaction.on_commit(lambda: purge_tags(*tags))
+
+
+@receiver([post_save, post_delete], sender=Category)
+def invalidate_category_cache(sender, **kwargs):
+    # Сбрасываем после коммита, иначе другой воркер может успеть закэшировать старые данные
+    transaction.on_commit(category_cache.invalidate)
+
+
+@receiver([post_save, post_delete], sender=Category)
+def purge_category_pages(sender, instance, **kwargs):
+    _purge_on_commit('home', 'categories', f'category:{instance.pk}')
+
+
+def _tracked_value(value):
+    # Файловое поле хранится в БД как имя файла, причём пустое — и как '', и как NULL
+    if isinstance(value, FieldFile):
+        value = value.name
+    return None if value == '' else value
+
+
+@receiver(pre_save, sender=Recipe)
+def track_recipe_changes(sender, instance, **kwargs):
+    # Старые значения полей — чтобы сбросить и прежний, и новый список
+    loaded = getattr(instance, '_loaded_values', {})
+    current = {name: _tracked_value(getattr(instance, name)) for name in TRACKED_RECIPE_FIELDS}
+    instance._previous_values = {name: loaded.get(name) for name in TRACKED_RECIPE_FIELDS}
+    instance._changed_fields = {
+        name for name in TRACKED_RECIPE_FIELDS
+        if name not in loaded or _tracked_value(loaded[name]) != current[name]
+    }
+    instance._loaded_values = {**loaded, **current}
+
+
+@receiver(pre_save, sender=Recipe)
+def update_recipe_signature(sender, instance, **kwargs):
+    # Регистрируется после track_recipe_changes и пользуется её _changed_fields
+    if instance._changed_fields & TEXT_FIELDS:
+        signature = dedup.compute_signature(
+            dedup.recipe_text(instance.title, instance.description, instance.ingredients)
+        )
+        instance.minhash = dedup.pack_signature(signature)
+        instance._signature = signature
+
+
+@receiver(post_save, sender=Recipe)
+def purge_recipe_pages(sender, instance, created, **kwargs):
+    scope = instance.category_id or 'all'
+    if created:
+        _purge_on_commit('home', 'facets', 'list:all', f'list:{scope}')
+        return
+
+    tags = {f'detail:{instance.pk}', f'card:{instance.pk}'}
+    changed = instance._changed_fields
+    previous_scope = instance._previous_values['category_id'] or 'all'
+    if 'category_id' in changed:
+        tags.update({'home', f'list:{scope}', f'list:{previous_scope}'})
+    if changed & FACET_FIELDS:
+        tags.add('facets')
+    if changed & {'title', 'ingredients'}:
+        tags.update({'search:all', f'search:{scope}', f'search:{previous_scope}'})
+    _purge_on_commit(*tags)
+
+
+@receiver(post_delete, sender=Recipe)
+def purge_deleted_recipe_pages(sender, instance, **kwargs):
+    _purge_on_commit(
+        'home', 'facets', 'list:all', f'list:{instance.category_id or "all"}',
+        f'detail:{instance.pk}', f'card:{instance.pk}',
+    )
+
+
+@receiver(post_save, sender=Recipe)
+def invalidate_facet_counts(sender, instance, created, **kwargs):
+    if created or instance._changed_fields & FACET_FIELDS:
+        transaction.on_commit(facets.invalidate)
+
+
+@receiver(post_delete, sender=Recipe)
+@receiver(post_delete, sender=Category)
+def invalidate_facet_counts_on_delete(sender, instance, **kwargs):
+    # Удаление категории обнуляет category_id рецептов одним UPDATE, без сигналов Recipe
+    transaction.on_commit(facets.invalidate)
+
+
+@receiver([post_save, post_delete], sender=Step)
+@receiver([post_save, post_delete], sender=Comment)
+def purge_recipe_detail_page(sender, instance, **kwargs):
+    _purge_on_commit(f'detail:{instance.recipe_id}')
+
+
+@receiver(post_save, sender=Recipe)
+def update_author_stats_on_save(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    if created:
+        stats.recipe_added(instance.author_id)
+    elif 'category_id' in instance._changed_fields:
+        stats.refresh_top_category(instance.author_id)
+
+
+@receiver(post_delete, sender=Recipe)
+def update_author_stats_on_delete(sender, instance, **kwargs):
+    stats.recipe_removed(instance.author_id)
+
+
+@receiver(post_save, sender=Comment)
+def count_received_comment(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        stats.comment_added(instance.recipe_id)
+
+
+@receiver(post_delete, sender=Comment)
+def uncount_received_comment(sender, instance, **kwargs):
+    stats.comment_removed(instance.recipe_id)
+
+
+@receiver(pre_delete, sender=Category)
+def refresh_top_category_on_delete(sender, instance, **kwargs):
+    # После SET_NULL рецепты этой категории уже не найти — запоминаем авторов заранее
+    author_ids = list(AuthorStats.objects.filter(top_category=instance).values_list('author_id', flat=True))
+    transaction.on_commit(lambda: [stats.refresh_top_category(author_id) for author_id in author_ids])
+
+
+@receiver(post_save, sender=Recipe)
+def index_recipe_for_search(sender, instance, raw=False, **kwargs):
+    if not raw:
+        search.index_recipe(instance)
+
+
+@receiver(post_delete, sender=Recipe)
+def unindex_recipe_for_search(sender, instance, **kwargs):
+    search.unindex_recipe(instance.pk)
+
+
+@receiver(post_save, sender=Comment)
+def index_comment_for_search(sender, instance, raw=False, **kwargs):
+    if not raw:
+        search.index_comment(instance)
+
+
+@receiver(post_delete, sender=Comment)
+def unindex_comment_for_search(sender, instance, **kwargs):
+    search.unindex_comment(instance.pk)
+
+
+@receiver(post_save, sender=Recipe)
+@receiver(post_delete, sender=Recipe)
+def touch_recipe_feeds(sender, instance, **kwargs):
+    scopes = {'all', f'author:{instance.author_id}'}
+    if instance.category_id:
+        scopes.add(f'category:{instance.category_id}')
+    previous_category_id = getattr(instance, '_previous_values', {}).get('category_id')
+    if previous_category_id:
+        scopes.add(f'category:{previous_category_id}')
+    transaction.on_commit(lambda: touch_feeds(*scopes))
+
+
+@receiver([post_save, post_delete], sender=Category)
+def touch_category_feed(sender, instance, **kwargs):
+    transaction.on_commit(lambda: touch_feeds(f'category:{instance.pk}'))
+
+
+@receiver([post_save, post_delete], sender=settings.AUTH_USER_MODEL)
+def forget_feed_author(sender, instance, **kwargs):
+    transaction.on_commit(lambda: forget_author(instance.username))
+
+
+@receiver(post_save, sender=Recipe)
+def fan_out_new_recipe(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        transaction.on_commit(lambda: timeline.fan_out(instance))
+
+
+@receiver(post_save, sender=Follow)
+def follow_created(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        stats.follower_added(instance.author_id)
+        transaction.on_commit(lambda: timeline.backfill(instance.follower_id, instance.author_id))
+
+
+@receiver(post_delete, sender=Follow)
+def follow_deleted(sender, instance, **kwargs):
+    stats.follower_removed(instance.author_id)
+    timeline.remove_author(instance.follower_id, instance.author_id)
+    if timeline.just_demoted(instance.author_id):
+        transaction.on_commit(lambda: timeline.backfill_followers(instance.author_id))
+
+
+@receiver(post_save, sender=Rating)
+def update_rating_aggregates(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    if created:
+        ratings.apply_rating_delta(instance.recipe_id, 1, instance.value)
+    else:
+        previous = getattr(instance, '_loaded_value', None)
+        if previous is not None and previous != instance.value:
+            ratings.apply_rating_delta(instance.recipe_id, 0, instance.value - previous)
+    instance._loaded_value = instance.value
+
+
+@receiver(post_delete, sender=Rating)
+def remove_rating_from_aggregates(sender, instance, **kwargs):
+    ratings.apply_rating_delta(instance.recipe_id, -1, -instance.value)
+
+
+@receiver([post_save, post_delete], sender=Rating)
+def purge_rated_recipe_pages(sender, instance, **kwargs):
+    _purge_on_commit(f'detail:{instance.recipe_id}', f'card:{instance.recipe_id}', 'ratings')
+
+
+@receiver(post_save, sender=Recipe)
+def index_recipe_signature(sender, instance, raw=False, **kwargs):
+    if not raw and hasattr(instance, '_signature'):
+        dedup.index_signature(instance.pk, instance._signature)
+        del instance._signature
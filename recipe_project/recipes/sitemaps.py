@@ -0,0 +1,197 @@
+import hashlib
+import json
+import os
+import tempfile
+from datetime import datetime
+from pathlib import Path
+from xml.sax.saxutils import escape
+
+from django.conf import settings
+from django.db.models import Count, ExpressionWrapper, F, IntegerField, Max, Sum
+from django.http import FileResponse, Http404
+from django.urls import reverse
+from django.views.decorators.http import condition, require_GET
+
+from .models import Recipe
+
+SEGMENT_SIZE = getattr(settings, 'SITEMAP_SEGMENT_SIZE', 5000)
+QUERY_CHUNK_SIZE = 1000
+INDEX_NAME = 'sitemap.xml'
+CATEGORIES_NAME = 'sitemap-categories.xml'
+MANIFEST_NAME = 'manifest.json'
+
+XML_HEADER = '<?xml version="1.0" encoding="UTF-8"?>\n'
+XMLNS = 'http://www.sitemaps.org/schemas/sitemap/0.9'
+
+
+def sitemap_root():
+    return Path(getattr(settings, 'SITEMAP_ROOT', settings.BASE_DIR / 'sitemaps'))
+
+
+def segment_name(segment):
+    return f'sitemap-recipes-{segment}.xml'
+
+
+def segment_fingerprints():
+    """
+    Один сгруппированный запрос: для каждого диапазона pk шириной SEGMENT_SIZE
+    возвращает число рецептов, последнее изменение и сумму pk. Если отпечаток
+    сегмента не изменился с прошлой генерации, его файл не перезаписывается.
+    """
+    rows = (
+        Recipe.objects
+        .annotate(segment=ExpressionWrapper(F('pk') / SEGMENT_SIZE, output_field=IntegerField()))
+        .values('segment')
+        .annotate(count=Count('pk'), last_modified=Max('updated_at'), checksum=Sum('pk'))
+        .order_by('segment')
+    )
+    return {
+        segment_name(row['segment']): {
+            'segment': row['segment'],
+            'fingerprint': f"{row['count']}:{row['last_modified'].isoformat()}:{row['checksum']}",
+            'lastmod': row['last_modified'].isoformat(),
+        }
+        for row in rows
+    }
+
+
+def category_rows():
+    return list(
+        Recipe.objects.filter(category__isnull=False)
+        .values('category_id')
+        .annotate(last_modified=Max('updated_at'))
+        .order_by('category_id')
+    )
+
+
+def _url_entry(site_url, location, lastmod):
+    return f'<url><loc>{escape(site_url + location)}</loc><lastmod>{lastmod}</lastmod></url>\n'
+
+
+def _write_atomic(path, chunks):
+    # Пишем во временный файл рядом и подменяем: сервер никогда не отдаёт недописанный файл
+    fd, tmp_path = tempfile.mkstemp(dir=path.parent, prefix='.tmp-', suffix='.xml')
+    try:
+        with os.fdopen(fd, 'w', encoding='utf-8') as tmp:
+            for chunk in chunks:
+                tmp.write(chunk)
+        os.chmod(tmp_path, 0o644)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+
+def _segment_urls(segment, site_url):
+    """Рецепты сегмента пачками по QUERY_CHUNK_SIZE: WHERE pk > последний ORDER BY pk LIMIT ..."""
+    yield XML_HEADER + f'<urlset xmlns="{XMLNS}">\n'
+    last_pk = segment * SEGMENT_SIZE - 1
+    upper = (segment + 1) * SEGMENT_SIZE
+    while True:
+        chunk = list(
+            Recipe.objects.filter(pk__gt=last_pk, pk__lt=upper)
+            .order_by('pk')
+            .values_list('pk', 'updated_at')[:QUERY_CHUNK_SIZE]
+        )
+        for pk, updated_at in chunk:
+            yield _url_entry(site_url, reverse('recipe_detail', args=[pk]), updated_at.isoformat())
+        if len(chunk) < QUERY_CHUNK_SIZE:
+            break
+        last_pk = chunk[-1][0]
+    yield '</urlset>\n'
+
+
+def _category_urls(rows, site_url):
+    yield XML_HEADER + f'<urlset xmlns="{XMLNS}">\n'
+    list_url = reverse('recipe_list')
+    for row in rows:
+        yield _url_entry(site_url, f"{list_url}?category={row['category_id']}", row['last_modified'].isoformat())
+    yield '</urlset>\n'
+
+
+def _index_entries(files, site_url):
+    yield XML_HEADER + f'<sitemapindex xmlns="{XMLNS}">\n'
+    for name, lastmod in files:
+        location = escape(site_url + reverse('sitemap_file', args=[name]))
+        yield f'<sitemap><loc>{location}</loc><lastmod>{lastmod}</lastmod></sitemap>\n'
+    yield '</sitemapindex>\n'
+
+
+def _load_manifest(root):
+    try:
+        return json.loads((root / MANIFEST_NAME).read_text(encoding='utf-8'))
+    except (OSError, ValueError):
+        return {}
+
+
+def generate_sitemaps(full=False, site_url=None):
+    """
+    Обновляет файлы карты сайта в SITEMAP_ROOT. Перегенерируются только сегменты,
+    чей отпечаток отличается от записанного в manifest.json (или все при full=True
+    и при смене SITE_URL); файлы исчезнувших сегментов удаляются.
+    Возвращает (перезаписано, без изменений, удалено).
+    """
+    site_url = (site_url or settings.SITE_URL).rstrip('/')
+    root = sitemap_root()
+    root.mkdir(parents=True, exist_ok=True)
+
+    manifest = _load_manifest(root)
+    if manifest.get('site_url') != site_url:
+        full = True
+    previous = {} if full else manifest.get('files', {})
+
+    current = segment_fingerprints()
+    categories = category_rows()
+    categories_lastmod = max((row['last_modified'] for row in categories), default=None)
+    current[CATEGORIES_NAME] = {
+        'fingerprint': hashlib.md5(json.dumps(
+            [[row['category_id'], row['last_modified'].isoformat()] for row in categories]
+        ).encode()).hexdigest(),
+        'lastmod': (categories_lastmod or datetime.fromtimestamp(0).astimezone()).isoformat(),
+    }
+
+    written = kept = 0
+    for name, info in current.items():
+        if previous.get(name) == info['fingerprint'] and (root / name).exists():
+            kept += 1
+            continue
+        if name == CATEGORIES_NAME:
+            _write_atomic(root / name, _category_urls(categories, site_url))
+        else:
+            _write_atomic(root / name, _segment_urls(info['segment'], site_url))
+        written += 1
+
+    removed = 0
+    for name in set(manifest.get('files', {})) - set(current):
+        (root / name).unlink(missing_ok=True)
+        removed += 1
+
+    _write_atomic(root / INDEX_NAME, _index_entries(
+        ((name, info['lastmod']) for name, info in current.items()), site_url))
+    _write_atomic(root / MANIFEST_NAME, [json.dumps({
+        'site_url': site_url,
+        'files': {name: info['fingerprint'] for name, info in current.items()},
+    })])
+    return written, kept, removed
+
+
+def _file_path(name):
+    if name != INDEX_NAME and not (name.startswith('sitemap-') and name.endswith('.xml')):
+        raise Http404
+    path = sitemap_root() / name
+    if path.parent != sitemap_root() or not path.is_file():
+        raise Http404
+    return path
+
+
+def _file_mtime(request, name=INDEX_NAME):
+    try:
+        return datetime.fromtimestamp(_file_path(name).stat().st_mtime).astimezone()
+    except Http404:
+        return None
+
+
+@require_GET
+@condition(last_modified_func=_file_mtime)
+def serve_sitemap(request, name=INDEX_NAME):
+    return FileResponse(open(_file_path(name), 'rb'), content_type='application/xml')
@@ -0,0 +1,106 @@
+from django.db.models import Count, F, Subquery
+
+from accounts.models import Follow
+
+from .models import AuthorStats, Comment, Recipe
+
+
+def _top_category_id(author_id):
+    return (
+        Recipe.objects.filter(author_id=author_id, category__isnull=False)
+        .values('category_id')
+        .annotate(total=Count('pk'))
+        .order_by('-total', 'category_id')
+        .values_list('category_id', flat=True)
+        .first()
+    )
+
+
+def recipe_added(author_id):
+    AuthorStats.objects.get_or_create(author_id=author_id)
+    AuthorStats.objects.filter(author_id=author_id).update(recipe_count=F('recipe_count') + 1)
+    refresh_top_category(author_id)
+
+
+def recipe_removed(author_id):
+    AuthorStats.objects.filter(author_id=author_id, recipe_count__gt=0).update(recipe_count=F('recipe_count') - 1)
+    refresh_top_category(author_id)
+
+
+def refresh_top_category(author_id):
+    # Один сгруппированный запрос по рецептам автора — только при изменении его рецептов
+    AuthorStats.objects.filter(author_id=author_id).update(top_category_id=_top_category_id(author_id))
+
+
+def _recipe_author(recipe_id):
+    return Subquery(Recipe.objects.filter(pk=recipe_id).values('author_id')[:1])
+
+
+def comment_added(recipe_id):
+    AuthorStats.objects.filter(author_id=_recipe_author(recipe_id)).update(
+        comments_received=F('comments_received') + 1
+    )
+
+
+def comment_removed(recipe_id):
+    AuthorStats.objects.filter(author_id=_recipe_author(recipe_id), comments_received__gt=0).update(
+        comments_received=F('comments_received') - 1
+    )
+
+
+def follower_added(author_id):
+    AuthorStats.objects.get_or_create(author_id=author_id)
+    AuthorStats.objects.filter(author_id=author_id).update(follower_count=F('follower_count') + 1)
+
+
+def follower_removed(author_id):
+    AuthorStats.objects.filter(author_id=author_id, follower_count__gt=0).update(
+        follower_count=F('follower_count') - 1
+    )
+
+
+def rebuild_author_stats(author_ids=None):
+    """Пересчитывает статистику с нуля (для заполнения и сверки)."""
+    recipes = Recipe.objects.all()
+    follows = Follow.objects.all()
+    if author_ids is not None:
+        recipes = recipes.filter(author_id__in=author_ids)
+        follows = follows.filter(author_id__in=author_ids)
+
+    recipe_counts = dict(recipes.values('author_id').annotate(total=Count('pk')).values_list('author_id', 'total'))
+    comment_counts = dict(
+        Comment.objects.filter(recipe__in=recipes)
+        .values('recipe__author_id')
+        .annotate(total=Count('pk'))
+        .values_list('recipe__author_id', 'total')
+    )
+    follower_counts = dict(follows.values('author_id').annotate(total=Count('pk')).values_list('author_id', 'total'))
+
+    top_categories = {}
+    by_category = (
+        recipes.filter(category__isnull=False)
+        .values('author_id', 'category_id')
+        .annotate(total=Count('pk'))
+        .order_by('author_id', '-total', 'category_id')
+        .values_list('author_id', 'category_id')
+    )
+    for author_id, category_id in by_category:
+        top_categories.setdefault(author_id, category_id)
+
+    stats = [
+        AuthorStats(
+            author_id=author_id,
+            recipe_count=recipe_counts.get(author_id, 0),
+            comments_received=comment_counts.get(author_id, 0),
+            follower_count=follower_counts.get(author_id, 0),
+            top_category_id=top_categories.get(author_id),
+        )
+        for author_id in recipe_counts.keys() | follower_counts.keys()
+    ]
+    AuthorStats.objects.bulk_create(
+        stats,
+        update_conflicts=True,
+        unique_fields=['author'],
+        update_fields=['recipe_count', 'comments_received', 'follower_count', 'top_category', 'updated_at'],
+    )
+    return len(stats)
@@ -1,3 +1,878 @@
-from django.test import TestCase
+import os
+import shutil
+import tempfile
+import time
+from datetime import timedelta
+from importlib import import_module
+from io import StringIO
+from unittest import mock
 
-# Create your tests here.
+from django.apps import apps
+from django.contrib.auth import get_user_model
+from django.core import mail
+from django.core.cache import cache
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.core.paginator import EmptyPage
+from django.db import OperationalError, connection
+from django.forms import modelform_factory
+from django.http import QueryDict
+from django.test import RequestFactory, SimpleTestCase, TestCase, override_settings
+from django.utils import timezone
+
+from accounts.models import Follow
+from recipe_project.db_retry import retry_on_locked
+from recipe_project import ratelimit
+from recipe_project.db_router import HEARTBEAT_TABLE, ReplicaMonitor, replica_lag, sticky_seconds, write_heartbeat
+from recipe_project.startup import profile_startup
+
+from . import dedup, facets, ratings, timeline
+from .admin_utils import EstimatedCountPaginator, estimate_row_count
+from .forms import CommentForm
+from .management.commands.send_comment_digests import Command as DigestCommand
+from .models import (
+    AuthorStats, Category, Collection, CollectionItem, Comment, DigestCheckpoint, Recipe, RecipeLSHBucket, TimelineEntry,
+)
+from .page_cache import purge_tags
+from .pagination import encode_cursor, keyset_paginate
+from .reference_cache import ReferenceCache, category_cache
+from .saved import DEFAULT_COLLECTION_NAME, saved_recipe_ids, toggle_saved
+from .shopping import build_shopping_list, parse_line
+from .sitemaps import generate_sitemaps
+
+User = get_user_model()
+
+# Тесты не трогают общий файловый кэш разработчика
+TEST_CACHES = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'tests'}}
+
+
+class CacheIsolationMixin:
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+        category_cache.invalidate()
+
+
+def make_recipe(author, **fields):
+    fields.setdefault('title', 'Блины')
+    fields.setdefault('description', 'Тонкие блины на молоке')
+    fields.setdefault('ingredients', 'мука 200 г\nмолоко 500 мл')
+    return Recipe.objects.create(author=author, **fields)
+
+
+# Модули, которые не должны импортироваться при запуске manage.py: формы (Pillow),
+# представления с рендерингом писем, админка и ленты грузятся при первом обращении
+DEFERRED_MODULES = (
+    'PIL',
+    'recipes.admin', 'accounts.admin', 'django.contrib.auth.forms',
+    'recipes.forms', 'accounts.forms',
+    'recipes.views', 'accounts.views',
+    'recipes.feeds', 'django.contrib.syndication.views',
+)
+# С запасом на медленные CI-машины; сейчас django.setup() занимает ~0.25 с
+SETUP_TIME_BUDGET = 1.5
+
+
+class ColdStartTests(SimpleTestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.profile = profile_startup()
+
+    def test_heavy_modules_are_deferred(self):
+        loaded = [module for module in DEFERRED_MODULES if module in self.profile.modules]
+        self.assertEqual(loaded, [])
+
+    def test_setup_time_within_budget(self):
+        self.assertLess(self.profile.setup, SETUP_TIME_BUDGET)
+
+    def test_ready_is_measured_for_every_app(self):
+        self.assertIn('recipes', self.profile.ready)
+        self.assertIn('admin', self.profile.ready)
+
+    def test_unknown_command_is_rejected_before_profiling(self):
+        with mock.patch('recipes.management.commands.profile_startup.profile_startup') as profile:
+            with self.assertRaisesMessage(CommandError, 'Неизвестная команда: nosuchcommand'):
+                call_command('profile_startup', 'nosuchcommand', stdout=StringIO())
+        profile.assert_not_called()
+
+    def test_child_failure_reports_its_stderr(self):
+        with mock.patch.dict(os.environ, {'DJANGO_SETTINGS_MODULE': 'no_such_settings'}):
+            with self.assertRaisesMessage(RuntimeError, "No module named 'no_such_settings'"):
+                profile_startup()
+
+
+@override_settings(CACHES=TEST_CACHES)
+class ReferenceCacheTests(CacheIsolationMixin, TestCase):
+    def test_loads_once_until_version_changes(self):
+        calls = []
+        ref = ReferenceCache('test', lambda: calls.append(1) or list(Category.objects.all()))
+        ref.all()
+        ref.all()
+        self.assertEqual(len(calls), 1)
+        ref.invalidate()
+        ref.all()
+        self.assertEqual(len(calls), 2)
+
+    def test_invalidation_reaches_other_workers(self):
+        # Два экземпляра с одним именем — как копии кэша в двух процессах
+        first = ReferenceCache('shared', lambda: list(Category.objects.all()))
+        second = ReferenceCache('shared', lambda: list(Category.objects.all()))
+        self.assertEqual(second.all(), [])
+        category = Category.objects.create(name='Супы')
+        first.invalidate()
+        self.assertEqual(second.get(category.pk), category)
+
+    def test_category_save_invalidates_after_commit(self):
+        category_cache.all()
+        with self.captureOnCommitCallbacks(execute=True):
+            category = Category.objects.create(name='Выпечка')
+        self.assertEqual(category_cache.get(category.pk).name, 'Выпечка')
+        self.assertIsNone(category_cache.get('not-a-pk'))
+
+
+@override_settings(CACHES=TEST_CACHES)
+class PageCacheTests(CacheIsolationMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.author = User.objects.create_user('author', 'author@example.com', 'pw')
+        self.recipe = make_recipe(self.author)
+
+    def test_second_anonymous_request_is_a_hit(self):
+        self.assertEqual(self.client.get('/')['X-Page-Cache'], 'MISS')
+        self.assertEqual(self.client.get('/')['X-Page-Cache'], 'HIT')
+
+    def test_unknown_params_do_not_poison_the_cache(self):
+        response = self.client.get('/?q=HACKED')
+        self.assertNotIn('X-Page-Cache', response)
+        self.assertNotContains(self.client.get('/'), 'HACKED')
+
+        self.assertNotIn('X-Page-Cache', self.client.get('/recipes/?zzz=INJECT'))
+        self.client.get('/recipes/')
+        self.assertNotContains(self.client.get('/recipes/'), 'INJECT')
+
+    def test_list_form_echoes_only_known_filters(self):
+        response = self.client.get('/recipes/?sort=top')
+        self.assertContains(response, 'name="sort" value="top"')
+
+    def test_recipe_change_purges_its_pages(self):
+        url = f'/{self.recipe.pk}/'
+        self.client.get(url)
+        self.assertEqual(self.client.get(url)['X-Page-Cache'], 'HIT')
+        self.recipe.title = 'Оладьи'
+        with self.captureOnCommitCallbacks(execute=True):
+            self.recipe.save()
+        response = self.client.get(url)
+        self.assertEqual(response['X-Page-Cache'], 'MISS')
+        self.assertContains(response, 'Оладьи')
+
+    def test_purge_touches_only_tagged_pages(self):
+        self.client.get('/')
+        self.client.get(f'/{self.recipe.pk}/')
+        purge_tags('home')
+        self.assertEqual(self.client.get('/')['X-Page-Cache'], 'MISS')
+        self.assertEqual(self.client.get(f'/{self.recipe.pk}/')['X-Page-Cache'], 'HIT')
+
+    def test_purge_during_render_leaves_stored_page_stale(self):
+        # Данные уже прочитаны, и в этот момент приходит сброс: страница не должна стать свежей
+        def purge_mid_render():
+            purge_tags(f'detail:{self.recipe.pk}')
+            return CommentForm()
+
+        url = f'/{self.recipe.pk}/'
+        with mock.patch('recipes.views.CommentForm', side_effect=purge_mid_render):
+            self.assertEqual(self.client.get(url)['X-Page-Cache'], 'MISS')
+        self.assertEqual(self.client.get(url)['X-Page-Cache'], 'MISS')
+        self.assertEqual(self.client.get(url)['X-Page-Cache'], 'HIT')
+
+        with mock.patch('recipes.views.saved_recipe_ids', side_effect=lambda user: purge_tags('home') or frozenset()):
+            self.client.get('/')
+        self.assertEqual(self.client.get('/')['X-Page-Cache'], 'MISS')
+
+    def test_lost_tag_version_invalidates_page(self):
+        url = f'/{self.recipe.pk}/'
+        self.client.get(url)
+        cache.delete(f'pagecache:tagv:detail:{self.recipe.pk}')
+        self.assertEqual(self.client.get(url)['X-Page-Cache'], 'MISS')
+
+
+class KeysetPaginationTests(TestCase):
+    def setUp(self):
+        self.author = User.objects.create_user('author', 'author@example.com', 'pw')
+        # Одинаковое created_at у всех: порядок и границы страниц держит pk
+        now = timezone.now()
+        self.recipes = [make_recipe(self.author, title=f'R{i}') for i in range(7)]
+        Recipe.objects.update(created_at=now)
+
+    def test_pages_cover_all_rows_once_in_order(self):
+        seen, cursor = [], None
+        while True:
+            page = keyset_paginate(Recipe.objects.all(), cursor, 3)
+            seen.extend(recipe.pk for recipe in page)
+            if not page.has_next:
+                break
+            cursor = page.next_cursor
+        self.assertEqual(seen, sorted((recipe.pk for recipe in self.recipes), reverse=True))
+
+    def test_first_page_flag_and_broken_cursor(self):
+        self.assertTrue(keyset_paginate(Recipe.objects.all(), None, 3).is_first)
+        page = keyset_paginate(Recipe.objects.all(), 'not-base64!', 3)
+        self.assertTrue(page.is_first)
+        # Курсор не той длины тоже считается битым
+        self.assertTrue(keyset_paginate(Recipe.objects.all(), encode_cursor(['x']), 3).is_first)
+
+    def test_crafted_cursors_fall_back_to_first_page(self):
+        for values in ([1, 1], [None, None], [{}, []], ['2024-01-01T00:00:00+00:00', 10 ** 30]):
+            with self.subTest(values=values):
+                page = keyset_paginate(Recipe.objects.all(), encode_cursor(values), 3)
+                self.assertTrue(page.is_first)
+
+    def test_crafted_cursor_on_profile_page(self):
+        self.client.force_login(self.author)
+        for values in ([1, 1], [None, None]):
+            response = self.client.get('/accounts/profile/', {'cursor': encode_cursor(values)})
+            self.assertEqual(response.status_code, 200)
+
+    def test_rows_inserted_before_cursor_do_not_shift_pages(self):
+        first = keyset_paginate(Recipe.objects.all(), None, 3)
+        make_recipe(self.author, title='Новый')
+        second = keyset_paginate(Recipe.objects.all(), first.next_cursor, 3)
+        self.assertEqual([recipe.pk for recipe in second], [recipe.pk for recipe in self.recipes[3:0:-1]])
+
+
+class AuthorStatsTests(TestCase):
+    def test_counters_follow_recipes_and_comments(self):
+        author = User.objects.create_user('author', 'author@example.com', 'pw')
+        reader = User.objects.create_user('reader', 'reader@example.com', 'pw')
+        soups = Category.objects.create(name='Супы')
+        recipe = make_recipe(author, category=soups)
+        make_recipe(author, category=soups)
+        Comment.objects.create(recipe=recipe, user=reader, text='Вкусно')
+
+        stats = AuthorStats.objects.get(author=author)
+        self.assertEqual((stats.recipe_count, stats.comments_received, stats.top_category_id), (2, 1, soups.pk))
+
+        recipe.delete()
+        stats.refresh_from_db()
+        self.assertEqual((stats.recipe_count, stats.comments_received), (1, 0))
+
+    def test_profile_pages_by_cursor(self):
+        author = User.objects.create_user('author', 'author@example.com', 'pw')
+        for i in range(12):
+            make_recipe(author, title=f'R{i}')
+        self.client.force_login(author)
+        first = self.client.get('/accounts/profile/')
+        page = first.context['user_recipes']
+        self.assertEqual(len(page), 10)
+        second = self.client.get(f'/accounts/profile/?cursor={page.next_cursor}')
+        self.assertEqual(len(second.context['user_recipes']), 2)
+
+
+class CleanupMediaTests(TestCase):
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root)
+        override = override_settings(MEDIA_ROOT=self.media_root)
+        override.enable()
+        self.addCleanup(override.disable)
+        self.author = User.objects.create_user('author', 'author@example.com', 'pw')
+
+    def _file(self, name, age_hours):
+        path = os.path.join(self.media_root, name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'wb') as f:
+            f.write(b'x')
+        stamp = time.time() - age_hours * 3600
+        os.utime(path, (stamp, stamp))
+        return path
+
+    def test_deletes_only_old_unreferenced_files(self):
+        used = self._file('recipes/used.jpg', 48)
+        orphan = self._file('recipes/orphan.jpg', 48)
+        fresh = self._file('recipes/fresh.jpg', 1)
+        make_recipe(self.author, image='recipes/used.jpg')
+
+        call_command('cleanup_media', '--dry-run', stdout=StringIO())
+        self.assertTrue(os.path.exists(orphan))
+
+        call_command('cleanup_media', '--batch-size', '1', stdout=StringIO())
+        self.assertEqual([os.path.exists(path) for path in (used, orphan, fresh)], [True, False, True])
+
+
+class EstimatedCountTests(TestCase):
+    def setUp(self):
+        for name in ('Супы', 'Салаты', 'Выпечка', 'Десерты', 'Напитки'):
+            Category.objects.create(name=name)
+
+    def _analyze(self):
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+
+    def test_sqlite_estimate_comes_from_statistics(self):
+        self.assertIsNone(estimate_row_count(Category, 'default'))
+        self._analyze()
+        self.assertEqual(estimate_row_count(Category, 'default'), 5)
+
+    def test_stale_estimate_is_clamped_to_real_rows(self):
+        self._analyze()
+        Category.objects.filter(name__in=['Десерты', 'Напитки']).delete()
+        paginator = EstimatedCountPaginator(Category.objects.order_by('pk'), 2)
+        paginator.estimate_threshold = 0
+        self.assertEqual(paginator.num_pages, 3)
+
+        self.assertEqual(len(paginator.page(2).object_list), 1)
+        self.assertEqual((paginator.count, paginator.num_pages), (3, 2))
+        with self.assertRaises(EmptyPage):
+            paginator.page(3)
+
+
+# Основная база выступает и «репликой»: heartbeat в ней тот же, что скопировала бы sync_replicas
+@override_settings(DATABASE_REPLICAS=['default'], REPLICA_CHECK_INTERVAL=0, REPLICA_MAX_LAG_SECONDS=30)
+class ReplicaLagTests(TestCase):
+    def _age_heartbeat(self, seconds):
+        write_heartbeat()
+        with connection.cursor() as cursor:
+            cursor.execute(f'UPDATE {HEARTBEAT_TABLE} SET ts = %s', [time.time() - seconds])
+
+    def test_fresh_heartbeat_is_healthy(self):
+        write_heartbeat()
+        self.assertLess(replica_lag('default'), 1)
+        self.assertEqual(ReplicaMonitor().healthy_replicas(), ['default'])
+
+    @override_settings(REPLICA_STICKY_SECONDS=10, REPLICA_CHECK_INTERVAL=5)
+    def test_sticky_window_covers_allowed_lag(self):
+        self.assertEqual(sticky_seconds(), 35)
+        with self.settings(REPLICA_STICKY_SECONDS=60):
+            self.assertEqual(sticky_seconds(), 60)
+
+    def test_write_sets_sticky_cookie_for_lag_window(self):
+        user = User.objects.create_user('cook', 'cook@example.com', 'pw')
+        User.objects.create_user('chef', 'chef@example.com', 'pw')
+        self.client.force_login(user)
+        response = self.client.post('/accounts/follow/chef/')
+        self.assertEqual(response.cookies['db_primary']['max-age'], sticky_seconds())
+
+    def test_stalled_heartbeat_writer_marks_replica_unhealthy(self):
+        # Писатель heartbeat встал: отметки на основной базе и реплике совпадают, но обе старые
+        self._age_heartbeat(120)
+        self.assertGreaterEqual(replica_lag('default'), 120)
+        self.assertEqual(ReplicaMonitor().healthy_replicas(), [])
+
+
+def flaky(failures, message='database is locked'):
+    calls = []
+
+    def write():
+        calls.append(1)
+        if len(calls) <= failures:
+            raise OperationalError(message)
+        return len(calls)
+    return write, calls
+
+
+@mock.patch('recipe_project.db_retry.time.sleep')
+class RetryOnLockedTests(SimpleTestCase):
+    def test_retries_until_lock_is_released(self, sleep):
+        write, calls = flaky(2)
+        self.assertEqual(retry_on_locked(attempts=5)(write)(), 3)
+        self.assertEqual(sleep.call_count, 2)
+
+    def test_backoff_is_capped(self, sleep):
+        write, _ = flaky(4)
+        retry_on_locked(attempts=5, base_delay=0.5, max_delay=1.0)(write)()
+        self.assertTrue(all(0 <= call.args[0] <= 1.0 for call in sleep.call_args_list))
+
+    def test_gives_up_after_last_attempt(self, sleep):
+        write, calls = flaky(10)
+        with self.assertRaises(OperationalError):
+            retry_on_locked(attempts=3)(write)()
+        self.assertEqual(len(calls), 3)
+
+    def test_other_errors_are_not_retried(self, sleep):
+        write, calls = flaky(1, 'no such table: recipes_recipe')
+        with self.assertRaises(OperationalError):
+            retry_on_locked()(write)()
+        self.assertEqual(len(calls), 1)
+
+
+class SQLiteSettingsTests(TestCase):
+    def _pragma(self, name):
+        with connection.cursor() as cursor:
+            cursor.execute(f'PRAGMA {name}')
+            return cursor.fetchone()[0]
+
+    def test_connection_applies_pragmas(self):
+        self.assertEqual(self._pragma('busy_timeout'), 5000)
+        self.assertEqual(self._pragma('synchronous'), 1)
+        self.assertEqual(self._pragma('temp_store'), 2)
+
+    @mock.patch('recipe_project.db_retry.time.sleep')
+    def test_no_retry_inside_outer_transaction(self, sleep):
+        # TestCase держит открытую транзакцию: повторять её часть бессмысленно
+        write, calls = flaky(1)
+        with self.assertRaises(OperationalError):
+            retry_on_locked()(write)()
+        self.assertEqual(len(calls), 1)
+
+
+@override_settings(CACHES=TEST_CACHES)
+class FeedTests(CacheIsolationMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.author = User.objects.create_user('author', 'author@example.com', 'pw')
+        with self.captureOnCommitCallbacks(execute=True):
+            make_recipe(self.author, title='Борщ')
+
+    def test_conditional_request_needs_no_queries(self):
+        for url in ('/feeds/recipes.rss', '/feeds/author/author.json'):
+            etag = self.client.get(url)['ETag']
+            with self.assertNumQueries(0):
+                response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+            self.assertEqual(response.status_code, 304)
+
+    def test_new_recipe_changes_etag_and_body(self):
+        url = '/feeds/author/author.rss'
+        etag = self.client.get(url)['ETag']
+        with self.captureOnCommitCallbacks(execute=True):
+            make_recipe(self.author, title='Щи')
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'Щи')
+
+    def test_query_string_does_not_reach_cached_body(self):
+        first = self.client.get('/feeds/recipes.json?x=POISON')
+        self.assertEqual(first.json()['feed_url'], 'http://testserver/feeds/recipes.json')
+        second = self.client.get('/feeds/recipes.json?y=other')
+        self.assertEqual(first.content, second.content)
+        self.assertNotIn(b'POISON', second.content)
+
+    @override_settings(ALLOWED_HOSTS=['testserver', 'mirror.example.com'])
+    def test_cached_body_is_per_host(self):
+        self.client.get('/feeds/author/author.json')
+        response = self.client.get('/feeds/author/author.json', HTTP_HOST='mirror.example.com')
+        self.assertEqual(response.json()['feed_url'], 'http://mirror.example.com/feeds/author/author.json')
+
+    def test_unknown_author_until_registered(self):
+        self.assertEqual(self.client.get('/feeds/author/newcomer.rss').status_code, 404)
+        with self.captureOnCommitCallbacks(execute=True):
+            User.objects.create_user('newcomer', 'newcomer@example.com', 'pw')
+        self.assertEqual(self.client.get('/feeds/author/newcomer.rss').status_code, 200)
+
+
+class SitemapTests(TestCase):
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.root)
+        override = override_settings(SITEMAP_ROOT=self.root, SITE_URL='https://example.com')
+        override.enable()
+        self.addCleanup(override.disable)
+        self.author = User.objects.create_user('author', 'author@example.com', 'pw')
+        self.recipe = make_recipe(self.author, category=Category.objects.create(name='Супы'))
+
+    def test_only_changed_segments_are_rewritten(self):
+        # Сегмент рецептов и список категорий
+        self.assertEqual(generate_sitemaps(), (2, 0, 0))
+        self.assertEqual(generate_sitemaps(), (0, 2, 0))
+        make_recipe(self.author, title='Без категории')
+        self.assertEqual(generate_sitemaps(), (1, 1, 0))
+        self.assertEqual(generate_sitemaps(site_url='https://other.example.com'), (2, 0, 0))
+
+    def test_files_are_served_with_last_modified(self):
+        generate_sitemaps()
+        response = self.client.get('/sitemap.xml')
+        self.assertContains(response, 'https://example.com/sitemap-recipes-0.xml')
+        segment = b''.join(self.client.get('/sitemap-recipes-0.xml').streaming_content).decode()
+        self.assertIn(f'https://example.com/{self.recipe.pk}/', segment)
+        self.assertEqual(
+            self.client.get('/sitemap.xml', HTTP_IF_MODIFIED_SINCE=response['Last-Modified']).status_code, 304,
+        )
+        self.assertEqual(self.client.get('/sitemap-missing.xml').status_code, 404)
+
+    def test_updated_at_backfill_copies_created_at(self):
+        created = timezone.now() - timedelta(days=30)
+        Recipe.objects.update(created_at=created)
+        migration = import_module('recipes.migrations.0007_recipe_updated_at')
+        migration.copy_created_at(apps, None)
+        self.recipe.refresh_from_db()
+        self.assertEqual(self.recipe.updated_at, created)
+
+
+@override_settings(CACHES=TEST_CACHES)
+class FacetTests(CacheIsolationMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.alice = User.objects.create_user('alice', 'alice@example.com', 'pw')
+        self.bob = User.objects.create_user('bob', 'bob@example.com', 'pw')
+        self.soups = Category.objects.create(name='Супы')
+        self.salads = Category.objects.create(name='Салаты')
+        make_recipe(self.alice, category=self.soups, image='recipes/a.jpg')
+        make_recipe(self.alice, category=self.salads)
+        old = make_recipe(self.bob, category=self.soups)
+        Recipe.objects.filter(pk=old.pk).update(created_at=timezone.now() - timedelta(days=60))
+
+    def counts(self, query=''):
+        return facets.compute_counts(facets.FacetFilters(QueryDict(query)), Recipe.objects.all())
+
+    def test_facet_ignores_its_own_filter(self):
+        counts = self.counts(f'category={self.soups.pk}')
+        # Другие категории по-прежнему посчитаны, а авторы — только внутри «Супов»
+        self.assertEqual(counts['category'], {self.soups.pk: 2, self.salads.pk: 1})
+        self.assertEqual(sorted(counts['author']), [(self.alice.pk, 'alice', 1), (self.bob.pk, 'bob', 1)])
+        self.assertEqual(counts['has_image'], {'1': 1, '0': 1})
+
+    def test_periods_are_nested(self):
+        self.assertEqual(self.counts()['period'], {'week': 2, 'month': 2, 'year': 3})
+        self.assertEqual(self.counts('period=week')['category'], {self.soups.pk: 1, self.salads.pk: 1})
+
+    def test_bad_params_are_ignored(self):
+        filters = facets.FacetFilters(QueryDict('category=abc&has_image=2&period=day&sort=new'))
+        self.assertEqual(filters.params(), {})
+        self.assertEqual(filters.querystring(author=5), 'author=5')
+
+    def test_counts_cache_is_invalidated_by_new_recipe(self):
+        filters = facets.FacetFilters(QueryDict(''))
+        self.assertEqual(facets.get_counts(filters, Recipe.objects.all())['category'][self.salads.pk], 1)
+        with self.captureOnCommitCallbacks(execute=True):
+            make_recipe(self.bob, category=self.salads)
+        filters = facets.FacetFilters(QueryDict(''))
+        self.assertEqual(facets.get_counts(filters, Recipe.objects.all())['category'][self.salads.pk], 2)
+
+
+@override_settings(METRICS_DIR=None, METRICS_TOKEN='scrape-secret', METRICS_ALLOWED_IPS=['10.0.0.5'])
+class MetricsAccessTests(TestCase):
+    def test_local_proxy_address_is_not_trusted(self):
+        self.assertEqual(self.client.get('/metrics', REMOTE_ADDR='127.0.0.1').status_code, 403)
+
+    def test_bearer_token(self):
+        self.assertEqual(self.client.get('/metrics', HTTP_AUTHORIZATION='Bearer wrong').status_code, 403)
+        response = self.client.get('/metrics', HTTP_AUTHORIZATION='Bearer scrape-secret')
+        self.assertContains(response, 'http_requests_total')
+
+    def test_allowed_ip_and_staff(self):
+        self.assertEqual(self.client.get('/metrics', REMOTE_ADDR='10.0.0.5').status_code, 200)
+        self.client.force_login(User.objects.create_user('admin', 'admin@example.com', 'pw', is_staff=True))
+        self.assertEqual(self.client.get('/metrics').status_code, 200)
+
+    @override_settings(METRICS_TOKEN='')
+    def test_empty_token_never_matches(self):
+        self.assertEqual(self.client.get('/metrics', HTTP_AUTHORIZATION='Bearer ').status_code, 403)
+
+
+class CommentDigestTests(TestCase):
+    def setUp(self):
+        # Первый запуск ставит отметку на текущий последний комментарий
+        call_command('send_comment_digests', stdout=StringIO())
+        self.authors = [User.objects.create_user(name, f'{name}@example.com', 'pw') for name in ('alice', 'bob')]
+        reader = User.objects.create_user('reader', 'reader@example.com', 'pw')
+        for author in self.authors:
+            recipe = make_recipe(author)
+            Comment.objects.create(recipe=recipe, user=reader, text='Вкусно')
+            Comment.objects.create(recipe=recipe, user=author, text='Спасибо')
+
+    def test_own_comments_are_skipped(self):
+        call_command('send_comment_digests', stdout=StringIO())
+        self.assertEqual(sorted(message.to[0] for message in mail.outbox), ['alice@example.com', 'bob@example.com'])
+        self.assertTrue(all('Спасибо' not in message.body for message in mail.outbox))
+
+    def test_resume_after_crash_sends_each_author_once(self):
+        with mock.patch.object(DigestCommand, 'throttle', side_effect=RuntimeError('сбой')):
+            with self.assertRaises(RuntimeError):
+                call_command('send_comment_digests', '--batch-size', '1', stdout=StringIO())
+        self.assertEqual([message.to for message in mail.outbox], [['alice@example.com']])
+        self.assertEqual(DigestCheckpoint.objects.get().last_comment_id, 0)
+
+        call_command('send_comment_digests', '--batch-size', '1', stdout=StringIO())
+        self.assertEqual([message.to for message in mail.outbox], [['alice@example.com'], ['bob@example.com']])
+        self.assertEqual(DigestCheckpoint.objects.get().last_comment_id, Comment.objects.latest('pk').pk)
+
+        call_command('send_comment_digests', stdout=StringIO())
+        self.assertEqual(len(mail.outbox), 2)
+
+
+# Автор с двумя подписчиками уже считается популярным
+@mock.patch.object(timeline, 'POPULAR_AUTHOR_FOLLOWERS', 2)
+class TimelineTests(TestCase):
+    def setUp(self):
+        self.reader, self.other = (User.objects.create_user(name, f'{name}@example.com', 'pw')
+                                   for name in ('reader', 'other'))
+        self.regular = User.objects.create_user('regular', 'regular@example.com', 'pw')
+        self.star = User.objects.create_user('star', 'star@example.com', 'pw')
+        with self.captureOnCommitCallbacks(execute=True):
+            Follow.objects.create(follower=self.reader, author=self.regular)
+            for follower in (self.reader, self.other):
+                Follow.objects.create(follower=follower, author=self.star)
+
+    def publish(self, author, title):
+        with self.captureOnCommitCallbacks(execute=True):
+            return make_recipe(author, title=title)
+
+    def test_regular_author_fans_out_on_write(self):
+        recipe = self.publish(self.regular, 'Щи')
+        self.assertTrue(TimelineEntry.objects.filter(user=self.reader, recipe=recipe).exists())
+
+    def test_popular_author_is_pulled_on_read(self):
+        recipe = self.publish(self.star, 'Плов')
+        self.assertFalse(TimelineEntry.objects.filter(recipe=recipe).exists())
+        self.assertIn(recipe, list(timeline.timeline_page(self.other, None, 10)))
+
+    def test_merged_pages_follow_date_order(self):
+        recipes = [self.publish(author, f'R{i}') for i, author in enumerate([self.regular, self.star] * 3)]
+        seen, cursor = [], None
+        while True:
+            page = timeline.timeline_page(self.reader, cursor, 4)
+            seen.extend(recipe.pk for recipe in page)
+            if not page.next_cursor:
+                break
+            cursor = page.next_cursor
+        self.assertEqual(seen, [recipe.pk for recipe in reversed(recipes)])
+
+    def test_unfollow_removes_entries(self):
+        self.publish(self.regular, 'Щи')
+        Follow.objects.filter(follower=self.reader, author=self.regular).delete()
+        self.assertEqual(list(timeline.timeline_page(self.reader, None, 10)), [])
+
+
+    def test_demoted_author_is_backfilled(self):
+        recipe = self.publish(self.star, 'Плов')
+        with self.captureOnCommitCallbacks(execute=True):
+            Follow.objects.filter(follower=self.other, author=self.star).delete()
+        self.assertTrue(TimelineEntry.objects.filter(user=self.reader, recipe=recipe).exists())
+        self.assertIn(recipe, list(timeline.timeline_page(self.reader, None, 10)))
+
+class RatingTests(TestCase):
+    def setUp(self):
+        self.author = User.objects.create_user('author', 'author@example.com', 'pw')
+        self.recipe = make_recipe(self.author)
+        self.voters = [User.objects.create_user(f'voter{i}', f'voter{i}@example.com', 'pw') for i in range(2)]
+
+    def aggregates(self):
+        self.recipe.refresh_from_db()
+        return self.recipe.rating_count, self.recipe.rating_sum, round(self.recipe.rating_score, 4)
+
+    def test_add_change_and_remove_apply_deltas(self):
+        ratings.rate(self.recipe, self.voters[0], 5)
+        ratings.rate(self.recipe, self.voters[1], 4)
+        self.assertEqual(self.aggregates(), (2, 9, round(ratings.bayesian_score(2, 9), 4)))
+
+        ratings.rate(self.recipe, self.voters[0], 2)
+        self.assertEqual(self.aggregates(), (2, 6, round(ratings.bayesian_score(2, 6), 4)))
+        # Та же оценка ещё раз ничего не меняет
+        ratings.rate(self.recipe, self.voters[0], 2)
+        self.assertEqual(self.aggregates()[:2], (2, 6))
+
+        ratings.unrate(self.recipe, self.voters[1])
+        self.assertEqual(self.aggregates(), (1, 2, round(ratings.bayesian_score(1, 2), 4)))
+        ratings.unrate(self.recipe, self.voters[0])
+        self.assertEqual(self.aggregates(), (0, 0, 0.0))
+
+    def test_view_ignores_own_recipe_and_zero_removes(self):
+        self.client.force_login(self.author)
+        self.client.post(f'/{self.recipe.pk}/rate/', {'value': 5})
+        self.assertEqual(self.aggregates()[0], 0)
+
+        self.client.force_login(self.voters[0])
+        self.client.post(f'/{self.recipe.pk}/rate/', {'value': 4})
+        self.assertEqual(self.aggregates()[:2], (1, 4))
+        self.client.post(f'/{self.recipe.pk}/rate/', {'value': 0})
+        self.assertEqual(self.aggregates()[:2], (0, 0))
+
+    def test_saving_stale_recipe_keeps_aggregates(self):
+        stale = Recipe.objects.get(pk=self.recipe.pk)
+        ratings.rate(self.recipe, self.voters[0], 5)
+        stale.title = 'Борщ'
+        stale.save()
+        self.assertEqual(self.aggregates()[:2], (1, 5))
+        self.assertEqual(self.recipe.title, 'Борщ')
+
+    def test_admin_form_does_not_expose_aggregates(self):
+        form = modelform_factory(Recipe, fields='__all__')
+        self.assertFalse(set(Recipe.RATING_FIELDS) & set(form.base_fields))
+
+
+@override_settings(CACHES=TEST_CACHES)
+class CollectionTests(CacheIsolationMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.user = User.objects.create_user('cook', 'cook@example.com', 'pw')
+        self.recipe = make_recipe(self.user)
+        self.dinner = Collection.objects.create(owner=self.user, name='Ужин')
+        self.client.force_login(self.user)
+
+    def test_card_button_saves_to_default_and_removes_everywhere(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertTrue(toggle_saved(self.user, self.recipe.pk))
+            toggle_saved(self.user, self.recipe.pk, self.dinner)
+        self.assertEqual(saved_recipe_ids(self.user), {self.recipe.pk})
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertFalse(toggle_saved(self.user, self.recipe.pk))
+        self.assertFalse(CollectionItem.objects.exists())
+        self.assertEqual(saved_recipe_ids(self.user), set())
+
+    def test_recipe_saved_only_in_custom_collection_is_unsaved_by_card_button(self):
+        toggle_saved(self.user, self.recipe.pk, self.dinner)
+        self.client.post(f'/{self.recipe.pk}/save/')
+        self.assertFalse(CollectionItem.objects.exists())
+
+    def test_malformed_collection_is_not_found(self):
+        for value in ('abc', '1.5', str(2 ** 70)):
+            response = self.client.post(f'/{self.recipe.pk}/save/', {'collection': value})
+            self.assertEqual(response.status_code, 404)
+        self.assertFalse(CollectionItem.objects.exists())
+
+    def test_detail_post_no_longer_deletes(self):
+        self.assertEqual(self.client.post(f'/collections/{self.dinner.pk}/').status_code, 405)
+        self.assertTrue(Collection.objects.filter(pk=self.dinner.pk).exists())
+
+    def test_delete_view_keeps_default_collection(self):
+        toggle_saved(self.user, self.recipe.pk)
+        favourites = Collection.objects.get(name=DEFAULT_COLLECTION_NAME)
+        self.assertNotContains(self.client.get(f'/collections/{favourites.pk}/'), 'Удалить подборку')
+        self.client.post(f'/collections/{favourites.pk}/delete/')
+        self.assertTrue(Collection.objects.filter(pk=favourites.pk).exists())
+
+        self.assertRedirects(self.client.post(f'/collections/{self.dinner.pk}/delete/'), '/collections/')
+        self.assertFalse(Collection.objects.filter(pk=self.dinner.pk).exists())
+
+
+BORSCH = 'Свёклу натереть, капусту нашинковать, варить на говяжьем бульоне час, подать со сметаной и зеленью'
+
+
+class DuplicateDetectionTests(TestCase):
+    def setUp(self):
+        self.author = User.objects.create_user('author', 'author@example.com', 'pw')
+        self.original = make_recipe(self.author, title='Борщ', description=BORSCH)
+        self.copy = make_recipe(self.author, title='Борщ', description=BORSCH + ' по вкусу')
+        self.other = make_recipe(self.author, title='Шарлотка', description='Яблоки, мука, сахар и яйца, выпекать 40 минут')
+
+    def test_similar_recipe_is_found_through_buckets(self):
+        signature = dedup.unpack_signature(Recipe.objects.get(pk=self.copy.pk).minhash)
+        matches = dedup.find_duplicates(signature, exclude_pk=self.copy.pk)
+        self.assertEqual([recipe.pk for recipe, _ in matches], [self.original.pk])
+
+    def test_clusters_group_only_duplicates(self):
+        self.assertEqual(dedup.find_clusters(), [[self.original.pk, self.copy.pk]])
+
+    def test_oversized_bucket_is_capped(self):
+        with mock.patch.object(dedup, 'MAX_BUCKET_SIZE', 1):
+            self.assertEqual(list(dedup.candidate_buckets()), [])
+            self.assertEqual(dedup.find_clusters(), [])
+
+    def test_lookup_reads_at_most_cap_per_bucket(self):
+        # Третий рецепт с той же подписью: все полосы совпадают, в каждой корзине по три рецепта
+        clone = make_recipe(self.author, title='Борщ', description=BORSCH)
+        signature = dedup.unpack_signature(Recipe.objects.get(pk=clone.pk).minhash)
+        with mock.patch.object(dedup, 'MAX_BUCKET_SIZE', 1):
+            matches = dedup.find_duplicates(signature, exclude_pk=clone.pk)
+        self.assertEqual([recipe.pk for recipe, _ in matches], [self.original.pk])
+        self.assertEqual(len(dedup.find_duplicates(signature, exclude_pk=clone.pk)), 2)
+
+    def test_migration_backfills_missing_signatures(self):
+        Recipe.objects.update(minhash=None)
+        RecipeLSHBucket.objects.all().delete()
+        migration = import_module('recipes.migrations.0014_backfill_minhash')
+        migration.backfill_signatures(apps, None)
+        self.assertFalse(Recipe.objects.filter(minhash__isnull=True).exists())
+        self.assertEqual(dedup.find_clusters(), [[self.original.pk, self.copy.pk]])
+
+
+class RateLimitWindowTests(SimpleTestCase):
+    def test_parse_rate(self):
+        self.assertEqual(ratelimit.parse_rate('5/m'), (5, 60))
+        self.assertEqual(ratelimit.parse_rate('10/15m'), (10, 900))
+
+    def test_sliding_window_estimate(self):
+        # Середина окна: прошлое окно весит половину, 10 * 0.5 + 3 = 8 > 5
+        self.assertEqual(ratelimit._retry_after(3, 10, 30, 5, 60), 18)
+        self.assertIsNone(ratelimit._retry_after(3, 4, 30, 5, 60))
+        # Текущее окно само превысило лимит — ждать до его конца
+        self.assertEqual(ratelimit._retry_after(6, 0, 30, 5, 60), 30)
+        self.assertEqual(ratelimit._retry_after(6, 10, 59.5, 5, 60), 1)
+
+    def test_client_ip_behind_trusted_proxy(self):
+        factory = RequestFactory()
+        request = factory.get('/', REMOTE_ADDR='127.0.0.1', HTTP_X_FORWARDED_FOR='6.6.6.6, 203.0.113.7')
+        self.assertEqual(ratelimit.client_ip(request), '127.0.0.1')
+        with self.settings(RATELIMIT_IP_HEADER='HTTP_X_FORWARDED_FOR', RATELIMIT_TRUSTED_PROXIES=['127.0.0.1']):
+            self.assertEqual(ratelimit.client_ip(request), '203.0.113.7')
+            # Напрямую, минуя прокси, заголовку не верим
+            direct = factory.get('/', REMOTE_ADDR='198.51.100.1', HTTP_X_FORWARDED_FOR='203.0.113.7')
+            self.assertEqual(ratelimit.client_ip(direct), '198.51.100.1')
+
+
+@override_settings(CACHES=TEST_CACHES)
+class RateLimitTests(CacheIsolationMixin, TestCase):
+    @mock.patch('recipe_project.ratelimit.time.time')
+    def test_check_counts_across_windows(self, now):
+        now.return_value = 60 * 1000 + 59
+        self.assertEqual([ratelimit.check('test', 'ip1', 2, 60) for _ in range(3)], [None, None, 1])
+        # Новое окно: прошлые 3 запроса почти полностью «выветрились»
+        now.return_value = 60 * 1001 + 50
+        self.assertIsNone(ratelimit.check('test', 'ip1', 2, 60))
+        self.assertIsNone(ratelimit.check('test', 'ip2', 2, 60))
+
+    def test_counter_without_native_incr(self):
+        root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, root)
+        file_cache = {'default': {'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache', 'LOCATION': root}}
+        with self.settings(CACHES=file_cache):
+            self.assertEqual([ratelimit._incr('rl:test', 3600) for _ in range(3)], [1, 2, 3])
+            self.assertEqual(len(ratelimit.cache_backend_check(None)), 1)
+        self.assertEqual(ratelimit.cache_backend_check(None), [])
+
+    def test_view_rejects_over_limit(self):
+        for _ in range(5):
+            self.client.post('/accounts/register/', {'username': ''})
+        response = self.client.post('/accounts/register/', {'username': ''})
+        self.assertEqual(response.status_code, 429)
+        self.assertGreater(int(response['Retry-After']), 0)
+
+
+class IngredientParsingTests(SimpleTestCase):
+    def test_amounts_are_converted_to_base_units(self):
+        self.assertEqual(parse_line('Мука — 1 1/2 кг'), ('мука', 'г', 1500.0))
+        self.assertEqual(parse_line('2 стакана молока'), ('молока', 'мл', 500.0))
+        self.assertEqual(parse_line('½ ч. л. соли'), ('соли', 'мл', 2.5))
+        self.assertEqual(parse_line('яйца 2-3 шт'), ('яйца', 'шт', 3.0))
+        self.assertEqual(parse_line('чеснок 2 зубчика'), ('чеснок', 'зубчика', 2.0))
+        self.assertEqual(parse_line('сливки 33% 200 мл'), ('сливки 33%', 'мл', 200.0))
+
+    def test_vague_and_broken_quantities_stay_text(self):
+        self.assertEqual(parse_line('перец по вкусу'), ('перец', None, None))
+        self.assertEqual(parse_line('сахар 1/0 г'), ('сахар 1/0 г', None, None))
+        self.assertIsNone(parse_line('  — '))
+
+
+@override_settings(CACHES=TEST_CACHES)
+class ShoppingListTests(CacheIsolationMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.user = User.objects.create_user('cook', 'cook@example.com', 'pw')
+        self.pancakes = make_recipe(self.user, servings=2, ingredients='мука 200 г\nмолоко 500 мл\nсоль по вкусу')
+        self.pie = make_recipe(self.user, title='Пирог', servings=4,
+                               ingredients='Мука 0,4 кг\nсахар 1/0 г\nсоль щепотка')
+
+    def items(self, selection):
+        return dict(build_shopping_list(selection).items)
+
+    def test_lines_merge_across_recipes_with_portions(self):
+        # Блины на 4 порции (x2) и пирог на 4 (x1): 400 г + 400 г муки
+        self.assertEqual(self.items({self.pancakes.pk: 4, self.pie.pk: 4}), {
+            'мука': '800 г',
+            'молоко': '1 л',
+            'соль': 'по вкусу',
+            'сахар 1/0 г': 'по вкусу',
+        })
+
+    def test_edited_recipe_is_parsed_again(self):
+        self.items({self.pancakes.pk: 2})
+        self.pancakes.ingredients = 'мука 300 г'
+        self.pancakes.save()
+        self.assertEqual(self.items({self.pancakes.pk: 2}), {'мука': '300 г'})
+
+    def test_view_keeps_selection_in_session(self):
+        self.client.force_login(self.user)
+        self.client.post('/shopping-list/', {'recipe': self.pie.pk, 'portions': 8})
+        self.assertContains(self.client.get('/shopping-list/'), '800 г')
+        self.client.post('/shopping-list/', {'clear': '1'})
+        self.assertNotContains(self.client.get('/shopping-list/'), '800 г')
@@ -0,0 +1,131 @@
+from django.conf import settings
+
+from accounts.models import Follow
+
+from .models import AuthorStats, Recipe, TimelineEntry
+from .pagination import KeysetPage, decode_cursor, encode_cursor, keyset_filter
+
+FANOUT_BATCH_SIZE = getattr(settings, 'TIMELINE_FANOUT_BATCH_SIZE', 500)
+POPULAR_AUTHOR_FOLLOWERS = getattr(settings, 'TIMELINE_POPULAR_AUTHOR_FOLLOWERS', 10000)
+BACKFILL_SIZE = 50
+
+ORDERING = ('-created_at', '-pk')
+ENTRY_ORDERING = ('-created_at', '-recipe_id')
+
+
+def is_popular(author_id):
+    return AuthorStats.objects.filter(author_id=author_id, follower_count__gte=POPULAR_AUTHOR_FOLLOWERS).exists()
+
+
+def just_demoted(author_id):
+    """Вызывается после отписки: счётчик только что опустился ниже порога популярности."""
+    return AuthorStats.objects.filter(author_id=author_id, follower_count=POPULAR_AUTHOR_FOLLOWERS - 1).exists()
+
+
+def _follower_batches(author_id):
+    last_follower_id = 0
+    while True:
+        follower_ids = list(
+            Follow.objects.filter(author_id=author_id, follower_id__gt=last_follower_id)
+            .order_by('follower_id')
+            .values_list('follower_id', flat=True)[:FANOUT_BATCH_SIZE]
+        )
+        if not follower_ids:
+            return
+        yield follower_ids
+        last_follower_id = follower_ids[-1]
+
+
+def fan_out(recipe):
+    """
+    Раскладывает новый рецепт по лентам подписчиков автора: подписчики
+    перебираются по follower_id пачками, каждая пачка — один bulk INSERT.
+    Рецепты популярных авторов не раскладываются, а подмешиваются при чтении.
+    """
+    if is_popular(recipe.author_id):
+        return 0
+    total = 0
+    for follower_ids in _follower_batches(recipe.author_id):
+        TimelineEntry.objects.bulk_create(
+            [TimelineEntry(user_id=follower_id, recipe_id=recipe.pk, created_at=recipe.created_at)
+             for follower_id in follower_ids],
+            ignore_conflicts=True,
+        )
+        total += len(follower_ids)
+    return total
+
+
+def backfill(follower_id, author_id):
+    """После подписки кладёт в ленту последние BACKFILL_SIZE рецептов автора."""
+    if is_popular(author_id):
+        return
+    recipes = (
+        Recipe.objects.filter(author_id=author_id)
+        .order_by(*ORDERING)
+        .values_list('pk', 'created_at')[:BACKFILL_SIZE]
+    )
+    TimelineEntry.objects.bulk_create(
+        [TimelineEntry(user_id=follower_id, recipe_id=pk, created_at=created_at) for pk, created_at in recipes],
+        ignore_conflicts=True,
+    )
+
+
+def backfill_followers(author_id):
+    """
+    Автор перестал быть популярным: его рецепты больше не подмешиваются при
+    чтении, поэтому последние BACKFILL_SIZE раскладываются по лентам всех подписчиков.
+    """
+    if is_popular(author_id):
+        return
+    recipes = list(
+        Recipe.objects.filter(author_id=author_id)
+        .order_by(*ORDERING)
+        .values_list('pk', 'created_at')[:BACKFILL_SIZE]
+    )
+    if not recipes:
+        return
+    for follower_ids in _follower_batches(author_id):
+        TimelineEntry.objects.bulk_create(
+            [TimelineEntry(user_id=follower_id, recipe_id=pk, created_at=created_at)
+             for follower_id in follower_ids for pk, created_at in recipes],
+            ignore_conflicts=True,
+        )
+
+
+def remove_author(follower_id, author_id):
+    TimelineEntry.objects.filter(user_id=follower_id, recipe__author_id=author_id).delete()
+
+
+def timeline_page(user, cursor, per_page):
+    """
+    Страница ленты подписок по курсору (created_at, pk). Берётся per_page + 1
+    записей из материализованной ленты и столько же свежих рецептов популярных
+    авторов (fan-out on read), списки сливаются, а сами рецепты грузятся одним запросом.
+    """
+    values = decode_cursor(Recipe, ORDERING, cursor) if cursor else None
+
+    entries = TimelineEntry.objects.filter(user=user)
+    pulled = Recipe.objects.filter(
+        author__in=Follow.objects.filter(
+            follower=user, author__author_stats__follower_count__gte=POPULAR_AUTHOR_FOLLOWERS,
+        ).values('author_id'),
+    )
+    if values is not None:
+        entries = entries.filter(keyset_filter(ENTRY_ORDERING, values))
+        pulled = pulled.filter(keyset_filter(ORDERING, values))
+
+    recipe_ids = set(entries.order_by(*ENTRY_ORDERING).values_list('recipe_id', flat=True)[:per_page + 1])
+    recipe_ids.update(pulled.order_by(*ORDERING).values_list('pk', flat=True)[:per_page + 1])
+
+    recipes = []
+    if recipe_ids:
+        recipes = list(
+            Recipe.objects.filter(pk__in=recipe_ids)
+            .select_related('author', 'category')
+            .order_by(*ORDERING)[:per_page + 1]
+        )
+    next_cursor = None
+    if len(recipes) > per_page:
+        recipes = recipes[:per_page]
+        next_cursor = encode_cursor([recipes[-1].created_at, recipes[-1].pk])
+    return KeysetPage(recipes, next_cursor, is_first=values is None)
@@ -1,13 +1,37 @@
-from django.urls import path
+from django.urls import path, re_path
 from .views import home, RecipeListView, RecipeDetailView, RecipeCreateView, RecipeUpdateView, RecipeDeleteView, \
-    CommentDeleteView
+    CommentDeleteView, timeline, rate_recipe, toggle_save, collection_list, collection_detail, collection_delete, \
+    shopping_list, add_to_shopping_list
+from .feeds import rss_feed, atom_feed, json_feed_view
+from .sitemaps import serve_sitemap
 
 urlpatterns = [
     path('', home, name='home'),
     path('recipes/', RecipeListView.as_view(), name='recipe_list'),
+    path('following/', timeline, name='timeline'),
     path('<int:pk>/', RecipeDetailView.as_view(), name='recipe_detail'),
     path('add/', RecipeCreateView.as_view(), name='recipe_add'),
     path('<int:pk>/edit/', RecipeUpdateView.as_view(), name='recipe_edit'),
     path('<int:pk>/delete/', RecipeDeleteView.as_view(), name='recipe_delete'),
+    path('<int:pk>/rate/', rate_recipe, name='recipe_rate'),
+    path('<int:pk>/save/', toggle_save, name='recipe_save'),
+    path('<int:pk>/shopping/', add_to_shopping_list, name='recipe_add_to_shopping_list'),
+    path('shopping-list/', shopping_list, name='shopping_list'),
+    path('collections/', collection_list, name='collection_list'),
+    path('collections/<int:pk>/', collection_detail, name='collection_detail'),
+    path('collections/<int:pk>/delete/', collection_delete, name='collection_delete'),
     path('comment/<int:pk>/delete/', CommentDeleteView.as_view(), name='comment_delete'),
+
+    path('feeds/recipes.rss', rss_feed, name='recipes_feed_rss'),
+    path('feeds/recipes.atom', atom_feed, name='recipes_feed_atom'),
+    path('feeds/recipes.json', json_feed_view, name='recipes_feed_json'),
+    path('feeds/category/<int:category_id>.rss', rss_feed, name='category_feed_rss'),
+    path('feeds/category/<int:category_id>.atom', atom_feed, name='category_feed_atom'),
+    path('feeds/category/<int:category_id>.json', json_feed_view, name='category_feed_json'),
+    path('feeds/author/<str:username>.rss', rss_feed, name='author_feed_rss'),
+    path('feeds/author/<str:username>.atom', atom_feed, name='author_feed_atom'),
+    path('feeds/author/<str:username>.json', json_feed_view, name='author_feed_json'),
+
+    path('sitemap.xml', serve_sitemap, name='sitemap'),
+    re_path(r'^(?P<name>sitemap-[\w-]+\.xml)$', serve_sitemap, name='sitemap_file'),
 ]
@@ -1,14 +1,42 @@
 from django.contrib.auth.mixins import LoginRequiredMixin, UserPassesTestMixin
 from django.shortcuts import render, redirect, get_object_or_404
 from django.views.generic import ListView, DetailView, CreateView, UpdateView, DeleteView
-from .models import Recipe, Category, Comment
-from .forms import RecipeForm, CommentForm, StepFormSet  # Импортировать StepFormSet
+from accounts.models import Follow
+
+from .models import Recipe, Category, Collection, CollectionItem, Comment, Rating
+from .dedup import compute_signature, find_duplicates, recipe_text
+from .facets import FacetFilters, build_facets, build_sort_options
+from .page_cache import add_cache_tags
+from .timeline import timeline_page
+from .forms import RecipeForm, CommentForm, CollectionForm, RatingForm, ShoppingListForm, \
+    StepFormSet  # Импортировать StepFormSet
+from .pagination import keyset_paginate
+from .ratings import rate, unrate
+from .saved import delete_collection, is_default_collection, saved_recipe_ids, toggle_saved
+from .shopping import build_shopping_list, clear_selection, get_selection, set_portions
+from django.contrib import messages
 from django.contrib.auth.decorators import login_required
+from django.views.decorators.http import require_GET, require_POST
 from django.utils.decorators import method_decorator
+from django.utils.http import url_has_allowed_host_and_scheme
 from django.urls import reverse_lazy, reverse
 from django.http import Http404
 from django.db.models import Count
-from django.db import transaction  # Для атомарных операций
+from django.db import transaction, OperationalError  # Для атомарных операций
+from recipe_project.db_retry import retry_on_locked
+from recipe_project.ratelimit import ratelimit
+
+
+TIMELINE_PER_PAGE = 12
+COLLECTION_PER_PAGE = 12
+
+
+def _next_url(request, default):
+    next_url = request.POST.get('next', '')
+    if url_has_allowed_host_and_scheme(next_url, allowed_hosts={request.get_host()},
+                                       require_https=request.is_secure()):
+        return next_url
+    return default
 
 
 def home(request):
@@ -18,14 +46,137 @@ def home(request):
         recipe_count__gt=0
     ).order_by('-recipe_count')[:5]
 
-    latest_recipes = Recipe.objects.order_by('-created_at')[:6]
+    latest_recipes = Recipe.objects.select_related('author').order_by('-created_at')[:6]
 
+    # Теги ставятся до чтения данных (запросы выше ленивые); теги карточек — сразу после
+    add_cache_tags(request, 'home', 'categories')
+    add_cache_tags(request, *(f'card:{recipe.pk}' for recipe in latest_recipes))
     return render(request, 'home.html', {
         'categories': popular_categories,
         'latest_recipes': latest_recipes,
+        'saved_ids': saved_recipe_ids(request.user),
     })
 
 
+@login_required
+def timeline(request):
+    # Лента подписок: материализованные записи плюс рецепты популярных авторов, по курсору
+    recipes = timeline_page(request.user, request.GET.get('cursor'), TIMELINE_PER_PAGE)
+    return render(request, 'recipes/timeline.html', {
+        'recipes': recipes,
+        'saved_ids': saved_recipe_ids(request.user),
+    })
+
+
+@login_required
+@require_POST
+def toggle_save(request, pk):
+    recipe = get_object_or_404(Recipe.objects.only('pk'), pk=pk)
+    collection = None
+    if request.POST.get('collection'):
+        try:
+            collection_id = int(request.POST['collection'])
+        except ValueError:
+            raise Http404('Некорректная подборка')
+        collection = get_object_or_404(Collection, pk=collection_id, owner=request.user)
+    toggle_saved(request.user, recipe.pk, collection)
+    return redirect(_next_url(request, reverse('recipe_detail', args=[recipe.pk])))
+
+
+@login_required
+def collection_list(request):
+    if request.method == 'POST':
+        form = CollectionForm(request.POST, owner=request.user)
+        if form.is_valid():
+            form.save()
+            return redirect('collection_list')
+    else:
+        form = CollectionForm(owner=request.user)
+    collections = Collection.objects.filter(owner=request.user).annotate(size=Count('items')).order_by('name')
+    return render(request, 'recipes/collection_list.html', {'collections': collections, 'form': form})
+
+
+@login_required
+@require_GET
+def collection_detail(request, pk):
+    collection = get_object_or_404(Collection, pk=pk, owner=request.user)
+    # Листаем по курсору (added_at, pk) по индексу collection_item_added_idx
+    items = keyset_paginate(
+        CollectionItem.objects.filter(collection=collection).select_related('recipe__author'),
+        request.GET.get('cursor'),
+        COLLECTION_PER_PAGE,
+        ordering=('-added_at', '-pk'),
+    )
+    return render(request, 'recipes/collection_detail.html', {
+        'collection': collection,
+        'items': items,
+        'can_delete': not is_default_collection(collection),
+    })
+
+
+@login_required
+@require_POST
+def collection_delete(request, pk):
+    collection = get_object_or_404(Collection, pk=pk, owner=request.user)
+    if not delete_collection(collection):
+        messages.error(request, f'Подборку «{collection.name}» удалить нельзя.')
+        return redirect('collection_detail', pk=collection.pk)
+    messages.info(request, f'Подборка «{collection.name}» удалена.')
+    return redirect('collection_list')
+
+
+@login_required
+def shopping_list(request):
+    if request.method == 'POST':
+        if 'clear' in request.POST:
+            clear_selection(request.session)
+        else:
+            form = ShoppingListForm(request.POST)
+            if form.is_valid():
+                set_portions(request.session, form.cleaned_data['recipe'], form.cleaned_data['portions'])
+        return redirect('shopping_list')
+    return render(request, 'recipes/shopping_list.html', {
+        'shopping': build_shopping_list(get_selection(request.session)),
+    })
+
+
+@login_required
+@require_POST
+def add_to_shopping_list(request, pk):
+    recipe = get_object_or_404(Recipe.objects.only('pk', 'title', 'servings'), pk=pk)
+    if recipe.pk not in get_selection(request.session):
+        set_portions(request.session, recipe.pk, recipe.servings or 1)
+    messages.success(request, f'«{recipe.title}» в списке покупок.')
+    return redirect(_next_url(request, reverse('shopping_list')))
+
+
+@login_required
+@require_POST
+def rate_recipe(request, pk):
+    recipe = get_object_or_404(Recipe.objects.only('pk', 'author_id'), pk=pk)
+    form = RatingForm(request.POST)
+    # Свои рецепты не оцениваются
+    if form.is_valid() and recipe.author_id != request.user.pk:
+        if form.cleaned_data['value']:
+            rate(recipe, request.user, form.cleaned_data['value'])
+        else:
+            unrate(recipe, request.user)
+    return redirect('recipe_detail', pk=recipe.pk)
+
+
+@retry_on_locked()
+def save_comment(comment):
+    # Короткая пишущая транзакция: при конкуренции за блокировку SQLite повторяется
+    try:
+        with transaction.atomic():
+            comment.save()
+    except OperationalError:
+        # Откатившийся INSERT не должен превратить повтор в UPDATE
+        comment.pk = None
+        comment._state.adding = True
+        raise
+
+
 class RecipeListView(ListView):
     model = Recipe
     template_name = 'recipes/recipe_list.html'
@@ -33,20 +184,34 @@ class RecipeListView(ListView):
     paginate_by = 9
 
     def get_queryset(self):
-        qs = super().get_queryset()
-        category_id = self.request.GET.get('category')
-        if category_id:
-            qs = qs.filter(category_id=category_id)
-        search_query = self.request.GET.get('q')
-        if search_query:
-            qs = qs.filter(title__icontains=search_query)
-        return qs
+        self.filters = FacetFilters(self.request.GET)
+        return self.filters.apply(super().get_queryset()).select_related('author').order_by(*self.filters.ordering)
 
     def get_context_data(self, **kwargs):
+        filters = self.filters
+        # Теги для кэша страниц: область списка (категория), счётчики фасетов и карточки на странице.
+        # Ставятся до выборки страницы и фасетов, теги карточек — сразу после
+        scope = filters.category or 'all'
+        tags = ['categories', 'facets', f'list:{scope}']
+        if filters.q or filters.ingredient:
+            tags.append(f'search:{scope}')
+        if filters.sort == 'top':
+            tags.append('ratings')
+        add_cache_tags(self.request, *tags)
+
         context = super().get_context_data(**kwargs)
-        context['categories'] = Category.objects.all()
-        context['selected_category'] = self.request.GET.get('category')
-        context['search_query'] = self.request.GET.get('q', '')
+        add_cache_tags(self.request, *(f'card:{recipe.pk}' for recipe in context['object_list']))
+        context['facets'] = build_facets(filters, super().get_queryset())
+        context['sort_options'] = build_sort_options(filters)
+        context['filter_query'] = filters.querystring()
+        context['selected_category'] = filters.category
+        context['search_query'] = filters.q
+        context['ingredient_query'] = filters.ingredient
+        # В форму поиска переносятся только известные фильтры, а не произвольные GET-параметры
+        context['hidden_params'] = {
+            name: value for name, value in filters.params().items() if name not in ('q', 'ingredient')
+        }
+        context['saved_ids'] = saved_recipe_ids(self.request.user)
         return context
 
 
@@ -55,12 +220,28 @@ class RecipeDetailView(DetailView):
     template_name = 'recipes/recipe_detail.html'
     context_object_name = 'recipe'
 
+    def get_object(self, queryset=None):
+        add_cache_tags(self.request, f'detail:{self.kwargs["pk"]}')
+        recipe = super().get_object(queryset)
+        add_cache_tags(self.request, f'category:{recipe.category_id}')
+        return recipe
+
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         if 'comment_form' not in kwargs:
             context['comment_form'] = CommentForm()
+        user = self.request.user
+        if user.is_authenticated and user.pk != self.object.author_id:
+            context['is_following'] = Follow.objects.filter(follower=user, author_id=self.object.author_id).exists()
+            context['user_rating'] = Rating.objects.filter(recipe=self.object, user=user).values_list(
+                'value', flat=True).first() or 0
+            context['rating_choices'] = range(1, 6)
+        if user.is_authenticated:
+            context['collections'] = Collection.objects.filter(owner=user).order_by('name')
+            context['saved_ids'] = saved_recipe_ids(user)
         return context
 
+    @method_decorator(ratelimit('comment', '5/m', key='user'))
     def post(self, request, *args, **kwargs):
         self.object = self.get_object()
 
@@ -72,7 +253,7 @@ class RecipeDetailView(DetailView):
             comment = form.save(commit=False)
             comment.user = request.user
             comment.recipe = self.object
-            comment.save()
+            save_comment(comment)
             return redirect('recipe_detail', pk=self.object.pk)
 
         context = self.get_context_data(comment_form=form)
@@ -98,6 +279,16 @@ class RecipeCreateView(CreateView):
         context = self.get_context_data()
         step_formset = context['step_formset']
 
+        if not self.request.POST.get('confirm_duplicate'):
+            # Поиск по LSH-корзинам: не больше BANDS * MAX_BUCKET_SIZE кандидатов при любом размере каталога
+            signature = compute_signature(recipe_text(
+                form.cleaned_data['title'], form.cleaned_data['description'], form.cleaned_data['ingredients'],
+            ))
+            duplicates = find_duplicates(signature)
+            if duplicates:
+                context.update(form=form, duplicates=duplicates)
+                return self.render_to_response(context)
+
         with transaction.atomic():
             form.instance.author = self.request.user
             self.object = form.save()
@@ -0,0 +1,16 @@
+'use strict';
+{
+    const $ = django.jQuery;
+
+    // При выборе значения в фильтре с автодополнением перезагружаем список с новым параметром
+    $(document).on('change', '.autocomplete-filter select', function() {
+        const params = new URLSearchParams(window.location.search);
+        const lookup = this.dataset.lookup;
+        params.delete(lookup);
+        params.delete('p');
+        if (this.value) {
+            params.set(lookup, this.value);
+        }
+        window.location.search = params.toString();
+    });
+}